@@ -20,6 +20,18 @@ app.conf.beat_schedule = {
         "task": "tickets.tasks.clear_expired_reservations",
         "schedule": crontab(minute="*/5"),  # Executa a cada 5 minutos
     },
+    "reconcile_sharded_inventory_task": {
+        "task": "tickets.tasks.reconcile_sharded_inventory",
+        "schedule": crontab(minute="*"),  # Executa a cada minuto
+    },
+    "purge_expired_idempotency_keys_task": {
+        "task": "core.tasks.purge_expired_idempotency_keys",
+        "schedule": crontab(minute=0),  # Executa a cada hora
+    },
+    "purge_expired_exports_task": {
+        "task": "core.tasks.purge_expired_exports",
+        "schedule": crontab(minute=30),  # Executa a cada hora
+    },
 }
 
 
@@ -68,9 +68,15 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # Paginação por cursor (keyset): cada página é uma varredura de faixa no índice, sem COUNT(*)
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', 50)),
 }
 
+# Maior page_size aceito em ?page_size=
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', 500))
+
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
@@ -86,8 +92,25 @@ SIMPLE_JWT = {
     'AUTH_COOKIE_PATH': '/',  
     'AUTH_COOKIE_SAMESITE': 'Lax',  
 
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializer.UserTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializer.UserTokenRefreshSerializer',
 }
 
+# Autenticação: por quanto tempo o usuário fica em cache entre requisições e, se ativado,
+# confiar nas claims assinadas do token (perfil e status) sem consultar banco nem cache do usuário
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', 60))
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv('AUTH_TRUST_TOKEN_CLAIMS', 'False') == 'True'
+
+# Importação de usuários em massa: linhas por bloco (um bulk_create cada) e limite do endpoint,
+# que importa em segundo plano na fila 'exports'; arquivos maiores vão pelo comando import_users
+USER_IMPORT_CHUNK_SIZE = 5000
+USER_IMPORT_API_MAX_ROWS = int(os.getenv('USER_IMPORT_API_MAX_ROWS', 10000))
+
+# Importação de eventos em massa: eventos por lote (uma transação cada) e limite do endpoint;
+# catálogos maiores vão pelo comando import_events
+EVENT_IMPORT_BATCH_SIZE = 500
+EVENT_IMPORT_API_MAX_EVENTS = int(os.getenv('EVENT_IMPORT_API_MAX_EVENTS', 2000))
+
 ROOT_URLCONF = 'base.urls'
 
 TEMPLATES = [
@@ -163,6 +186,9 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Arquivos gerados pela aplicação (ex: exportações)
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', BASE_DIR / 'media')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -175,6 +201,60 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 #CELERY_RESULT_BACKEND = 'django-db'
 CELERY_RESULT_EXTENDED = True
+# E-mails de ingresso (QR codes) têm fila própria para não esperar atrás de envios em massa
+CELERY_TASK_ROUTES = {
+    'tickets.tasks.send_emails': {'queue': 'email_transactional'},
+    'tickets.tasks.send_custom_email': {'queue': 'email_bulk'},
+    'core.tasks.run_export_job': {'queue': 'exports'},
+    'users.tasks.run_user_import_job': {'queue': 'exports'},
+}
+
+# Cache do Django: Redis em produção (CACHE_REDIS_URL), memória local quando não configurado
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Tempo máximo de um relatório em cache; a invalidação de fato vem das versões por evento
+REPORT_CACHE_TIMEOUT = 60 * 60 * 24
+# Relatórios de vendas entre eventos não são invalidados a cada compra; ficam em cache por pouco tempo
+REPORT_SALES_CACHE_TIMEOUT = int(os.getenv('REPORT_SALES_CACHE_TIMEOUT', 30))
+
+# Exportações assíncronas: limite de exportações simultâneas por organizador, linhas lidas
+# por bloco, tempo máximo de execução e por quanto tempo os arquivos ficam disponíveis
+EXPORT_MAX_CONCURRENT_JOBS = int(os.getenv('EXPORT_MAX_CONCURRENT_JOBS', 2))
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_JOB_TIMEOUT = timedelta(hours=1)
+EXPORT_RETENTION = timedelta(days=7)
+
+# Quantidade de reservas expiradas liberadas por transação na limpeza periódica
+RESERVATION_SWEEP_CHUNK_SIZE = 1000
+
+# Estoque particionado em Redis para tipos de ticket com alta concorrência
+# Use 'fakeredis://' para rodar localmente sem um servidor Redis
+INVENTORY_REDIS_URL = os.getenv('INVENTORY_REDIS_URL', 'redis://redis:6379/1')
+
+# Tempo durante o qual respostas de requisições com Idempotency-Key são reaproveitadas
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# Quanto tempo uma requisição em andamento segura a chave; depois disso um retry a assume
+# (a requisição original morreu). Deve passar do tempo máximo de uma requisição
+IDEMPOTENCY_KEY_LEASE = timedelta(seconds=int(os.getenv('IDEMPOTENCY_KEY_LEASE_SECONDS', 60)))
+
+# Chave mestra dos tokens de check-in offline embutidos nos QR codes
+CHECKIN_SIGNING_KEY = os.getenv('CHECKIN_SIGNING_KEY', SECRET_KEY)
+
+# Fila de espera virtual para eventos com grande procura
+WAITING_ROOM_REDIS_URL = os.getenv('WAITING_ROOM_REDIS_URL', 'redis://redis:6379/2')
 
 #Configs necessarias para evnvio de email 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -183,4 +263,19 @@ EMAIL_PORT= os.getenv('EMAIL_PORT')
 EMAIL_USE_TLS= os.getenv('EMAIL_USE_TLS')
 EMAIL_HOST_USER= os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD= os.getenv('EMAIL_HOST_PASSWORD')
-DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
\ No newline at end of file
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL')
+
+# Quantidade de e-mails enviados por lote na mesma conexão SMTP
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 50))
+
+# Cota de envio do provedor SMTP, compartilhada por todos os workers via Redis
+RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', 'redis://redis:6379/3')
+EMAIL_RATE_PER_MINUTE = int(os.getenv('EMAIL_RATE_PER_MINUTE', 120))
+EMAIL_RATE_BURST = int(os.getenv('EMAIL_RATE_BURST', 60))
+
+# Fração da cota que cada faixa deixa livre para as faixas mais prioritárias
+EMAIL_LANE_RESERVES = {
+    'transactional': 0,
+    'confirmations': 0.25,
+    'bulk': 0.5,
+}
\ No newline at end of file
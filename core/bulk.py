@@ -0,0 +1,29 @@
+import csv
+import io
+from django.db import connection
+
+
+def copy_rows(model, columns, rows) -> None:
+    """
+    Inserts plain tuples into `model`'s table without building model instances:
+    COPY on PostgreSQL (psycopg 3 or psycopg2), one executemany elsewhere.
+    Datetimes must already be adapted with `connection.ops.adapt_datetimefield_value`.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    names = ', '.join(connection.ops.quote_name(column) for column in columns)
+    with connection.cursor() as cursor:
+        if connection.vendor != 'postgresql':
+            cursor.executemany(f"INSERT INTO {table} ({names}) VALUES ({', '.join(['%s'] * len(columns))})", rows)
+            return
+        statement = f'COPY {table} ({names}) FROM STDIN'
+        raw = cursor.cursor
+        if hasattr(raw, 'copy'):
+            with raw.copy(statement) as copy:
+                for row in rows:
+                    copy.write_row(row)
+            return
+        # psycopg2: CSV em memória; campo vazio sem aspas é NULL
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        raw.copy_expert(f'{statement} WITH (FORMAT csv)', buffer)
@@ -0,0 +1,40 @@
+from functools import wraps
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+
+def version_tag(*parts) -> str:
+    """Joins `parts` into an ETag value; datetimes become microsecond timestamps."""
+    return '-'.join(
+        str(int(part.timestamp() * 1_000_000)) if hasattr(part, 'timestamp') else str(part)
+        for part in parts
+    )
+
+
+def conditional_get(version_func):
+    """
+    Adds ETag / Last-Modified validation to a DRF view method.
+
+    `version_func(view, request, *args, **kwargs)` returns `(etag, last_modified)`
+    from a cheap query (no full object load), or None when the resource doesn't
+    exist, in which case the view runs and answers the 404 itself. It runs after
+    authentication and permission checks but before the view loads or serializes
+    anything, so an unchanged resource costs one query and a 304 Not Modified.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            version = version_func(view, request, *args, **kwargs)
+            if version is None:
+                return method(view, request, *args, **kwargs)
+
+            etag, last_modified = version
+            response = condition(
+                etag_func=lambda *args, **kwargs: etag,
+                last_modified_func=lambda *args, **kwargs: last_modified,
+            )(lambda request, *args, **kwargs: method(view, request, *args, **kwargs))(request, *args, **kwargs)
+            # Os clientes guardam a resposta, mas sempre a revalidam antes de usar
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
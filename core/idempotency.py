@@ -0,0 +1,97 @@
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now
+from rest_framework import status
+from rest_framework.response import Response
+from core.models import IdempotencyKey
+
+
+def idempotent(view_method):
+    """
+    Honors the `Idempotency-Key` header on a view's POST handler.
+
+    The first request with a given key inserts an IN_PROGRESS row, which the
+    unique constraint turns into a lock: concurrent duplicates get a 409 instead
+    of doing the work twice. The lock is a lease of IDEMPOTENCY_KEY_LEASE, so
+    the key of a request whose process died is taken over by the next retry
+    once the lease runs out. Successful responses are stored and replayed to
+    retries until the key expires. Failed requests free the key so the client
+    can retry; the wrapped views are not atomic, so whatever a failed request
+    already committed stays, and retrying relies on the services refusing to
+    redo it (an already paid order or ticket can't be paid again).
+
+    Keys longer than the column (255 characters) are rejected with a 400 rather
+    than truncated, so the stored key always matches the one looked up.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response(
+                {"detail": "The Idempotency-Key header must be at most 255 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        scope = f'{request.method} {request.path}'[:255]
+        fingerprint = hashlib.sha256(request.body).hexdigest()
+        current_time = now()
+
+        IdempotencyKey.objects.filter(user=request.user, scope=scope, key=key, expires_at__lte=current_time).delete()
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=request.user,
+                    key=key,
+                    scope=scope,
+                    request_fingerprint=fingerprint,
+                    created_at=current_time,
+                    expires_at=current_time + settings.IDEMPOTENCY_KEY_LEASE,
+                )
+        except IntegrityError:
+            return _replay(request.user, scope, key, fingerprint)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            record.delete()
+            raise
+
+        if status.is_success(response.status_code):
+            # Se o lease venceu e outra requisição assumiu a chave, a linha já não existe e nada é gravado
+            IdempotencyKey.objects.filter(pk=record.pk, state=IdempotencyKey.StateChoices.IN_PROGRESS).update(
+                state=IdempotencyKey.StateChoices.COMPLETED,
+                status_code=response.status_code,
+                response_body=response.data,
+                expires_at=now() + settings.IDEMPOTENCY_KEY_TTL,
+            )
+        else:
+            record.delete()
+        return response
+
+    return wrapper
+
+
+def _replay(user, scope, key, fingerprint):
+    record = IdempotencyKey.objects.filter(user=user, scope=scope, key=key).first()
+    if record is None:
+        return Response(
+            {"detail": "A request with this Idempotency-Key has just finished. Please retry."},
+            status=status.HTTP_409_CONFLICT,
+        )
+    if record.request_fingerprint != fingerprint:
+        return Response(
+            {"detail": "This Idempotency-Key was already used with a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record.state == IdempotencyKey.StateChoices.IN_PROGRESS:
+        return Response(
+            {"detail": "A request with this Idempotency-Key is still being processed."},
+            status=status.HTTP_409_CONFLICT,
+            headers={'Retry-After': '1'},
+        )
+    return Response(record.response_body, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
@@ -0,0 +1,439 @@
+import http.client
+import json
+import math
+import platform
+import subprocess
+import threading
+import time
+import tracemalloc
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+import django
+from celery import current_app
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.db.models import F, Sum
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from core.bulk import copy_rows
+from core.report_cache import bump_versions
+from events.models import Event
+from tickets.models import Ticket, TicketType, TicketTypeSalesSummary
+from tickets.services.sales_summary_services import SalesSummaryService
+from tickets.services.ticket_type_services import TicketTypeService
+from tickets.tasks import clear_expired_reservations
+from users.models import User, UserProfileType
+from users.serializer import UserTokenObtainPairSerializer
+
+SCENARIOS = ['purchase', 'pay', 'checkin', 'reports', 'sweep']
+IN_PROCESS = 'in-process'
+HTTP = 'http'
+
+TICKET_COLUMNS = ['ticket_type_id', 'buyer_id', 'unique_code', 'ticket_status', 'bought_at', 'hold_expires_at', 'price_paid']
+
+
+class QueryCounter:
+    """`connection.execute_wrapper` hook counting queries from every thread."""
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+class InProcessSession:
+    """Drives the views through Django's test client, authenticated with the same JWT cookie as a browser."""
+
+    def __init__(self, token, counter):
+        self.client = APIClient(raise_request_exception=False, SERVER_NAME='localhost')
+        self.client.cookies['access_token'] = token
+        self.counter = counter
+
+    def request(self, method, path, data=None) -> int:
+        with connection.execute_wrapper(self.counter):
+            response = self.client.generic(method, path, json.dumps(data, cls=DjangoJSONEncoder) if data is not None else '',
+                                           content_type='application/json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            response.close()
+        return response.status_code
+
+
+class HttpSession:
+    """Drives the views over a real socket against the local WSGI server, one connection per request."""
+
+    def __init__(self, token, address):
+        self.token = token
+        self.address = address
+
+    def request(self, method, path, data=None) -> int:
+        body = json.dumps(data, cls=DjangoJSONEncoder) if data is not None else None
+        client = http.client.HTTPConnection(*self.address, timeout=120)
+        try:
+            client.request(method, path, body=body, headers={
+                'Cookie': f'access_token={self.token}',
+                'Content-Type': 'application/json',
+                'Connection': 'close',
+            })
+            response = client.getresponse()
+            response.read()
+            return response.status
+        finally:
+            client.close()
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def counted(application, counter):
+    """Wraps a WSGI app so queries run while the response body streams are counted too."""
+    def wrapper(environ, start_response):
+        with connection.execute_wrapper(counter):
+            response = application(environ, start_response)
+            try:
+                yield from response
+            finally:
+                if hasattr(response, 'close'):
+                    response.close()
+    return wrapper
+
+
+def percentile(values, fraction):
+    # Posto mais próximo: sempre uma latência observada, sem interpolação
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)] if ordered else None
+
+
+class Command(BaseCommand):
+    help = (
+        "End-to-end benchmarks of ticket purchase, payment with QR rendering, check-in bursts, the report "
+        "endpoints and the reservation sweep. Views run through the test client and a local WSGI server; results "
+        "(p50/p99 latency, throughput, queries and peak memory) are written as JSON for comparison across commits. "
+        "Creates and deletes its own fixtures, but data seeded for --sizes is kept: use a throwaway database. "
+        "Concurrent scenarios need PostgreSQL; SQLite serializes writers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS, help='Scenarios to run.')
+        parser.add_argument('--transports', nargs='+', choices=[IN_PROCESS, HTTP], default=[IN_PROCESS, HTTP],
+                            help='How requests reach the views.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and transport.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients.')
+        parser.add_argument('--sizes', nargs='*', type=int, default=[],
+                            help='Ticket counts the database is grown to with seed_scale before each report run '
+                                 '(default: only the data already there).')
+        parser.add_argument('--report-requests', type=int, default=20, help='Requests per report, cache state and size.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Scans per batch check-in request.')
+        parser.add_argument('--holds', type=int, default=10000, help='Lapsed reservations left by the on-sale the sweep clears.')
+        parser.add_argument('--eager-tasks', action='store_true',
+                            help='Run Celery tasks (emails, QR rendering) inside the request instead of sending them '
+                                 'to the broker; emails go to the in-memory backend.')
+        parser.add_argument('--no-memory', action='store_true', help='Skip tracemalloc, which slows every request down.')
+        parser.add_argument('--output', help='Write the JSON results to this file instead of the output.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be at least 1.')
+        self.options = options
+        self.counter = QueryCounter()
+        self.tag = uuid.uuid4().hex[:8]
+        self.log = self.stdout if options['output'] else self.stderr
+        self.results = []
+
+        self.create_users()
+        server = self.start_server() if HTTP in options['transports'] else None
+        always_eager = current_app.conf.task_always_eager
+        if options['eager_tasks']:
+            current_app.conf.task_always_eager = True
+        if not options['no_memory']:
+            tracemalloc.start()
+        try:
+            with override_settings(**({'EMAIL_BACKEND': 'django.core.mail.backends.locmem.EmailBackend'} if options['eager_tasks'] else {})):
+                for scenario in options['scenarios']:
+                    getattr(self, f'run_{scenario}')()
+        finally:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            current_app.conf.task_always_eager = always_eager
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            self.cleanup()
+
+        report = json.dumps(self.report(), cls=DjangoJSONEncoder, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(self.results)} results to {options['output']}."))
+        else:
+            self.stdout.write(report)
+
+    def report(self) -> dict:
+        return {
+            'commit': self.git('rev-parse', 'HEAD'),
+            'dirty': bool(self.git('status', '--porcelain')),
+            'created_at': timezone.now(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'options': {key: self.options[key] for key in (
+                'scenarios', 'transports', 'requests', 'concurrency', 'sizes', 'report_requests', 'batch_size', 'holds', 'eager_tasks',
+            )},
+            'memory_traced': not self.options['no_memory'],
+            'results': self.results,
+        }
+
+    @staticmethod
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    # Infraestrutura
+
+    def start_server(self):
+        server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler)
+        server.set_app(counted(get_wsgi_application(), self.counter))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.address = server.server_address[:2]
+        return server
+
+    def session(self, transport, user):
+        token = str(UserTokenObtainPairSerializer.get_token(user).access_token)
+        if transport == HTTP:
+            return HttpSession(token, self.address)
+        return InProcessSession(token, self.counter)
+
+    def measure(self, scenario, transport, user, jobs, concurrency=None, prepare=None, **extra) -> dict:
+        """
+        Sends `jobs` (`(method, path, data)`) from `concurrency` threads and
+        records latency percentiles, throughput, queries per request and the
+        traced memory peak. `prepare` runs untimed before each request.
+        """
+        concurrency = min(concurrency or self.options['concurrency'], len(jobs))
+        latencies, statuses = [], {}
+        lock = threading.Lock()
+        barrier = threading.Barrier(concurrency)
+
+        def client(share):
+            session = self.session(transport, user)
+            timings, codes = [], {}
+            barrier.wait()
+            try:
+                for method, path, data in share:
+                    if prepare:
+                        prepare()
+                    started = time.perf_counter()
+                    try:
+                        code = session.request(method, path, data)
+                    except Exception as e:
+                        code = type(e).__name__
+                    timings.append(time.perf_counter() - started)
+                    codes[code] = codes.get(code, 0) + 1
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(timings)
+                for code, count in codes.items():
+                    statuses[code] = statuses.get(code, 0) + count
+
+        self.counter.count = 0
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        threads = [threading.Thread(target=client, args=(jobs[index::concurrency],)) for index in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        result = {
+            'scenario': scenario,
+            'transport': transport,
+            **extra,
+            'requests': len(latencies),
+            'concurrency': concurrency,
+            'errors': sum(count for code, count in statuses.items() if not isinstance(code, int) or code >= 500),
+            'statuses': {str(code): count for code, count in sorted(statuses.items(), key=str)},
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'queries_per_request': round(self.counter.count / len(latencies), 2),
+            'peak_memory_kb': tracemalloc.get_traced_memory()[1] // 1024 if tracemalloc.is_tracing() else None,
+        }
+        self.results.append(result)
+        label = ' '.join(str(value) for value in (scenario, extra.get('path'), extra.get('cache')) if value)
+        self.log.write(
+            f"{label:<28} {transport:<10} p50 {result['p50_ms']:>9.2f}ms  p99 {result['p99_ms']:>9.2f}ms  "
+            f"{result['throughput_rps']:>8.1f} req/s  {result['queries_per_request']:>6.1f} queries  {result['statuses']}"
+        )
+        return result
+
+    # Dados
+
+    def create_users(self):
+        self.admin = User.objects.create_superuser(email=f'benchmark-{self.tag}-admin@example.com', password=None, name='Benchmark Admin')
+        self.organizer = User.objects.create_user(
+            email=f'benchmark-{self.tag}-organizer@example.com', password=None, name='Benchmark Organizer',
+            profile_type=UserProfileType.ORGANIZER, cnpj_cpf='00000000000000', business_name='Benchmark', commercial_address='Local',
+        )
+        self.buyer = User.objects.create_user(email=f'benchmark-{self.tag}-buyer@example.com', password=None, name='Benchmark Buyer')
+
+    def create_ticket_type(self, label, stock, days=30):
+        start = timezone.now() + timedelta(days=days)
+        event = Event.objects.create(
+            title=f'Benchmark {label} {self.tag}', description='Benchmark', location='Local', total_capacity=max(stock, 1),
+            start_date=start, end_date=start + timedelta(hours=4), event_status=Event.EventStatusChoices.PUBLISHED,
+            organizer=self.organizer,
+        )
+        return TicketTypeService.create_ticket_type({
+            'event': event, 'name': TicketType.TicketTypeNameChoices.INTEIRA, 'description': 'Benchmark', 'price': Decimal('100.00'),
+            'quantity_available': stock, 'sale_start': timezone.now() - timedelta(days=1), 'sale_end': start,
+        })
+
+    def insert_tickets(self, ticket_type, count, ticket_status, hold_expires_at=None):
+        """Bulk-inserts `count` tickets of the buyer, takes them from the stock and returns their `(id, unique_code)`."""
+        adapt = connection.ops.adapt_datetimefield_value
+        prefix = f'TIX-BENCH-{self.tag}-{ticket_type.id}-'
+        bought_at = adapt(timezone.now() - timedelta(minutes=30))
+        copy_rows(Ticket, TICKET_COLUMNS, [
+            (ticket_type.id, self.buyer.id, f'{prefix}{index:07d}', ticket_status, bought_at, adapt(hold_expires_at), ticket_type.price)
+            for index in range(count)
+        ])
+        TicketType.objects.filter(pk=ticket_type.pk).update(quantity_available=F('quantity_available') - count, last_modified=timezone.now())
+        SalesSummaryService.rebuild([ticket_type.id])
+        return list(Ticket.objects.filter(ticket_type=ticket_type).order_by('id').values_list('id', 'unique_code'))
+
+    def cleanup(self):
+        Event.objects.filter(organizer=self.organizer).delete()
+        User.objects.filter(email__startswith=f'benchmark-{self.tag}-').delete()
+
+    # Cenários
+
+    def run_purchase(self):
+        """Concurrent purchases of one ticket type, stocked with exactly one unit per request."""
+        for transport in self.options['transports']:
+            ticket_type = self.create_ticket_type('purchase', self.options['requests'])
+            now = timezone.now()
+            payload = {
+                'ticket_type': ticket_type.id, 'buyer': self.buyer.id, 'ticket_status': Ticket.TicketStatusChoices.PENDING_PAYMENT,
+                'bought_at': now, 'used_at': now + timedelta(days=30), 'price_paid': ticket_type.price,
+            }
+            jobs = [('POST', '/tickets-management/tickets/', payload)] * self.options['requests']
+            result = self.measure('purchase', transport, self.organizer, jobs)
+            sold = Ticket.objects.filter(ticket_type=ticket_type).count()
+            ticket_type.refresh_from_db(fields=['quantity_available'])
+            result['sold'] = sold
+            result['oversold'] = sold > self.options['requests'] or ticket_type.quantity_available < 0
+
+    def run_pay(self):
+        """Payment of pending reservations, then the first (rendering) fetch of each ticket's QR code."""
+        for transport in self.options['transports']:
+            ticket_type = self.create_ticket_type('pay', self.options['requests'])
+            tickets = self.insert_tickets(
+                ticket_type, self.options['requests'], Ticket.TicketStatusChoices.PENDING_PAYMENT,
+                hold_expires_at=timezone.now() + timedelta(hours=1),
+            )
+            self.measure('pay', transport, self.buyer, [('POST', f'/tickets-management/tickets/{ticket_id}/pay/', {}) for ticket_id, _ in tickets])
+            self.measure('qr_code', transport, self.buyer, [('GET', f'/tickets-management/qr-codes/{code}/', None) for _, code in tickets])
+
+    def run_checkin(self):
+        """Gate bursts: one scan per request, then batches of --batch-size scans."""
+        for transport in self.options['transports']:
+            count, batch_size = self.options['requests'], self.options['batch_size']
+            ticket_type = self.create_ticket_type('checkin', count * (batch_size + 1), days=0)
+            tickets = self.insert_tickets(ticket_type, count * (batch_size + 1), Ticket.TicketStatusChoices.ACTIVE)
+            path = f'/tickets-management/events/{ticket_type.event_id}/check-in/'
+            singles, batched = tickets[:count], tickets[count:]
+            self.measure('checkin', transport, self.organizer, [('POST', path, {'code': code}) for _, code in singles])
+            self.measure('checkin_batch', transport, self.organizer, [
+                ('POST', f'{path}batch/', {'scans': [{'code': code} for _, code in batched[start:start + batch_size]]})
+                for start in range(0, len(batched), batch_size)
+            ], scans_per_request=batch_size)
+
+    def run_reports(self):
+        """Every report endpoint at each dataset size, with the report cache cold (bumped before each request) and warm."""
+        for size in self.options['sizes'] or [None]:
+            if size is not None:
+                self.grow_dataset(size)
+            busiest = (
+                TicketTypeSalesSummary.objects.values('ticket_type__event_id')
+                .annotate(sold=Sum('active_count') + Sum('used_count'))
+                .order_by('-sold')
+                .values_list('ticket_type__event_id', flat=True)
+                .first()
+            )
+            if busiest is None:
+                raise CommandError('The database has no tickets to report on; pass --sizes to seed some.')
+            dataset = Ticket.objects.count()
+            paths = [
+                f'/reports/ticket_sales/{busiest}',
+                '/reports/ticket_sales/',
+                f'/reports/ticket_status/{busiest}',
+                f'/reports/event_attendance/{busiest}',
+                '/reports/ticket_type_list_for_published_events/',
+                f'/reports/ticket_sales_detail/?event_id={busiest}',
+                '/reports/events_with_ticket_types/',
+            ]
+            for transport in self.options['transports']:
+                for path in paths:
+                    jobs = [('GET', path, None)] * self.options['report_requests']
+                    self.measure('report', transport, self.admin, jobs, concurrency=1, prepare=lambda: bump_versions([busiest]),
+                                 path=path, cache='cold', dataset_tickets=dataset)
+                    self.measure('report', transport, self.admin, jobs, path=path, cache='warm', dataset_tickets=dataset)
+
+    def grow_dataset(self, size):
+        missing = size - Ticket.objects.count()
+        if missing <= 0:
+            return
+        self.log.write(f"Seeding {missing} tickets to reach {size}...")
+        call_command(
+            'seed_scale', seed=size, tickets=missing, events=max(missing // 200, 10), users=max(missing // 20, 100),
+            organizers=max(missing // 5000, 5), stdout=self.log, stderr=self.stderr,
+        )
+
+    def run_sweep(self):
+        """clear_expired_reservations after an on-sale whose buyers left --holds reservations unpaid."""
+        holds = self.options['holds']
+        ticket_type = self.create_ticket_type('sweep', holds)
+        self.insert_tickets(ticket_type, holds, Ticket.TicketStatusChoices.PENDING_PAYMENT, hold_expires_at=timezone.now() - timedelta(minutes=1))
+
+        self.counter.count = 0
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        with connection.execute_wrapper(self.counter):
+            clear_expired_reservations()
+        elapsed = time.perf_counter() - started
+
+        ticket_type.refresh_from_db(fields=['quantity_available'])
+        expired = Ticket.objects.filter(ticket_type=ticket_type, ticket_status=Ticket.TicketStatusChoices.EXPIRED).count()
+        result = {
+            'scenario': 'sweep',
+            'transport': 'task',
+            'holds': holds,
+            'expired': expired,
+            'restocked': ticket_type.quantity_available == holds,
+            'seconds': round(elapsed, 3),
+            'throughput_rps': round(expired / elapsed, 2) if elapsed else None,
+            'queries': self.counter.count,
+            'peak_memory_kb': tracemalloc.get_traced_memory()[1] // 1024 if tracemalloc.is_tracing() else None,
+        }
+        self.results.append(result)
+        self.log.write(f"{'sweep':<28} {'task':<10} {expired} holds in {elapsed:.2f}s  {self.counter.count} queries")
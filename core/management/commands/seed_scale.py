@@ -0,0 +1,323 @@
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from core.bulk import copy_rows
+from core.report_cache import bump_versions
+from events.models import Event, Category
+from tickets.models import Ticket, TicketType, TicketTypeSalesSummary
+from tickets.services.sales_summary_services import UNSOLD_STATUSES
+from users.models import User, UserProfileType
+
+EventStatus = Event.EventStatusChoices
+TicketStatus = Ticket.TicketStatusChoices
+TicketTypeName = TicketType.TicketTypeNameChoices
+
+CATEGORY_NAMES = [
+    'Música', 'Teatro', 'Stand-up', 'Esportes', 'Tecnologia', 'Gastronomia', 'Infantil', 'Dança', 'Cinema', 'Exposição',
+    'Festival', 'Palestra', 'Workshop', 'Literatura', 'Negócios', 'Games', 'Moda', 'Bem-estar', 'Carnaval', 'Religioso',
+]
+EVENT_KINDS = ['Show', 'Festival', 'Peça', 'Palestra', 'Workshop', 'Feira', 'Campeonato', 'Exposição', 'Encontro', 'Congresso']
+EVENT_THEMES = [
+    'de Rock', 'de Samba', 'de Jazz', 'Sertanejo', 'de Comédia', 'de Tecnologia', 'de Vinhos', 'de Cerveja Artesanal',
+    'de Games', 'Infantil', 'de Dança', 'de Fotografia', 'de Literatura', 'de Startups', 'de Música Eletrônica', 'Gospel',
+]
+VENUES = [
+    'Allianz Parque, São Paulo', 'Espaço Unimed, São Paulo', 'Teatro Municipal, Rio de Janeiro', 'Jeunesse Arena, Rio de Janeiro',
+    'Mineirão, Belo Horizonte', 'Centro de Convenções, Salvador', 'Arena da Baixada, Curitiba', 'Pepsi On Stage, Porto Alegre',
+    'Centro de Eventos do Ceará, Fortaleza', 'Classic Hall, Recife', 'Teatro Nacional, Brasília', 'Expo Center Norte, São Paulo',
+]
+
+# Distribuições de status: eventos, e tickets conforme o status do evento
+EVENT_STATUS_WEIGHTS = {EventStatus.PUBLISHED: 60, EventStatus.FINISHED: 25, EventStatus.SKETCH: 10, EventStatus.CANCELED: 5}
+TICKET_STATUS_WEIGHTS = {
+    EventStatus.PUBLISHED: {TicketStatus.ACTIVE: 85, TicketStatus.PENDING_PAYMENT: 4, TicketStatus.CANCELED: 7, TicketStatus.EXPIRED: 4},
+    EventStatus.FINISHED: {TicketStatus.USED: 80, TicketStatus.ACTIVE: 10, TicketStatus.CANCELED: 8, TicketStatus.EXPIRED: 2},
+    EventStatus.CANCELED: {TicketStatus.CANCELED: 100},
+}
+
+# Preço relativo ao preço base do evento e participação nas vendas de cada tipo de ingresso
+TICKET_TYPE_PROFILES = {
+    TicketTypeName.INTEIRA: (Decimal('1'), 40),
+    TicketTypeName.MEIA_ENTRADA: (Decimal('0.5'), 30),
+    TicketTypeName.REGULAR: (Decimal('1'), 30),
+    TicketTypeName.VIP: (Decimal('2.5'), 10),
+    TicketTypeName.CAMAROTE: (Decimal('4'), 4),
+    TicketTypeName.SOCIAL: (Decimal('0'), 5),
+}
+BASE_PRICES = [Decimal(price) for price in ('30', '50', '80', '120', '180', '250', '400')]
+
+TICKET_COLUMNS = ['ticket_type_id', 'buyer_id', 'unique_code', 'ticket_status', 'bought_at', 'used_at', 'hold_expires_at', 'price_paid']
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills the database with a production-sized synthetic dataset (users, organizers, categories, events, "
+        "ticket types and tickets) for load testing. The same --seed and --now always generate the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1, help='Random seed; also namespaces the generated emails and ticket codes.')
+        parser.add_argument('--users', type=int, default=10000, help='Participants.')
+        parser.add_argument('--organizers', type=int, default=100, help='Organizers.')
+        parser.add_argument('--categories', type=int, default=20, help='Categories.')
+        parser.add_argument('--events', type=int, default=1000, help='Events.')
+        parser.add_argument('--ticket-types', type=int, default=4, help='Maximum ticket types per event.')
+        parser.add_argument('--tickets', type=int, default=100000, help='Tickets.')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Rows inserted per statement batch and transaction.')
+        parser.add_argument('--password', default='loadtest', help='Password of every generated user (hashed once).')
+        parser.add_argument(
+            '--now',
+            help=(
+                'ISO datetime the dataset is built around (default: the current time), to reproduce it exactly. '
+                'Open reservations end within their hold window of it, so a past --now loads them already lapsed.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['organizers'], options['events'], options['ticket_types']) < 1:
+            raise CommandError('--users, --organizers, --events and --ticket-types must be at least 1.')
+        self.rng = random.Random(options['seed'])
+        self.prefix = f"seed{options['seed']}"
+        self.chunk_size = options['chunk_size']
+        self.anchor = self.parse_anchor(options['now'])
+        if User.objects.filter(email__startswith=f'{self.prefix}-').exists():
+            raise CommandError(f"Seed {options['seed']} was already loaded into this database; use another --seed.")
+
+        started = time.perf_counter()
+        password = make_password(options['password'])
+        categories = self.step('categories', self.create_categories, options['categories'])
+        organizers = self.step('organizers', self.create_users, options['organizers'], UserProfileType.ORGANIZER, password)
+        participants = self.step('participants', self.create_users, options['users'], UserProfileType.PARTICIPANT, password)
+        events = self.step('events', self.create_events, options['events'], options['ticket_types'], organizers, categories, options['tickets'])
+        ticket_types = self.step('ticket types', self.create_ticket_types, events)
+        self.step('tickets', self.create_tickets, ticket_types, participants, options['tickets'])
+        self.step('sales summaries', self.create_summaries, ticket_types)
+        # Relatórios entre eventos em cache ficaram desatualizados
+        bump_versions([])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(organizers)} organizers, {len(participants)} participants, {len(categories)} categories, "
+            f"{len(events)} events, {len(ticket_types)} ticket types and {options['tickets']} tickets "
+            f"in {time.perf_counter() - started:.1f}s (password: {options['password']})."
+        ))
+
+    def step(self, label, function, *args):
+        started = time.perf_counter()
+        result = function(*args)
+        self.stdout.write(f"  {label}: {time.perf_counter() - started:.1f}s")
+        return result
+
+    @staticmethod
+    def parse_anchor(value):
+        # Padrão é o instante atual: reservas em aberto geradas antes dele ainda estão no prazo
+        if not value:
+            return timezone.now()
+        try:
+            anchor = datetime.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f"Invalid --now date: {value}")
+        return timezone.make_aware(anchor) if timezone.is_naive(anchor) else anchor
+
+    def create_categories(self, count):
+        categories = []
+        for index in range(count):
+            name = CATEGORY_NAMES[index % len(CATEGORY_NAMES)]
+            if index >= len(CATEGORY_NAMES):
+                name = f'{name} {index // len(CATEGORY_NAMES) + 1}'
+            categories.append(Category(name=name, slug=slugify(name), description=f'Eventos de {name.lower()}.'))
+        return Category.objects.bulk_create(categories, batch_size=self.chunk_size)
+
+    def create_users(self, count, profile_type, password):
+        rng, users = self.rng, []
+        kind = 'organizer' if profile_type == UserProfileType.ORGANIZER else 'user'
+        for index in range(count):
+            organizer = {}
+            if profile_type == UserProfileType.ORGANIZER:
+                organizer = dict(
+                    cnpj_cpf=f'{rng.randrange(10 ** 14):014d}',
+                    business_name=f'Produtora {index + 1}',
+                    commercial_address=rng.choice(VENUES).split(', ')[1],
+                )
+            users.append(User(
+                email=f'{self.prefix}-{kind}{index + 1}@example.com',
+                name=f'{kind.capitalize()} {index + 1}',
+                phone_number=f'119{rng.randrange(10 ** 8):08d}',
+                profile_type=profile_type,
+                password=password,
+                date_joined=self.anchor - timedelta(days=rng.randrange(1, 730)),
+                **organizer,
+            ))
+        return User.objects.bulk_create(users, batch_size=self.chunk_size)
+
+    def create_events(self, count, max_ticket_types, organizers, categories, total_tickets):
+        """
+        Creates the events and plans their ticket types: each sellable event gets a
+        popularity drawn from a Pareto distribution, so a few events sell most
+        tickets, and every ticket type its share of `total_tickets`.
+        """
+        rng, events, links, plans = self.rng, [], [], []
+        statuses, weights = zip(*EVENT_STATUS_WEIGHTS.items())
+        for index in range(count):
+            event_status = rng.choices(statuses, weights)[0]
+            if event_status == EventStatus.FINISHED:
+                start_date = self.anchor - timedelta(days=rng.randrange(1, 365))
+            elif event_status == EventStatus.CANCELED:
+                start_date = self.anchor + timedelta(days=rng.randrange(-60, 120))
+            else:
+                start_date = self.anchor + timedelta(days=rng.randrange(1, 365))
+            start_date += timedelta(hours=rng.choice([10, 14, 19, 20, 21]))
+            created_at = min(start_date - timedelta(days=rng.randrange(30, 180)), self.anchor)
+            kind, theme = rng.choice(EVENT_KINDS), rng.choice(EVENT_THEMES)
+            title = f'{kind} {theme} {index + 1}'
+            location = rng.choice(VENUES)
+            events.append(Event(
+                title=title,
+                slug=slugify(title),
+                description=f'{kind} {theme} em {location}. Uma edição de {start_date.year} com atrações nacionais.',
+                start_date=start_date,
+                end_date=start_date + timedelta(hours=rng.randrange(2, 9)),
+                location=location,
+                total_capacity=1,
+                event_status=event_status,
+                organizer=rng.choice(organizers),
+                waiting_room_enabled=event_status == EventStatus.PUBLISHED and rng.random() < 0.05,
+                created_at=created_at,
+                last_modified=created_at,
+            ))
+            for category in rng.sample(categories, k=min(len(categories), rng.randint(1, 3))):
+                links.append((index, category.id))
+            if event_status != EventStatus.SKETCH:
+                names = rng.sample(list(TICKET_TYPE_PROFILES), k=rng.randint(1, min(max_ticket_types, len(TICKET_TYPE_PROFILES))))
+                plans.append((index, names, rng.choice(BASE_PRICES), rng.paretovariate(1.2)))
+
+        # Cota de tickets de cada tipo de ingresso, proporcional à popularidade do evento e à participação do tipo
+        shares = [(index, name, price, popularity * TICKET_TYPE_PROFILES[name][1]) for index, names, price, popularity in plans for name in names]
+        if total_tickets and not shares:
+            raise CommandError('No sellable events were generated; raise --events.')
+        total_share = sum(share for _, _, _, share in shares) or 1
+        quotas = [int(total_tickets * share / total_share) for _, _, _, share in shares]
+        leftover = total_tickets - sum(quotas)
+        if leftover:
+            for position in rng.choices(range(len(shares)), weights=[share for _, _, _, share in shares], k=leftover):
+                quotas[position] += 1
+
+        self.ticket_type_plans = []
+        capacities = defaultdict(int)
+        for (index, name, base_price, _), quota in zip(shares, quotas):
+            capacity = quota + int(quota * rng.uniform(0.05, 0.5)) + rng.randrange(10, 200)
+            capacities[index] += capacity
+            self.ticket_type_plans.append((index, name, base_price * TICKET_TYPE_PROFILES[name][0], capacity, quota))
+        for index, event in enumerate(events):
+            event.total_capacity = capacities.get(index) or rng.randrange(50, 5000)
+
+        events = Event.objects.bulk_create(events, batch_size=self.chunk_size)
+        Event.categories.through.objects.bulk_create(
+            [Event.categories.through(event_id=events[index].id, category_id=category_id) for index, category_id in links],
+            batch_size=self.chunk_size,
+        )
+        return events
+
+    def create_ticket_types(self, events):
+        rng, ticket_types = self.rng, []
+        for index, name, price, capacity, quota in self.ticket_type_plans:
+            event = events[index]
+            ticket_types.append(TicketType(
+                event=event,
+                name=name,
+                description=f'{TicketTypeName(name).label} - {event.title}',
+                price=price.quantize(Decimal('0.01')),
+                quantity_available=capacity,
+                sale_start=event.created_at,
+                sale_end=event.start_date,
+                hold_minutes=rng.choice([10, 15, 15, 20]),
+                last_modified=event.created_at,
+            ))
+        ticket_types = TicketType.objects.bulk_create(ticket_types, batch_size=self.chunk_size)
+        self.quotas = [quota for _, _, _, _, quota in self.ticket_type_plans]
+        return ticket_types
+
+    def create_tickets(self, ticket_types, participants, total_tickets):
+        """Streams the tickets in chunks, tallying each ticket type's sales summary and remaining stock on the way."""
+        self.tallies = defaultdict(lambda: defaultdict(int))
+        rows = self.generate_tickets(ticket_types, [participant.id for participant in participants])
+        inserted = 0
+        while inserted < total_tickets:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            with transaction.atomic():
+                copy_rows(Ticket, TICKET_COLUMNS, chunk)
+            inserted += len(chunk)
+            self.stdout.write(f"    {inserted}/{total_tickets} tickets")
+
+        # O estoque restante desconta os ingressos vendidos e as reservas em aberto
+        with transaction.atomic():
+            held = defaultdict(list)
+            for ticket_type in ticket_types:
+                counts = self.tallies[ticket_type.id]
+                taken = sum(counts[status] for status in (TicketStatus.ACTIVE, TicketStatus.USED, TicketStatus.PENDING_PAYMENT))
+                if taken:
+                    held[ticket_type.quantity_available - taken].append(ticket_type.id)
+            for quantity_available, ids in held.items():
+                TicketType.objects.filter(id__in=ids).update(quantity_available=quantity_available)
+
+    def generate_tickets(self, ticket_types, buyer_ids):
+        rng = self.rng
+        adapt = connection.ops.adapt_datetimefield_value
+        serial = 0
+        for ticket_type, quota in zip(ticket_types, self.quotas):
+            if not quota:
+                continue
+            event = ticket_type.event
+            weights = TICKET_STATUS_WEIGHTS[event.event_status]
+            statuses = [str(ticket_status) for ticket_status in weights]
+            sale_start = ticket_type.sale_start
+            sale_seconds = max(int((min(ticket_type.sale_end, self.anchor) - sale_start).total_seconds()), 60)
+            hold = timedelta(minutes=ticket_type.hold_minutes)
+            tally = self.tallies[ticket_type.id]
+            for ticket_status in rng.choices(statuses, list(weights.values()), k=quota):
+                serial += 1
+                used_at = hold_expires_at = None
+                if ticket_status == TicketStatus.PENDING_PAYMENT:
+                    # Reservas em aberto: compradas há poucos minutos, prazo ainda não vencido
+                    bought_at = self.anchor - timedelta(seconds=rng.randrange(hold.seconds))
+                    hold_expires_at = bought_at + hold
+                else:
+                    bought_at = sale_start + timedelta(seconds=rng.randrange(sale_seconds))
+                    if ticket_status == TicketStatus.EXPIRED:
+                        hold_expires_at = bought_at + hold
+                    elif ticket_status == TicketStatus.USED:
+                        used_at = event.start_date + timedelta(minutes=rng.randrange(180))
+                tally[ticket_status] += 1
+                yield (
+                    ticket_type.id,
+                    rng.choice(buyer_ids),
+                    f'TIX-{self.prefix.upper()}-{serial:09d}',
+                    ticket_status,
+                    adapt(bought_at),
+                    adapt(used_at),
+                    adapt(hold_expires_at),
+                    ticket_type.price,
+                )
+
+    def create_summaries(self, ticket_types):
+        updated_at = timezone.now()
+        summaries = []
+        for ticket_type in ticket_types:
+            counts = self.tallies[ticket_type.id]
+            sold = sum(count for ticket_status, count in counts.items() if ticket_status not in UNSOLD_STATUSES)
+            summaries.append(TicketTypeSalesSummary(
+                ticket_type_id=ticket_type.id,
+                revenue=ticket_type.price * sold,
+                updated_at=updated_at,
+                **{TicketTypeSalesSummary.count_field(ticket_status): count for ticket_status, count in counts.items()},
+            ))
+        TicketTypeSalesSummary.objects.bulk_create(summaries, batch_size=self.chunk_size)
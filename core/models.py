@@ -1,3 +1,62 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from users.models import User
 
-# Create your models here.
+
+class IdempotencyKey(models.Model):
+    class StateChoices(models.TextChoices):
+        IN_PROGRESS = 'IN_PROGRESS', 'In_Progress'
+        COMPLETED = 'COMPLETED', 'Completed'
+
+    user = models.ForeignKey(User, related_name='idempotency_keys', on_delete=models.CASCADE, null=False, blank=False)
+    key = models.CharField(max_length=255, null=False, blank=False)
+    scope = models.CharField(max_length=255, null=False, blank=False)
+    request_fingerprint = models.CharField(max_length=64, null=False, blank=False)
+    state = models.CharField(max_length=20, choices=StateChoices.choices, default=StateChoices.IN_PROGRESS, null=False, blank=False)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True)
+    created_at = models.DateTimeField(null=False, blank=False)
+    # IN_PROGRESS: fim do lease da requisição em andamento; COMPLETED: até quando a resposta é reaproveitada
+    expires_at = models.DateTimeField(null=False, blank=False, db_index=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='idempotency_keys_unique_user_scope_key'),
+        ]
+
+
+class ExportJob(models.Model):
+    class KindChoices(models.TextChoices):
+        ATTENDEES = 'ATTENDEES', 'Attendees'
+        SALES = 'SALES', 'Sales'
+
+    class FormatChoices(models.TextChoices):
+        CSV = 'CSV', 'Csv'
+        NDJSON_GZ = 'NDJSON_GZ', 'Ndjson_Gz'
+        PARQUET = 'PARQUET', 'Parquet'
+
+    class StatusChoices(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        RUNNING = 'RUNNING', 'Running'
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+
+    requested_by = models.ForeignKey(User, related_name='export_jobs', on_delete=models.CASCADE, null=False, blank=False)
+    organizer = models.ForeignKey(User, related_name='organizer_export_jobs', on_delete=models.CASCADE, null=False, blank=False)
+    event = models.ForeignKey('events.Event', related_name='export_jobs', on_delete=models.CASCADE, null=False, blank=False)
+    kind = models.CharField(max_length=20, choices=KindChoices.choices, null=False, blank=False)
+    export_format = models.CharField(max_length=20, choices=FormatChoices.choices, default=FormatChoices.CSV, null=False, blank=False)
+    export_status = models.CharField(max_length=20, choices=StatusChoices.choices, default=StatusChoices.PENDING, null=False, blank=False)
+    file = models.FileField(upload_to='exports/%Y/%m/', null=True, blank=True)
+    row_count = models.PositiveIntegerField(default=0, null=False, blank=False)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(null=False, blank=False)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'export_jobs'
+        indexes = [
+            models.Index(fields=['organizer', 'export_status'], name='export_jobs_org_status_idx'),
+        ]
@@ -0,0 +1,139 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique, indexed ordering.
+
+    The cursor holds the ordering values of the last row of the page, and the
+    next page is read with `WHERE (a, b) > (last a, last b) ... LIMIT n`, so
+    each page is one index range scan however deep the client goes. There is
+    no COUNT(*) and no OFFSET. `ordering` must end in a unique field (usually
+    `id`) and be backed by an index with the same columns. Annotations (such
+    as a search rank) may also be used as ordering columns.
+
+    The page size comes from `?page_size=` (up to API_MAX_PAGE_SIZE) or the
+    REST_FRAMEWORK PAGE_SIZE setting.
+    """
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        fields = [self.get_ordering_field(queryset, name.lstrip('-')) for name in self.ordering]
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, fields)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.has_next:
+            last = self.page[-1]
+            self.next_position = [self.serialize(getattr(last, name.lstrip('-'))) for name in self.ordering]
+        return self.page
+
+    @staticmethod
+    def get_ordering_field(queryset, name):
+        try:
+            return queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return queryset.query.annotations[name].output_field
+
+    @staticmethod
+    def serialize(value):
+        # Datas com microssegundos completos: truncar faria a próxima página repetir ou pular linhas
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if isinstance(value, (int, float, str)) or value is None:
+            return value
+        return str(value)
+
+    def after(self, position) -> Q:
+        """Keyset condition for the rows after `position`, expanded as `a > x OR (a = x AND b > y) ...`."""
+        conditions = []
+        for index, name in enumerate(self.ordering):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            equal = {previous.lstrip('-'): position[i] for i, previous in enumerate(self.ordering[:index])}
+            conditions.append(Q(**equal, **{f'{name.lstrip("-")}__{lookup}': position[index]}))
+        # Limite inclusivo na primeira coluna para o banco usar o índice como faixa
+        first = self.ordering[0]
+        bound = Q(**{f'{first.lstrip("-")}__{"lte" if first.startswith("-") else "gte"}': position[0]})
+        return bound & reduce(or_, conditions)
+
+    def get_page_size(self, request) -> int:
+        value = request.query_params.get(self.page_size_query_param)
+        if value and value.isdigit() and int(value) > 0:
+            return min(int(value), settings.API_MAX_PAGE_SIZE)
+        return api_settings.PAGE_SIZE
+
+    def decode_cursor(self, request, fields):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(urlsafe_b64decode(encoded.encode()).decode())
+            if len(values) != len(fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except Exception:
+            raise NotFound('Invalid cursor.')
+
+    def encode_cursor(self, position) -> str:
+        encoded = urlsafe_b64encode(json.dumps(position).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        return self.encode_cursor(self.next_position) if self.has_next else None
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class TicketPagination(KeysetPagination):
+    ordering = ('bought_at', 'id')
+
+
+class EventPagination(KeysetPagination):
+    ordering = ('start_date', 'id')
+
+
+class CategoryPagination(KeysetPagination):
+    ordering = ('name', 'id')
+
+
+class OrderPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ExportJobPagination(KeysetPagination):
+    ordering = ('-id',)
+
+
+class EventSearchPagination(KeysetPagination):
+    ordering = ('-rank', 'id')
@@ -0,0 +1,55 @@
+from django.conf import settings
+from core.redis_client import get_redis_client
+
+# Balde de tokens compartilhado: repõe `rate` tokens por segundo até `capacity`
+# e só entrega tokens acima de `floor`, a reserva das faixas mais prioritárias.
+# Usa o relógio do Redis para que todos os workers vejam o mesmo tempo.
+TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local floor = tonumber(ARGV[4])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated_at, 0) * rate)
+local taken = math.max(math.min(requested, math.floor(tokens - floor)), 0)
+tokens = tokens - taken
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+local wait = 0
+if taken < requested then
+    wait = (floor + 1 - tokens) / rate
+end
+return {taken, tostring(wait)}
+"""
+
+
+class TokenBucket:
+    """
+    Rate limiter shared by every process that talks to the same Redis.
+
+    `rate_per_minute` tokens are added continuously up to `capacity`. Callers of
+    lower priority pass a `reserve` fraction of the capacity they must leave
+    untouched, so bursts of higher-priority work always find tokens left.
+    """
+
+    def __init__(self, name: str, rate_per_minute: int, capacity: int, url: str = None):
+        self.key = f'rate_limit:{name}'
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity
+        self.client = get_redis_client(url or settings.RATE_LIMIT_REDIS_URL)
+        self._take = self.client.register_script(TAKE_SCRIPT)
+
+    def take(self, tokens: int, reserve: float = 0) -> tuple:
+        """
+        Takes up to `tokens` tokens. Returns how many were granted and, when that
+        is fewer than requested, the seconds until the next one becomes available.
+        """
+        taken, wait = self._take(
+            keys=[self.key],
+            args=[repr(self.rate), self.capacity, tokens, repr(reserve * self.capacity)],
+        )
+        return int(taken), float(wait)
@@ -0,0 +1,20 @@
+import redis
+
+_clients = {}
+
+
+def get_redis_client(url: str) -> redis.Redis:
+    """
+    Returns a process-wide Redis client for `url`. URLs starting with
+    `fakeredis://` get an in-memory stand-in (requires `fakeredis`), which is
+    what local runs and tests use instead of a real server.
+    """
+    client = _clients.get(url)
+    if client is None:
+        if url.startswith('fakeredis://'):
+            import fakeredis
+            client = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        else:
+            client = redis.Redis.from_url(url, decode_responses=True)
+        _clients[url] = client
+    return client
@@ -0,0 +1,115 @@
+import hashlib
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+# Versão dos relatórios que cruzam eventos; muda quando eventos ou tipos de ticket mudam.
+# Vendas e check-ins não a mudam: os relatórios de vendas entre eventos expiram sozinhos
+# (REPORT_SALES_CACHE_TIMEOUT), para que cada compra não zere o cache de todos os organizadores
+ALL_EVENTS = 'all'
+
+METRICS = ('hits', 'misses')
+
+
+def _version_key(scope) -> str:
+    return f'reports:version:{scope}'
+
+
+def _metric_key(view_name, metric) -> str:
+    return f'reports:metrics:{view_name}:{metric}'
+
+
+def _incr(key, initial) -> None:
+    if not cache.add(key, initial, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, initial, timeout=None)
+
+
+def get_version(scope) -> int:
+    """
+    Current report version of `scope` (an event id or ALL_EVENTS). A missing
+    counter starts from the clock, so a counter lost to eviction can never
+    come back with a value that matches entries cached before it was lost.
+    """
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_versions(event_ids, cross_event=True) -> None:
+    """
+    Invalidates the cached reports of `event_ids` and, unless `cross_event` is
+    False (sales and check-ins), every cross-event report. Runs after the
+    surrounding transaction commits, so a report recomputed in the meantime
+    can't be cached under the new version with the old data.
+    """
+    scopes = sorted({str(event_id) for event_id in event_ids}) + ([ALL_EVENTS] if cross_event else [])
+
+    def bump():
+        for scope in scopes:
+            _incr(_version_key(scope), time.time_ns())
+
+    transaction.on_commit(bump)
+
+
+def cached_report(view=None, *, timeout_setting='REPORT_CACHE_TIMEOUT'):
+    """
+    Caches the JSON response of a report view under the current version of its
+    event (or of all events when the URL has no `event_id`) for up to the
+    number of seconds in the `timeout_setting` setting. Entries are scoped to
+    the caller: admins share one entry, everyone else gets their own.
+
+    Must sit below `@permission_classes` so only authorized requests reach it.
+    """
+    if view is None:
+        return lambda view: cached_report(view, timeout_setting=timeout_setting)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        scope = kwargs.get('event_id', ALL_EVENTS)
+        caller = 'admin' if request.user.profile_type == 'ADMIN' else f'user:{request.user.id}'
+        path = hashlib.sha256(request.get_full_path().encode()).hexdigest()[:16]
+        key = f'reports:{view.__name__}:{scope}:{get_version(scope)}:{caller}:{path}'
+
+        cached = cache.get(key)
+        if cached is not None:
+            _incr(_metric_key(view.__name__, 'hits'), 1)
+            response = HttpResponse(cached['content'], content_type=cached['content_type'])
+            response['X-Report-Cache'] = 'HIT'
+            return response
+
+        _incr(_metric_key(view.__name__, 'misses'), 1)
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            cache.set(
+                key,
+                {'content': response.content, 'content_type': response['Content-Type']},
+                getattr(settings, timeout_setting),
+            )
+        response['X-Report-Cache'] = 'MISS'
+        return response
+
+    return wrapper
+
+
+def get_metrics(view_names) -> dict:
+    keys = [_metric_key(view_name, metric) for view_name in view_names for metric in METRICS]
+    values = cache.get_many(keys)
+    metrics = {}
+    for view_name in view_names:
+        hits = values.get(_metric_key(view_name, 'hits'), 0)
+        misses = values.get(_metric_key(view_name, 'misses'), 0)
+        metrics[view_name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0,
+        }
+    return metrics
@@ -0,0 +1,30 @@
+from rest_framework import serializers
+from events.models import Event
+from .models import ExportJob
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    event = serializers.PrimaryKeyRelatedField(queryset=Event.objects.all())
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            "id",
+            "event",
+            "kind",
+            "export_format",
+            "export_status",
+            "row_count",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "download_url",
+        ]
+        read_only_fields = ["export_status", "row_count", "error", "created_at", "started_at", "finished_at"]
+
+    def get_download_url(self, obj):
+        if obj.export_status != ExportJob.StatusChoices.COMPLETED:
+            return None
+        return f'/reports/exports/{obj.id}/download/'
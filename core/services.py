@@ -0,0 +1,199 @@
+import gzip
+import os
+import tempfile
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import QuerySet
+from django.forms import ValidationError
+from django.utils.timezone import now
+from core.models import ExportJob
+from core.streaming import csv_lines, ndjson_lines
+from events.models import Event
+from tickets.models import Ticket
+from tickets.services.sales_summary_services import UNSOLD_STATUSES
+from users.models import User
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Colunas de cada tipo de exportação: (nome da coluna, campo do ticket)
+EXPORT_COLUMNS = {
+    ExportJob.KindChoices.ATTENDEES: [
+        ('ticket_id', 'id'),
+        ('unique_code', 'unique_code'),
+        ('buyer_name', 'buyer__name'),
+        ('buyer_email', 'buyer__email'),
+        ('ticket_type', 'ticket_type__name'),
+        ('ticket_status', 'ticket_status'),
+        ('used_at', 'used_at'),
+    ],
+    ExportJob.KindChoices.SALES: [
+        ('ticket_id', 'id'),
+        ('order_id', 'order_id'),
+        ('buyer_email', 'buyer__email'),
+        ('ticket_type', 'ticket_type__name'),
+        ('ticket_status', 'ticket_status'),
+        ('price_paid', 'price_paid'),
+        ('bought_at', 'bought_at'),
+    ],
+}
+
+FILE_EXTENSIONS = {
+    ExportJob.FormatChoices.CSV: 'csv',
+    ExportJob.FormatChoices.NDJSON_GZ: 'ndjson.gz',
+    ExportJob.FormatChoices.PARQUET: 'parquet',
+}
+
+
+class ExportService:
+    """
+    Asynchronous attendee and sales exports of one event.
+
+    Jobs run on their own Celery queue and read tickets in keyset-ordered chunks
+    (`id > last id`), writing each chunk straight to a temporary file, so neither
+    the worker's memory nor a long-open cursor grows with the event size. Each
+    organizer may only have EXPORT_MAX_CONCURRENT_JOBS exports in flight.
+    """
+
+    @staticmethod
+    def get_jobs_for_user(user) -> QuerySet:
+        jobs = ExportJob.objects.select_related('event').order_by('-created_at')
+        if user.profile_type != 'ADMIN':
+            jobs = jobs.filter(organizer=user)
+        return jobs
+
+    @staticmethod
+    def create_job(user, event: Event, kind: str, export_format: str) -> ExportJob:
+        if user.profile_type != 'ADMIN' and event.organizer_id != user.id:
+            raise ValidationError('You can only export your own events.')
+        if export_format == ExportJob.FormatChoices.PARQUET and pyarrow is None:
+            raise ValidationError('Parquet exports require pyarrow to be installed.')
+
+        with transaction.atomic():
+            # Trava o organizador para que pedidos simultâneos não passem juntos pelo limite
+            User.objects.select_for_update().filter(pk=event.organizer_id).first()
+            running = ExportJob.objects.filter(
+                organizer_id=event.organizer_id,
+                export_status__in=[ExportJob.StatusChoices.PENDING, ExportJob.StatusChoices.RUNNING],
+                created_at__gte=now() - settings.EXPORT_JOB_TIMEOUT,
+            ).count()
+            if running >= settings.EXPORT_MAX_CONCURRENT_JOBS:
+                raise ValidationError(
+                    f'There are already {running} exports in progress for this organizer. Try again when one finishes.'
+                )
+            job = ExportJob.objects.create(
+                requested_by=user,
+                organizer_id=event.organizer_id,
+                event=event,
+                kind=kind,
+                export_format=export_format,
+                created_at=now(),
+            )
+        return job
+
+    @staticmethod
+    def run(job: ExportJob) -> ExportJob:
+        job.export_status = ExportJob.StatusChoices.RUNNING
+        job.started_at = now()
+        job.save(update_fields=['export_status', 'started_at'])
+
+        columns = [column for column, _ in EXPORT_COLUMNS[job.kind]]
+        fd, path = tempfile.mkstemp(suffix=f'.{FILE_EXTENSIONS[job.export_format]}')
+        os.close(fd)
+        try:
+            job.row_count = ExportService._write(job, columns, ExportService.iter_chunks(job), path)
+            with open(path, 'rb') as artifact:
+                job.file.save(
+                    f'{job.kind.lower()}-event-{job.event_id}-{job.id}.{FILE_EXTENSIONS[job.export_format]}',
+                    File(artifact),
+                    save=False,
+                )
+            job.export_status = ExportJob.StatusChoices.COMPLETED
+        except Exception as e:
+            job.export_status = ExportJob.StatusChoices.FAILED
+            job.error = str(e)
+        finally:
+            os.remove(path)
+
+        job.finished_at = now()
+        job.save(update_fields=['export_status', 'file', 'row_count', 'error', 'finished_at'])
+        return job
+
+    @staticmethod
+    def iter_chunks(job: ExportJob):
+        """Yields lists of row dicts, EXPORT_CHUNK_SIZE at a time, ordered by ticket id."""
+        tickets = Ticket.objects.filter(ticket_type__event_id=job.event_id)
+        if job.kind == ExportJob.KindChoices.ATTENDEES:
+            tickets = tickets.filter(ticket_status__in=[Ticket.TicketStatusChoices.ACTIVE, Ticket.TicketStatusChoices.USED])
+        else:
+            tickets = tickets.exclude(ticket_status__in=UNSOLD_STATUSES)
+
+        columns, fields = zip(*EXPORT_COLUMNS[job.kind])
+        last_id = 0
+        while True:
+            rows = list(
+                tickets.filter(id__gt=last_id).order_by('id').values_list(*fields)[:settings.EXPORT_CHUNK_SIZE]
+            )
+            if not rows:
+                return
+            yield [dict(zip(columns, row)) for row in rows]
+            last_id = rows[-1][0]
+
+    @staticmethod
+    def _write(job: ExportJob, columns, chunks, path) -> int:
+        rows = 0
+        if job.export_format == ExportJob.FormatChoices.PARQUET:
+            schema = ExportService._parquet_schema(columns)
+            with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+                for chunk in chunks:
+                    writer.write_table(pyarrow.Table.from_pylist(chunk, schema=schema))
+                    rows += len(chunk)
+            return rows
+
+        if job.export_format == ExportJob.FormatChoices.NDJSON_GZ:
+            output = gzip.open(path, 'wt', encoding='utf-8')
+        else:
+            output = open(path, 'w', encoding='utf-8', newline='')
+        with output:
+            if job.export_format == ExportJob.FormatChoices.CSV:
+                output.writelines(csv_lines([], columns))
+            for chunk in chunks:
+                if job.export_format == ExportJob.FormatChoices.CSV:
+                    output.writelines(csv_lines(chunk, columns, header=False))
+                else:
+                    output.writelines(ndjson_lines(chunk))
+                rows += len(chunk)
+        return rows
+
+    @staticmethod
+    def _parquet_schema(columns):
+        # Esquema fixo: inferir a partir do primeiro bloco falharia em colunas vazias nele (ex: used_at)
+        types = {
+            'ticket_id': pyarrow.int64(),
+            'order_id': pyarrow.int64(),
+            'price_paid': pyarrow.decimal128(10, 2),
+            'used_at': pyarrow.timestamp('us', tz='UTC'),
+            'bought_at': pyarrow.timestamp('us', tz='UTC'),
+        }
+        return pyarrow.schema([(column, types.get(column, pyarrow.string())) for column in columns])
+
+    @staticmethod
+    def purge_expired() -> int:
+        """
+        Deletes jobs (and files) older than EXPORT_RETENTION and fails jobs that
+        outlived EXPORT_JOB_TIMEOUT, freeing their organizer's concurrency slot.
+        """
+        ExportJob.objects.filter(
+            export_status__in=[ExportJob.StatusChoices.PENDING, ExportJob.StatusChoices.RUNNING],
+            created_at__lt=now() - settings.EXPORT_JOB_TIMEOUT,
+        ).update(export_status=ExportJob.StatusChoices.FAILED, error='Timed out.', finished_at=now())
+
+        expired = ExportJob.objects.filter(created_at__lt=now() - settings.EXPORT_RETENTION)
+        for job in expired.exclude(file='').exclude(file__isnull=True):
+            job.file.delete(save=False)
+        deleted, _ = expired.delete()
+        return deleted
@@ -0,0 +1,124 @@
+import csv
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import make_aware, is_naive
+from datetime import datetime, time
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# Tamanho mínimo dos blocos enviados ao cliente, para não gerar uma escrita por linha
+BUFFER_SIZE = 64 * 1024
+
+
+class _Echo:
+    """Pseudo-buffer for csv.writer: returns each formatted line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def json_array(records):
+    encoder = DjangoJSONEncoder()
+    separator = '['
+    for record in records:
+        yield separator + encoder.encode(record)
+        separator = ','
+    yield ']' if separator == ',' else '[]'
+
+
+def ndjson_lines(records):
+    encoder = DjangoJSONEncoder()
+    for record in records:
+        yield encoder.encode(record) + '\n'
+
+
+def csv_lines(records, columns, header=True):
+    writer = csv.writer(_Echo())
+    if header:
+        yield writer.writerow(columns)
+    for record in records:
+        yield writer.writerow([record[column] for column in columns])
+
+
+def encode(records, output, columns):
+    """Serializes `records` (dicts) as `output`, yielding text pieces."""
+    if output == 'ndjson':
+        return ndjson_lines(records)
+    if output == 'csv':
+        return csv_lines(records, columns)
+    return json_array(records)
+
+
+def buffered(pieces, size=BUFFER_SIZE):
+    """Joins text pieces into UTF-8 blocks of at least `size` bytes."""
+    buffer, length = [], 0
+    for piece in pieces:
+        data = piece.encode()
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def gzipped(blocks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(request) -> bool:
+    return 'gzip' in request.headers.get('Accept-Encoding', '')
+
+
+def stream_records(request, records, columns, filename):
+    """
+    Streams `records` in the format chosen by `?output=json|ndjson|csv` (JSON by
+    default), gzip-compressed when the client accepts it. Nothing is
+    materialized, so memory stays flat however many rows the iterator yields.
+    """
+    output = request.GET.get('output', 'json')
+    if output not in CONTENT_TYPES:
+        return JsonResponse({'detail': f"Invalid output '{output}'. Use one of: {', '.join(CONTENT_TYPES)}."}, status=400)
+
+    blocks = buffered(encode(records, output, columns))
+    compress = accepts_gzip(request)
+    response = StreamingHttpResponse(gzipped(blocks) if compress else blocks, content_type=CONTENT_TYPES[output])
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    response['Vary'] = 'Accept-Encoding'
+    if output == 'csv':
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def parse_date_range(request):
+    """
+    Reads `?start=` and `?end=` (ISO dates or datetimes). A bare end date covers
+    the whole day. Raises ValueError on malformed values.
+    """
+    bounds = []
+    for name, day_time in (('start', time.min), ('end', time.max)):
+        value = request.GET.get(name)
+        if not value:
+            bounds.append(None)
+            continue
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(f"Invalid '{name}' date: {value}.")
+            parsed = datetime.combine(day, day_time)
+        bounds.append(make_aware(parsed) if is_naive(parsed) else parsed)
+    return bounds
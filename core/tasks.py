@@ -0,0 +1,36 @@
+from celery import shared_task
+from django.utils.timezone import now
+from core.models import IdempotencyKey, ExportJob
+from core.services import ExportService
+
+
+@shared_task
+def purge_expired_idempotency_keys():
+    """
+    Remove as chaves de idempotência cujo prazo de reaproveitamento (ou lease, se
+    ainda em andamento) expirou.
+    """
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now()).delete()
+    return f"Chaves de idempotência removidas: {deleted}"
+
+
+@shared_task
+def run_export_job(job_id):
+    """
+    Gera o arquivo de uma exportação pendente. Roda na fila 'exports', separada
+    dos e-mails, para que exportações grandes não atrasem as demais tarefas.
+    """
+    job = ExportJob.objects.filter(pk=job_id, export_status=ExportJob.StatusChoices.PENDING).first()
+    if job is None:
+        return f"Exportação {job_id} não está pendente."
+    job = ExportService.run(job)
+    return f"Exportação {job.id}: {job.export_status} ({job.row_count} linhas)"
+
+
+@shared_task
+def purge_expired_exports():
+    """
+    Remove as exportações (e seus arquivos) fora do prazo de retenção.
+    """
+    deleted = ExportService.purge_expired()
+    return f"Exportações removidas: {deleted}"
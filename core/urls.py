@@ -1,17 +1,29 @@
 from django.urls import path
 from .views import (ticket_sales_report,
+                    organizer_ticket_sales_report,
                     ticket_status_report,
                     event_attendance,
                     ticket_type_list_for_published_events,
                     ticket_sales_detail,
-                    events_with_ticket_types)
+                    events_with_ticket_types,
+                    report_cache_metrics,
+                    export_jobs,
+                    export_job_detail,
+                    export_job_download)
 
 urlpatterns = [
     #Relatorio Gerais
     path('ticket_sales/<int:event_id>', ticket_sales_report),
+    path('ticket_sales/', organizer_ticket_sales_report),
     path('ticket_status/<int:event_id>', ticket_status_report),
     path('event_attendance/<int:event_id>', event_attendance),
     path('ticket_type_list_for_published_events/', ticket_type_list_for_published_events),
     path('ticket_sales_detail/', ticket_sales_detail),
-    path('events_with_ticket_types/', events_with_ticket_types)
+    path('events_with_ticket_types/', events_with_ticket_types),
+    path('cache_metrics/', report_cache_metrics),
+
+    #Exportações assíncronas
+    path('exports/', export_jobs),
+    path('exports/<int:job_id>/', export_job_detail),
+    path('exports/<int:job_id>/download/', export_job_download)
 ]
@@ -1,43 +1,128 @@
+from itertools import groupby
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
-from django.db.models import Sum, Count
+from django.http import JsonResponse, FileResponse
+from django.db import transaction
+from django.db.models import Sum, F
+from django.forms import ValidationError
 from rest_framework.decorators import api_view, permission_classes
 from core.permissions import IsAdminUser, IsOrganizerUser, IsParticipantUser
-from tickets.models import Ticket, TicketType
+from core.report_cache import cached_report, get_metrics
+from core.streaming import stream_records, parse_date_range
+from core.models import ExportJob
+from core.pagination import ExportJobPagination
+from core.serializer import ExportJobSerializer
+from core.services import ExportService
+from core.tasks import run_export_job
+from tickets.models import Ticket, TicketType, TicketTypeSalesSummary
+from tickets.services.sales_summary_services import UNSOLD_STATUSES
 from events.models import Event
 
+# Linhas lidas do banco por bloco nos relatórios em streaming
+STREAM_CHUNK_SIZE = 2000
+
+# Tickets emitidos: todos os status, exceto reservas expiradas
+ISSUED_STATUSES = [value for value in Ticket.TicketStatusChoices.values if value != Ticket.TicketStatusChoices.EXPIRED]
+
+
+def summary_count(statuses):
+    """Soma das colunas de contagem do resumo de vendas para os status informados."""
+    fields = [F(TicketTypeSalesSummary.count_field(value)) for value in statuses]
+    total = fields[0]
+    for field in fields[1:]:
+        total = total + field
+    return total
+
+
+def ticket_sales_rows(ticket_types):
+    """
+    Vendas por tipo de ticket lidas da tabela de resumo (uma linha por tipo):
+    quantidade vendida, receita e contagem de tickets em cada status.
+    """
+    return (
+        ticket_types
+        .values(
+            'id', 'name', 'event_id', 'event__title', 'sales_summary__revenue',
+            *[f'sales_summary__{TicketTypeSalesSummary.count_field(value)}' for value in Ticket.TicketStatusChoices.values],
+        )
+        .order_by('event_id', 'id')
+    )
+
+
+def ticket_sales_entry(row):
+    tickets_by_status = {
+        value: row[f'sales_summary__{TicketTypeSalesSummary.count_field(value)}'] or 0
+        for value in Ticket.TicketStatusChoices.values
+    }
+    return {
+        'ticket_type_id': row['id'],
+        'ticket_type_name': row['name'],
+        'tickets_sold': sum(total for value, total in tickets_by_status.items() if value not in UNSOLD_STATUSES),
+        'revenue': float(row['sales_summary__revenue'] or 0),
+        'tickets_by_status': tickets_by_status,
+    }
+
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser | IsOrganizerUser])
+@cached_report
 def ticket_sales_report(request, event_id):
+    """
+    Endpoint para obter o relatório de vendas por tipo de ticket de um evento.
+
+    Parâmetros:
+        - event_id (int): ID do evento.
+
+    Retorno:
+        - JSON com tickets vendidos, receita e contagem por status de cada tipo de ticket.
+    """
     event = get_object_or_404(Event, pk=event_id)
-    ticket_types = TicketType.objects.filter(event=event)
-    
-    report_data = []
-    for ticket_type in ticket_types:
-        tickets_sold = Ticket.objects.filter(ticket_type=ticket_type).exclude(ticket_status=Ticket.TicketStatusChoices.PENDING_PAYMENT).count()
-        
-        revenue = Ticket.objects.filter(ticket_type=ticket_type).exclude(ticket_status=Ticket.TicketStatusChoices.PENDING_PAYMENT).aggregate(
-            total_revenue=Sum('price_paid')
-        )['total_revenue'] or 0.00
-        
-        report_data.append({
-            'ticket_type_id': ticket_type.id,
-            'ticket_type_name': ticket_type.name,
-            'tickets_sold': tickets_sold,
-            'revenue': float(revenue),
-        })
+    rows = ticket_sales_rows(TicketType.objects.filter(event=event))
 
     # Retorna os dados do relatório em formato JSON
     return JsonResponse({
         'event_id': event.id,
         'event_name': event.title,
-        'ticket_sales_report': report_data,
+        'ticket_sales_report': [ticket_sales_entry(row) for row in rows],
     })
 
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser | IsOrganizerUser])
+@cached_report(timeout_setting='REPORT_SALES_CACHE_TIMEOUT')
+def organizer_ticket_sales_report(request):
+    """
+    Endpoint para obter o relatório de vendas de todos os eventos de um organizador em uma chamada.
+    Organizadores veem seus próprios eventos; administradores podem filtrar por ?organizer_id=.
+
+    Retorno:
+        - JSON com o relatório de vendas por tipo de ticket, agrupado por evento.
+    """
+    ticket_types = TicketType.objects.all()
+    if request.user.profile_type != 'ADMIN':
+        ticket_types = ticket_types.filter(event__organizer=request.user)
+    elif request.GET.get('organizer_id'):
+        ticket_types = ticket_types.filter(event__organizer_id=request.GET['organizer_id'])
+
+    events = {}
+    for row in ticket_sales_rows(ticket_types):
+        event = events.setdefault(row['event_id'], {
+            'event_id': row['event_id'],
+            'event_name': row['event__title'],
+            'tickets_sold': 0,
+            'revenue': 0.0,
+            'ticket_sales_report': [],
+        })
+        entry = ticket_sales_entry(row)
+        event['tickets_sold'] += entry['tickets_sold']
+        event['revenue'] += entry['revenue']
+        event['ticket_sales_report'].append(entry)
+
+    return JsonResponse({'events': list(events.values())})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser | IsOrganizerUser])
+@cached_report
 def ticket_status_report(request, event_id):
     """
     Endpoint para obter um relatório de contagem total de tickets por tipo de ticket para um evento.
@@ -50,11 +135,12 @@ def ticket_status_report(request, event_id):
     """
     event = get_object_or_404(Event, pk=event_id)
 
-    # Agrupa os tickets por tipo de ticket e calcula o total
+    # Agrupa os resumos de venda por tipo de ticket e soma os tickets emitidos
     ticket_counts = (
-        Ticket.objects.filter(ticket_type__event=event)
+        TicketTypeSalesSummary.objects.filter(ticket_type__event=event)
         .values('ticket_type__name')  # Usa o nome do tipo de ticket
-        .annotate(total=Count('id'))  # Conta o número de tickets
+        .annotate(total=Sum(summary_count(ISSUED_STATUSES)))
+        .order_by('ticket_type__name')
     )
 
     # Converte os dados em uma lista formatada
@@ -73,6 +159,7 @@ def ticket_status_report(request, event_id):
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser | IsOrganizerUser])
+@cached_report
 def event_attendance(request, event_id):
     """
     Endpoint para obter a taxa de participação em um evento com base nos tickets usados.
@@ -84,11 +171,13 @@ def event_attendance(request, event_id):
         - JSON com o total de tickets emitidos, usados e a taxa de participação.
     """
     event = get_object_or_404(Event, pk=event_id)
-    # Contar o número total de tickets emitidos para o evento
-    total_tickets = Ticket.objects.filter(ticket_type__event=event).count()
-
-    # Contar o número de tickets com status "USED" associados ao evento
-    used_tickets = Ticket.objects.filter(ticket_type__event=event, ticket_status='USED').count()
+    # Soma os resumos de venda dos tipos de ticket do evento: tickets emitidos e usados
+    totals = TicketTypeSalesSummary.objects.filter(ticket_type__event=event).aggregate(
+        total_tickets=Sum(summary_count(ISSUED_STATUSES)),
+        used_tickets=Sum('used_count'),
+    )
+    total_tickets = totals['total_tickets'] or 0
+    used_tickets = totals['used_tickets'] or 0
 
     # Calcula a taxa de participação (attendance rate)
     attendance_rate = (used_tickets / total_tickets * 100) if total_tickets > 0 else 0
@@ -103,6 +192,7 @@ def event_attendance(request, event_id):
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser | IsOrganizerUser])
+@cached_report
 def ticket_type_list_for_published_events(request):
     """
     Endpoint para obter uma lista de IDs e nomes dos tipos de tickets para eventos publicados.
@@ -120,24 +210,38 @@ def ticket_type_list_for_published_events(request):
 def ticket_sales_detail(request):
     """
     Endpoint para obter um relatório detalhado de tickets vendidos, incluindo comprador e tipo de ticket.
-    
+    Os tickets são lidos em blocos e enviados conforme são lidos, com memória constante.
+
+    Parâmetros (query string):
+        - event_id (int): filtra pelo evento.
+        - start, end (data ISO): filtra pela data de compra.
+        - output: json (padrão), ndjson ou csv. A resposta é compactada com gzip quando o cliente aceita.
+
     Retorno:
-        - JSON contendo detalhes de cada ticket vendido.
+        - Lista com os detalhes de cada ticket vendido.
     """
-    tickets = Ticket.objects.select_related('buyer', 'ticket_type').filter(ticket_status='ACTIVE')
+    try:
+        start, end = parse_date_range(request)
+    except ValueError as e:
+        return JsonResponse({'detail': str(e)}, status=400)
+    if not request.GET.get('event_id', '0').isdigit():
+        return JsonResponse({'detail': 'Invalid event_id.'}, status=400)
 
-    # Construindo o relatório
-    report_data = [
-        {
-            "ticket_id": ticket.id,
-            "buyer": ticket.buyer.name,
-            "ticket_type": ticket.ticket_type.name,
-            "price_paid": ticket.price_paid
-        }
-        for ticket in tickets
-    ]
+    tickets = Ticket.objects.filter(ticket_status='ACTIVE')
+    if request.GET.get('event_id'):
+        tickets = tickets.filter(ticket_type__event_id=request.GET['event_id'])
+    if start:
+        tickets = tickets.filter(bought_at__gte=start)
+    if end:
+        tickets = tickets.filter(bought_at__lte=end)
 
-    return JsonResponse(report_data, safe=False)
+    rows = (
+        tickets.order_by('id')
+        .values_list('id', 'buyer__name', 'ticket_type__name', 'price_paid', 'ticket_type__event_id', 'bought_at')
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+    columns = ['ticket_id', 'buyer', 'ticket_type', 'price_paid', 'event_id', 'bought_at']
+    return stream_records(request, (dict(zip(columns, row)) for row in rows), columns, 'ticket_sales_detail')
 
 
 @api_view(['GET'])
@@ -145,18 +249,139 @@ def ticket_sales_detail(request):
 def events_with_ticket_types(request):
     """
     Endpoint para obter um relatório de eventos com seus respectivos tipos de tickets.
-    
+    Lê apenas os nomes, em blocos ordenados por evento, com memória constante.
+
+    Parâmetros (query string):
+        - event_id (int): filtra pelo evento.
+        - start, end (data ISO): filtra pela data de início do evento.
+        - output: json (padrão), ndjson ou csv. A resposta é compactada com gzip quando o cliente aceita.
+
     Retorno:
-        - JSON contendo os eventos e os tipos de tickets disponíveis para cada um.
+        - Lista com os eventos e os tipos de tickets disponíveis para cada um.
     """
-    events = Event.objects.prefetch_related('ticket_types')
+    try:
+        start, end = parse_date_range(request)
+    except ValueError as e:
+        return JsonResponse({'detail': str(e)}, status=400)
+    if not request.GET.get('event_id', '0').isdigit():
+        return JsonResponse({'detail': 'Invalid event_id.'}, status=400)
 
-    report_data = [
+    events = Event.objects.all()
+    if request.GET.get('event_id'):
+        events = events.filter(pk=request.GET['event_id'])
+    if start:
+        events = events.filter(start_date__gte=start)
+    if end:
+        events = events.filter(start_date__lte=end)
+
+    rows = (
+        events.order_by('id', 'ticket_types__id')
+        .values_list('id', 'title', 'ticket_types__name')
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+    records = (
         {
-            "event_name": event.title,
-            "ticket_types": [ticket_type.name for ticket_type in event.ticket_types.all()]
+            "event_id": event_id,
+            "event_name": event_name,
+            "ticket_types": [name for _, _, name in group if name is not None],
         }
-        for event in events
-    ]
+        for (event_id, event_name), group in groupby(rows, key=lambda row: row[:2])
+    )
+    if request.GET.get('output') == 'csv':
+        records = ({**record, "ticket_types": '|'.join(record["ticket_types"])} for record in records)
+    return stream_records(request, records, ['event_id', 'event_name', 'ticket_types'], 'events_with_ticket_types')
+
+
+CACHED_REPORTS = [
+    'ticket_sales_report',
+    'organizer_ticket_sales_report',
+    'ticket_status_report',
+    'event_attendance',
+    'ticket_type_list_for_published_events',
+]
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def report_cache_metrics(request):
+    """
+    Endpoint para obter os acertos e falhas do cache de cada relatório.
+
+    Retorno:
+        - JSON com hits, misses e taxa de acerto por relatório.
+    """
+    return JsonResponse(get_metrics(CACHED_REPORTS))
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAdminUser | IsOrganizerUser])
+def export_jobs(request):
+    """
+    Endpoint para listar e solicitar exportações assíncronas de participantes ou vendas de um evento.
+    O arquivo é gerado em segundo plano; consulte o status em exports/<id>/ e baixe quando concluído.
+
+    Parâmetros (POST):
+        - event (int): ID do evento.
+        - kind: ATTENDEES ou SALES.
+        - export_format: CSV (padrão), NDJSON_GZ ou PARQUET.
+
+    Retorno:
+        - GET: página da lista de exportações do usuário (paginação por cursor).
+        - POST: exportação criada, com status PENDING (202).
+    """
+    if request.method == 'GET':
+        jobs = ExportService.get_jobs_for_user(request.user)
+        paginator = ExportJobPagination()
+        page = paginator.paginate_queryset(jobs, request)
+        return paginator.get_paginated_response(ExportJobSerializer(page, many=True).data)
 
-    return JsonResponse(report_data, safe=False)
+    serializer = ExportJobSerializer(data=request.data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    try:
+        job = ExportService.create_job(
+            request.user,
+            serializer.validated_data['event'],
+            serializer.validated_data['kind'],
+            serializer.validated_data.get('export_format', ExportJob.FormatChoices.CSV),
+        )
+    except ValidationError as e:
+        return JsonResponse({'detail': e.messages[0]}, status=400)
+
+    # Só enfileira depois do commit, para o worker encontrar a exportação
+    transaction.on_commit(lambda: run_export_job.delay(job.id))
+    return JsonResponse(ExportJobSerializer(job).data, status=202)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser | IsOrganizerUser])
+def export_job_detail(request, job_id):
+    """
+    Endpoint para consultar o status de uma exportação.
+
+    Parâmetros:
+        - job_id (int): ID da exportação.
+
+    Retorno:
+        - JSON com o status, o número de linhas e o link de download quando concluída.
+    """
+    job = get_object_or_404(ExportService.get_jobs_for_user(request.user), pk=job_id)
+    return JsonResponse(ExportJobSerializer(job).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser | IsOrganizerUser])
+def export_job_download(request, job_id):
+    """
+    Endpoint para baixar o arquivo de uma exportação concluída.
+
+    Parâmetros:
+        - job_id (int): ID da exportação.
+
+    Retorno:
+        - O arquivo gerado, enviado em blocos.
+    """
+    job = get_object_or_404(ExportService.get_jobs_for_user(request.user), pk=job_id)
+    if job.export_status != ExportJob.StatusChoices.COMPLETED:
+        return JsonResponse({'detail': f'Export is {job.export_status.lower()}.'}, status=409)
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.file.name.rsplit('/', 1)[-1])
@@ -0,0 +1,65 @@
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.forms import ValidationError
+from events.services import EventImportService, IMPORT_FORMATS, EVENT_OWNER_PROFILE_TYPES
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Imports an event catalog (events, categories and ticket types) from a JSON or CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSON list of events with nested ticket_types, or CSV with one row per ticket type grouped by ref.')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='File format; inferred from the extension by default.')
+        parser.add_argument('--organizer', help='Email of the organizer owning every event; by default each event names its own.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and show what would be created without writing.')
+        parser.add_argument('--batch-size', type=int, help='Events validated and inserted per transaction.')
+        parser.add_argument('--errors', help='Write the per-row errors to this NDJSON file instead of the output.')
+
+    def handle(self, *args, **options):
+        import_format = options['format'] or ('csv' if options['path'].lower().endswith('.csv') else 'json')
+        if not os.path.exists(options['path']):
+            raise CommandError(f"File not found: {options['path']}")
+
+        organizer = None
+        if options['organizer']:
+            organizer = User.objects.filter(
+                email=User.objects.normalize_email(options['organizer']), profile_type__in=EVENT_OWNER_PROFILE_TYPES
+            ).first()
+            if organizer is None:
+                raise CommandError(f"Organizer not found: {options['organizer']}")
+
+        started = time.perf_counter()
+        with open(options['path'], 'rb') as file:
+            try:
+                events = EventImportService.read_events(file, import_format)
+            except ValidationError as e:
+                raise CommandError(e.message)
+        result = EventImportService.import_events(
+            events, organizer=organizer, dry_run=options['dry_run'], batch_size=options['batch_size']
+        )
+        elapsed = time.perf_counter() - started
+
+        for change in result.get('changes', []):
+            sign = '+' if change['action'] == 'create' else '='
+            self.stdout.write(
+                f"{sign} Row {change['row']}: {change['title']} ({change['start_date']:%Y-%m-%d %H:%M}) "
+                f"by {change['organizer']}, {len(change['categories'])} categories, {len(change['ticket_types'])} ticket types"
+            )
+
+        if options['errors']:
+            with open(options['errors'], 'w') as output:
+                output.writelines(json.dumps(error, cls=DjangoJSONEncoder) + '\n' for error in result['errors'])
+        else:
+            for error in result['errors']:
+                self.stdout.write(f"Row {error['row']} ({error['title']}): {' '.join(error['errors'])}")
+
+        verb = 'Would create' if options['dry_run'] else 'Created'
+        summary = (
+            f"{verb} {result['created']} events with {result['ticket_types']} ticket types, skipped {result['skipped']} "
+            f"existing and rejected {result['failed']} events in {elapsed:.1f}s."
+        )
+        self.stdout.write(self.style.WARNING(summary) if result['failed'] else self.style.SUCCESS(summary))
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_alter_category_table_alter_event_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='waiting_room_enabled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='waiting_room_rate',
+            field=models.PositiveIntegerField(default=120),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='waiting_room_window',
+            field=models.PositiveIntegerField(default=10),
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:59
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# PostgreSQL: trigger que recalcula o tsvector a cada INSERT/UPDATE (inclusive bulk_create)
+POSTGRES_FORWARD = [
+    """
+    CREATE FUNCTION events_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('portuguese', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('portuguese', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('portuguese', coalesce(NEW.location, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER events_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, description, location, search_vector ON events
+    FOR EACH ROW EXECUTE FUNCTION events_search_vector_update();
+    """,
+    "CREATE INDEX events_search_vector_idx ON events USING gin (search_vector);",
+    "UPDATE events SET search_vector = NULL;",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS events_search_vector_idx;",
+    "DROP TRIGGER IF EXISTS events_search_vector_trigger ON events;",
+    "DROP FUNCTION IF EXISTS events_search_vector_update();",
+]
+
+# SQLite (ambiente local): tabela FTS5 de conteúdo externo, sincronizada por triggers.
+# Migrações que recriam a tabela events no SQLite descartam os triggers; recrie-os voltando a 0005.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE events_search USING fts5(
+        title, description, location,
+        content='events', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    );
+    """,
+    """
+    CREATE TRIGGER events_search_insert AFTER INSERT ON events BEGIN
+        INSERT INTO events_search(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END;
+    """,
+    """
+    CREATE TRIGGER events_search_delete AFTER DELETE ON events BEGIN
+        INSERT INTO events_search(events_search, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+    END;
+    """,
+    """
+    CREATE TRIGGER events_search_update AFTER UPDATE OF title, description, location ON events BEGIN
+        INSERT INTO events_search(events_search, rowid, title, description, location)
+        VALUES ('delete', old.id, old.title, old.description, old.location);
+        INSERT INTO events_search(rowid, title, description, location)
+        VALUES (new.id, new.title, new.description, new.location);
+    END;
+    """,
+    "INSERT INTO events_search(events_search) VALUES ('rebuild');",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS events_search_insert;",
+    "DROP TRIGGER IF EXISTS events_search_delete;",
+    "DROP TRIGGER IF EXISTS events_search_update;",
+    "DROP TABLE IF EXISTS events_search;",
+]
+
+
+def run_statements(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_cursor_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        # O índice GIN só existe no PostgreSQL; o estado do modelo o registra em todos os bancos
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='event',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='events_search_vector_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(
+                    run_statements({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+                    run_statements({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+                ),
+            ],
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.text import slugify
 from django.forms import ValidationError
 from users.models import User
@@ -22,17 +24,29 @@ class Event(models.Model):
     event_status = models.CharField(max_length=20, choices=EventStatusChoices.choices, default=EventStatusChoices.SKETCH, null=False, blank=False)
     organizer = models.ForeignKey(User, related_name='events', on_delete=models.CASCADE)
     categories = models.ManyToManyField('Category', related_name='events')	
+    waiting_room_enabled = models.BooleanField(default=False)
+    waiting_room_rate = models.PositiveIntegerField(default=120)  # compradores admitidos por minuto
+    waiting_room_window = models.PositiveIntegerField(default=10)  # minutos para concluir a compra após a admissão
     created_at = models.DateTimeField(editable=False)
     last_modified = models.DateTimeField()
+    # Mantido por trigger no PostgreSQL (título, descrição e local); no SQLite a busca usa a tabela FTS5 events_search
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
 
     class Meta:
         db_table = 'events'
+        indexes = [
+            models.Index(fields=['start_date', 'id'], name='events_start_date_id_idx'),
+            models.Index(fields=['organizer', 'start_date', 'id'], name='events_org_start_date_idx'),
+            GinIndex(fields=['search_vector'], name='events_search_vector_idx'),
+        ]
 
     def clean(self):
         if self.start_date > self.end_date:
             raise ValidationError('The start date must be before the end date')       
         if self.total_capacity < 1:
             raise ValidationError('The total capacity must be greater than zero')
+        if self.waiting_room_enabled and (self.waiting_room_rate < 1 or self.waiting_room_window < 1):
+            raise ValidationError('The waiting room rate and window must be greater than zero')
         
     def save(self, *args, **kwargs):
         self.clean()
@@ -25,6 +25,9 @@ class EventRegisterSerializer(serializers.ModelSerializer):
             "organizer",
             "categories",
             "event_status",
+            "waiting_room_enabled",
+            "waiting_room_rate",
+            "waiting_room_window",
         ]
 
     def create(self, validated_data):
@@ -1,6 +1,24 @@
-from django.db.models import QuerySet
+import csv
+import io
+import json
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import QuerySet, Count, F, FloatField, Max, Q
+from django.db.models.expressions import RawSQL
+from django.forms import ValidationError
+from django.utils.text import slugify
+from django.utils.timezone import now, make_aware, is_naive
+from core.conditional import version_tag
+from core.report_cache import bump_versions
+from tickets.models import TicketType, TicketTypeSalesSummary
+from tickets.services.inventory_services import InventoryService
+from users.models import User, UserProfileType
 from .models import Event, Category
 
+# Configuração de idioma do tsvector; deve ser a mesma do trigger da migração 0006_event_search
+SEARCH_CONFIG = 'portuguese'
+
 class EventService:
     @staticmethod
     def get_all_events() -> QuerySet:
@@ -14,6 +32,20 @@ class EventService:
     def get_event_by_id(event_id: int) -> Event:
         return Event.objects.select_related('organizer').prefetch_related('categories').get(pk=event_id)
     
+    @staticmethod
+    def get_event_version(event_id: int):
+        """`(etag, last_modified)` of one event, read without loading it; None if it doesn't exist."""
+        last_modified = Event.objects.filter(pk=event_id).values_list('last_modified', flat=True).first()
+        if last_modified is None:
+            return None
+        return version_tag('event', event_id, last_modified), last_modified
+
+    @staticmethod
+    def get_events_version():
+        """`(etag, last_modified)` of the event list: latest change plus row count, which also catches deletions."""
+        version = Event.objects.aggregate(last_modified=Max('last_modified'), total=Count('id'))
+        return version_tag('events', version['total'], version['last_modified'] or 0), version['last_modified']
+
     @staticmethod
     def create_event(validated_data, organizer) -> Event:
         categories = validated_data.pop('categories', None)
@@ -21,6 +53,7 @@ class EventService:
         event = Event.objects.create(**validated_data)     
         if categories:
             event.categories.set(categories)
+        bump_versions([event.id])
         return event
     
     @staticmethod
@@ -28,10 +61,12 @@ class EventService:
         for key, value in validated_data.items():
             setattr(event, key, value)
         event.save()
+        bump_versions([event.id])
         return event
     
     @staticmethod
     def delete_event(event) -> None:
+        bump_versions([event.id])
         event.delete()
 
 
@@ -58,3 +93,375 @@ class CategoryService:
     @staticmethod
     def delete_category(category) -> None:
         category.delete()
+
+
+class EventSearchService:
+    """
+    Full-text search over event title, description and location.
+
+    PostgreSQL matches against `events.search_vector` (GIN-indexed, kept current
+    by a trigger) and ranks with `ts_rank`, weighting title over description
+    over location. SQLite, used for local testing, matches against the FTS5
+    table `events_search` and ranks with `bm25` using the same weighting.
+    """
+
+    @staticmethod
+    def filter_events(events, text=None, categories=None, statuses=None, start=None, end=None) -> QuerySet:
+        if text:
+            events = EventSearchService.match(events, text)
+        if categories:
+            # Subconsulta na tabela de ligação: um join repetiria eventos com várias categorias escolhidas
+            events = events.filter(
+                id__in=Event.categories.through.objects.filter(category_id__in=categories).values('event_id')
+            )
+        if statuses:
+            events = events.filter(event_status__in=statuses)
+        if start:
+            events = events.filter(start_date__gte=start)
+        if end:
+            events = events.filter(start_date__lte=end)
+        return events
+
+    @staticmethod
+    def match(events, text) -> QuerySet:
+        if connection.vendor == 'postgresql':
+            return events.filter(search_vector=SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch'))
+        return events.filter(
+            id__in=RawSQL('SELECT rowid FROM events_search WHERE events_search MATCH %s', (EventSearchService.fts_query(text),))
+        )
+
+    @staticmethod
+    def rank(events, text) -> QuerySet:
+        """Annotates `rank` (higher is better) on events already filtered by `match`."""
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+            return events.annotate(rank=SearchRank(F('search_vector'), query))
+        return events.annotate(rank=RawSQL(
+            'SELECT -bm25(events_search, 10.0, 5.0, 1.0) FROM events_search '
+            'WHERE events_search MATCH %s AND events_search.rowid = events.id',
+            (EventSearchService.fts_query(text),),
+            output_field=FloatField(),
+        ))
+
+    @staticmethod
+    def fts_query(text) -> str:
+        # Cada termo entre aspas: a sintaxe de consulta do FTS5 não chega ao usuário
+        return ' '.join('"{}"'.format(term.replace('"', '""')) for term in text.split())
+
+    @staticmethod
+    def facets(events, text=None, categories=None, statuses=None, start=None, end=None) -> dict:
+        """
+        Result counts per category and per status. Each facet ignores its own
+        filter, so the counts show what choosing another value would return.
+        Each facet is one grouped query.
+        """
+        by_category = (
+            EventSearchService.filter_events(events, text, None, statuses, start, end)
+            .filter(categories__isnull=False)
+            .order_by()
+            .values('categories__id', 'categories__name')
+            .annotate(total=Count('id'))
+            .order_by('-total', 'categories__name')
+        )
+        by_status = (
+            EventSearchService.filter_events(events, text, categories, None, start, end)
+            .order_by()
+            .values('event_status')
+            .annotate(total=Count('id'))
+        )
+        return {
+            'categories': [
+                {'id': row['categories__id'], 'name': row['categories__name'], 'count': row['total']}
+                for row in by_category
+            ],
+            'event_status': {row['event_status']: row['total'] for row in by_status},
+        }
+
+
+IMPORT_FORMATS = ('json', 'csv')
+
+EVENT_FIELDS = [
+    'title', 'description', 'start_date', 'end_date', 'location', 'total_capacity', 'event_status',
+    'waiting_room_enabled', 'waiting_room_rate', 'waiting_room_window',
+]
+TICKET_TYPE_FIELDS = [
+    'name', 'description', 'price', 'quantity_available', 'sale_start', 'sale_end',
+    'ticket_type_status', 'inventory_backend', 'inventory_shards', 'hold_minutes',
+]
+
+# Colunas de tipo de ingresso no CSV (uma linha por tipo; linhas com o mesmo `ref` são o mesmo evento)
+TICKET_TYPE_CSV_COLUMNS = {
+    'ticket_name': 'name',
+    'ticket_description': 'description',
+    'ticket_price': 'price',
+    'ticket_quantity': 'quantity_available',
+    'ticket_sale_start': 'sale_start',
+    'ticket_sale_end': 'sale_end',
+    'ticket_status': 'ticket_type_status',
+    'ticket_inventory_backend': 'inventory_backend',
+    'ticket_inventory_shards': 'inventory_shards',
+    'ticket_hold_minutes': 'hold_minutes',
+}
+
+# Perfis que podem ser donos de eventos importados
+EVENT_OWNER_PROFILE_TYPES = [UserProfileType.ORGANIZER, UserProfileType.ADMIN]
+
+
+class EventImportService:
+    """
+    Bulk import of event catalogs (events, their categories and ticket types)
+    from JSON or CSV.
+
+    Events are handled in batches. Each batch is validated in memory with the
+    models' own field and `clean()` rules against organizers and categories
+    preloaded with one query each, then written in one transaction: one
+    `bulk_create` for the events, one for the category links, one for the
+    ticket types and one for their sales summaries. An event that already
+    exists (same organizer, title slug and start date) is skipped, so a
+    catalog can be imported again after fixing its failing rows. With
+    `dry_run` nothing is written and the result lists what would be created.
+    """
+
+    @staticmethod
+    def read_events(file, import_format) -> list:
+        """
+        Returns `[(row number, event dict or None)]` from a binary file; None marks
+        an entry that isn't an object. Each event dict has the event fields plus
+        `organizer`, `categories` and `ticket_types` lists.
+        """
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        if import_format == 'json':
+            try:
+                events = json.load(text)
+            except ValueError:
+                raise ValidationError('Invalid JSON file.')
+            if not isinstance(events, list):
+                raise ValidationError('The JSON file must hold a list of events.')
+            return [(number, event if isinstance(event, dict) else None) for number, event in enumerate(events, start=1)]
+
+        events, by_ref = [], {}
+        for number, row in enumerate(csv.DictReader(text), start=1):
+            ref = (row.get('ref') or '').strip()
+            if not ref or ref not in by_ref:
+                event = {field: row.get(field) for field in ['organizer', *EVENT_FIELDS]}
+                event['categories'] = [value for value in (row.get('categories') or '').split(';') if value.strip()]
+                event['ticket_types'] = []
+                events.append((number, event))
+                if ref:
+                    by_ref[ref] = event
+            event = by_ref.get(ref) or events[-1][1]
+            ticket_type = {field: row.get(column) for column, field in TICKET_TYPE_CSV_COLUMNS.items()}
+            if any((value or '').strip() for value in ticket_type.values()):
+                event['ticket_types'].append(ticket_type)
+        return events
+
+    @staticmethod
+    def import_events(events, organizer=None, dry_run=False, batch_size=None) -> dict:
+        """
+        Imports `[(row number, event dict)]`. When `organizer` is given every event
+        belongs to it; otherwise each event names its organizer by email.
+        """
+        batch_size = batch_size or settings.EVENT_IMPORT_BATCH_SIZE
+        result = {
+            'dry_run': dry_run, 'created': 0, 'ticket_types': 0, 'skipped': 0, 'failed': 0, 'errors': [], 'changes': [],
+        }
+        seen = set()
+        for start in range(0, len(events), batch_size):
+            valid, errors = EventImportService.validate(events[start:start + batch_size], organizer, seen)
+            result['failed'] += len(errors)
+            result['errors'] += errors
+            new = EventImportService.exclude_existing(valid, result)
+            result['created'] += len(new)
+            result['ticket_types'] += sum(len(ticket_types) for _, _, _, ticket_types in new)
+            if not dry_run and new:
+                EventImportService._insert(new)
+        if not dry_run:
+            del result['changes']
+        return result
+
+    @staticmethod
+    def validate(batch, organizer, seen):
+        """
+        Returns `(valid, errors)`: `[(row number, event, category ids, ticket types)]`
+        with unsaved model instances, and per-row error entries.
+        """
+        organizers = EventImportService.load_organizers(batch, organizer)
+        categories = EventImportService.load_categories(batch)
+        stamp = now()
+        valid, errors = [], []
+        for number, data in batch:
+            if data is None:
+                errors.append({'row': number, 'title': None, 'errors': ['Each event must be an object.']})
+                continue
+
+            problems = []
+            email = User.objects.normalize_email(str(data.get('organizer') or '').strip())
+            if organizer is not None:
+                owner = organizer if not email or email == organizer.email else None
+                if owner is None:
+                    problems.append('Events can only be imported for yourself.')
+            else:
+                owner = organizers.get(email)
+                if owner is None:
+                    problems.append(f"Unknown organizer '{email}'." if email else 'organizer is mandatory.')
+
+            event = Event(
+                **EventImportService.present(data, EVENT_FIELDS),
+                **({'organizer': owner} if owner else {}),
+                created_at=stamp,
+                last_modified=stamp,
+            )
+            problems += EventImportService.check(event, ['organizer', 'slug'], ['start_date', 'end_date'])
+            event.slug = slugify(event.title or '')
+
+            category_ids = []
+            for value in data.get('categories') or []:
+                category_id = categories.get(str(value).strip().lower())
+                if category_id is None:
+                    problems.append(f"Unknown category '{value}'.")
+                elif category_id not in category_ids:
+                    category_ids.append(category_id)
+
+            ticket_types = []
+            entries = data.get('ticket_types') or []
+            if not isinstance(entries, list):
+                entries = [entries]
+            for index, entry in enumerate(entries):
+                if not isinstance(entry, dict):
+                    problems.append(f'ticket_types[{index}]: Each ticket type must be an object.')
+                    continue
+                ticket_type = TicketType(event=event, **EventImportService.present(entry, TICKET_TYPE_FIELDS), last_modified=stamp)
+                problems += EventImportService.check(ticket_type, ['event'], ['sale_start', 'sale_end'], f'ticket_types[{index}].')
+                ticket_types.append(ticket_type)
+
+            key = (event.organizer_id, event.slug, event.start_date)
+            if not problems and key in seen:
+                problems.append('Duplicate event in file.')
+            if problems:
+                errors.append({'row': number, 'title': data.get('title') or None, 'errors': problems})
+                continue
+            seen.add(key)
+            valid.append((number, event, category_ids, ticket_types))
+        return valid, errors
+
+    @staticmethod
+    def present(data, fields) -> dict:
+        # Campos ausentes ou vazios ficam com o padrão do modelo
+        values = {}
+        for field in fields:
+            value = data.get(field)
+            if isinstance(value, str):
+                value = value.strip()
+            if value is not None and value != '':
+                values[field] = value
+        return values
+
+    @staticmethod
+    def check(instance, exclude, datetime_fields, prefix='') -> list:
+        """Runs the model's field validation and `clean()` in memory, returning the error messages."""
+        try:
+            instance.clean_fields(exclude=exclude)
+            for field in datetime_fields:
+                value = getattr(instance, field)
+                if is_naive(value):
+                    setattr(instance, field, make_aware(value))
+            instance.clean()
+        except ValidationError as error:
+            label = f'{prefix[:-1]}: ' if prefix else ''
+            if hasattr(error, 'error_dict'):
+                return [
+                    f'{prefix}{field}: {message}' if field != '__all__' else f'{label}{message}'
+                    for field, messages in error.message_dict.items()
+                    for message in messages
+                ]
+            return [f'{label}{message}' for message in error.messages]
+        return []
+
+    @staticmethod
+    def load_organizers(batch, organizer) -> dict:
+        if organizer is not None:
+            return {}
+        emails = {
+            User.objects.normalize_email(str(data.get('organizer') or '').strip())
+            for _, data in batch
+            if data is not None and data.get('organizer')
+        }
+        return {
+            user.email: user
+            for user in User.objects.filter(
+                email__in=emails, profile_type__in=EVENT_OWNER_PROFILE_TYPES, is_active=True
+            ).only('id', 'email')
+        }
+
+    @staticmethod
+    def load_categories(batch) -> dict:
+        """Maps every category id and slug referenced by the batch to its id."""
+        values = {
+            str(value).strip().lower()
+            for _, data in batch
+            if data is not None
+            for value in data.get('categories') or []
+        }
+        ids = [int(value) for value in values if value.isdigit()]
+        lookup = {}
+        # Ordenado por id: com slugs repetidos vale a categoria mais antiga
+        for category_id, slug in Category.objects.filter(Q(id__in=ids) | Q(slug__in=values)).order_by('-id').values_list('id', 'slug'):
+            lookup[str(category_id)] = category_id
+            lookup[slug.lower()] = category_id
+        return lookup
+
+    @staticmethod
+    def exclude_existing(valid, result) -> list:
+        """Skips events already in the database and records the diff entries."""
+        existing = set(
+            Event.objects.filter(
+                organizer_id__in={event.organizer_id for _, event, _, _ in valid},
+                slug__in={event.slug for _, event, _, _ in valid},
+            ).values_list('organizer_id', 'slug', 'start_date')
+        )
+        new = []
+        for number, event, category_ids, ticket_types in valid:
+            exists = (event.organizer_id, event.slug, event.start_date) in existing
+            result['changes'].append({
+                'row': number,
+                'action': 'skip' if exists else 'create',
+                'title': event.title,
+                'start_date': event.start_date,
+                'organizer': event.organizer.email,
+                'categories': category_ids,
+                'ticket_types': [
+                    {'name': ticket_type.name, 'price': ticket_type.price, 'quantity_available': ticket_type.quantity_available}
+                    for ticket_type in ticket_types
+                ],
+            })
+            if exists:
+                result['skipped'] += 1
+            else:
+                new.append((number, event, category_ids, ticket_types))
+        return new
+
+    @staticmethod
+    def _insert(new) -> None:
+        events = [event for _, event, _, _ in new]
+        with transaction.atomic():
+            Event.objects.bulk_create(events)
+            Event.categories.through.objects.bulk_create([
+                Event.categories.through(event_id=event.id, category_id=category_id)
+                for _, event, category_ids, _ in new
+                for category_id in category_ids
+            ])
+            ticket_types = []
+            for _, event, _, event_ticket_types in new:
+                for ticket_type in event_ticket_types:
+                    ticket_type.event = event
+                    ticket_types.append(ticket_type)
+            TicketType.objects.bulk_create(ticket_types)
+            created_at = now()
+            TicketTypeSalesSummary.objects.bulk_create([
+                TicketTypeSalesSummary(ticket_type_id=ticket_type.id, updated_at=created_at) for ticket_type in ticket_types
+            ])
+            bump_versions([event.id for event in events])
+        # O estoque em Redis só é carregado depois que os tipos existem no banco
+        for ticket_type in ticket_types:
+            if InventoryService.is_sharded(ticket_type):
+                InventoryService.enable_sharding(ticket_type)
@@ -3,6 +3,8 @@ from .views import (
     EventListCreateView,
     EventDetailView,
     OrganizerEventListView,
+    EventSearchView,
+    EventImportView,
     CategoryListCreateView,
     CategoryDetailView
 )
@@ -11,6 +13,8 @@ urlpatterns = [
     path('events/', EventListCreateView.as_view(), name='event-list-create'),
     path('events/<int:pk>/', EventDetailView.as_view(), name='event-detail'),
     path('events/organizer/', OrganizerEventListView.as_view(), name='organizer-event-list'),
+    path('events/search/', EventSearchView.as_view(), name='event-search'),
+    path('events/import/', EventImportView.as_view(), name='event-import'),
     path('categories/', CategoryListCreateView.as_view(), name='category-list-create'),
     path('categories/<int:pk>/', CategoryDetailView.as_view(), name='category-detail'),
 ]
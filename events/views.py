@@ -1,8 +1,16 @@
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from core.permissions import IsAdminUser, IsOrganizerUser, IsParticipantUser
+from core.conditional import conditional_get
+from core.pagination import EventPagination, CategoryPagination, EventSearchPagination
+from core.streaming import parse_date_range
+from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .services import EventService, CategoryService
+from django.conf import settings
+from django.forms import ValidationError
+from users.models import User
+from .models import Event
+from .services import EventService, CategoryService, EventSearchService, EventImportService, IMPORT_FORMATS, EVENT_OWNER_PROFILE_TYPES
 from .serializer import EventSerializer, EventRegisterSerializer, CategorySerializer
 
 
@@ -10,10 +18,15 @@ from .serializer import EventSerializer, EventRegisterSerializer, CategorySerial
 class EventListCreateView(ListCreateAPIView):
     permission_classes = [IsAdminUser | IsOrganizerUser]
     serializer_class = EventRegisterSerializer
+    pagination_class = EventPagination
 
     def get_queryset(self):
         return EventService.get_all_events()
 
+    @conditional_get(lambda view, request: EventService.get_events_version())
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         EventService.create_event(serializer.validated_data, self.request.user)
 
@@ -25,6 +38,10 @@ class EventDetailView(RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return EventService.get_all_events()
 
+    @conditional_get(lambda view, request, pk: EventService.get_event_version(pk))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def perform_update(self, serializer):
         event = self.get_object()
         EventService.update_event(event, serializer.validated_data)
@@ -38,14 +55,102 @@ class OrganizerEventListView(APIView):
 
     def get(self, request):
         events = EventService.get_events_by_organizer(request.user)
-        serializer = EventSerializer(events, many=True)
-        return Response(serializer.data)
+        paginator = EventPagination()
+        page = paginator.paginate_queryset(events, request, view=self)
+        serializer = EventSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class EventSearchView(APIView):
+    """
+    Full-text event search with category and status facets.
+
+    Query params: `q` (text), `category` and `status` (repeatable), `start` and
+    `end` (event start date range), plus `cursor` and `page_size`. Results are
+    ranked by relevance when `q` is given, otherwise ordered by start date.
+    Facet counts are returned with the first page only.
+    """
+    permission_classes = [IsAdminUser | IsOrganizerUser | IsParticipantUser]
+
+    def get(self, request):
+        text = request.query_params.get('q', '').strip()
+        statuses = request.query_params.getlist('status')
+        try:
+            start, end = parse_date_range(request)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            categories = [int(value) for value in request.query_params.getlist('category')]
+        except ValueError:
+            return Response({"detail": "Invalid category."}, status=status.HTTP_400_BAD_REQUEST)
+        if set(statuses) - set(Event.EventStatusChoices.values):
+            return Response({"detail": "Invalid status."}, status=status.HTTP_400_BAD_REQUEST)
+
+        events = EventService.get_all_events()
+        if request.user.profile_type == 'PARTICIPANT':
+            events = events.filter(event_status=Event.EventStatusChoices.PUBLISHED)
+
+        results = EventSearchService.filter_events(events, text, categories, statuses, start, end)
+        if text:
+            results = EventSearchService.rank(results, text)
+            paginator = EventSearchPagination()
+        else:
+            paginator = EventPagination()
+        page = paginator.paginate_queryset(results, request, view=self)
+        response = paginator.get_paginated_response(EventSerializer(page, many=True).data)
+        if not request.query_params.get('cursor'):
+            response.data['facets'] = EventSearchService.facets(events, text, categories, statuses, start, end)
+        return response
+
+
+class EventImportView(APIView):
+    """
+    Bulk import of an event catalog (events, categories and ticket types) from
+    an uploaded JSON or CSV `file`. Organizers import their own events; admins
+    name the organizer per event or for the whole file (`organizer` email).
+    With `dry_run=true` nothing is written and the response lists what would
+    be created or skipped. Catalogs over EVENT_IMPORT_API_MAX_EVENTS events
+    must use the import_events command.
+    """
+    permission_classes = [IsAdminUser | IsOrganizerUser]
+
+    def post(self, request):
+        file = request.FILES.get('file')
+        if file is None:
+            return Response({"detail": "Upload the events in a 'file' field."}, status=status.HTTP_400_BAD_REQUEST)
+        import_format = request.data.get('format') or ('csv' if file.name.lower().endswith('.csv') else 'json')
+        if import_format not in IMPORT_FORMATS:
+            return Response({"detail": "Invalid format."}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('true', '1')
+
+        organizer = None
+        if request.user.profile_type == 'ORGANIZER':
+            organizer = request.user
+        elif request.data.get('organizer'):
+            organizer = User.objects.filter(
+                email=User.objects.normalize_email(request.data['organizer']), profile_type__in=EVENT_OWNER_PROFILE_TYPES
+            ).first()
+            if organizer is None:
+                return Response({"detail": "Organizer not found."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            events = EventImportService.read_events(file, import_format)
+        except ValidationError as e:
+            return Response({"detail": e.message}, status=status.HTTP_400_BAD_REQUEST)
+        if len(events) > settings.EVENT_IMPORT_API_MAX_EVENTS:
+            return Response(
+                {"detail": f"Catalogs over {settings.EVENT_IMPORT_API_MAX_EVENTS} events must be imported with the import_events command."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        result = EventImportService.import_events(events, organizer=organizer, dry_run=dry_run)
+        return Response(result, status=status.HTTP_200_OK)
 
 
 # Category Views
 class CategoryListCreateView(ListCreateAPIView):
     permission_classes = [IsAdminUser]
     serializer_class = CategorySerializer
+    pagination_class = CategoryPagination
 
     def get_queryset(self):
         return CategoryService.get_all_categories()
@@ -0,0 +1,53 @@
+import base64
+import hashlib
+import hmac
+import struct
+from django.conf import settings
+from django.forms import ValidationError
+from django.utils.timezone import now
+
+# Token assinado embutido no QR code de cada ticket, validável offline pelas catracas:
+#   <unique_code>.<base64url(versão, event_id, ticket_id, ticket_type_id, valid_until, hmac)>
+# O HMAC usa uma chave derivada por evento, distribuída no pacote de check-in do evento.
+
+TOKEN_VERSION = 1
+TOKEN_FIELDS = struct.Struct('<BIQII')
+MAC_SIZE = 12
+
+
+def event_key(event_id: int) -> bytes:
+    return hmac.new(settings.CHECKIN_SIGNING_KEY.encode(), f'checkin-event:{event_id}'.encode(), hashlib.sha256).digest()
+
+
+def sign(unique_code: str, event_id: int, ticket_id: int, ticket_type_id: int, valid_until) -> str:
+    body = TOKEN_FIELDS.pack(TOKEN_VERSION, event_id, ticket_id, ticket_type_id, int(valid_until.timestamp()))
+    mac = hmac.new(event_key(event_id), body + unique_code.encode(), hashlib.sha256).digest()[:MAC_SIZE]
+    return f"{unique_code}.{base64.urlsafe_b64encode(body + mac).rstrip(b'=').decode()}"
+
+
+def verify(payload: str, at=None) -> dict:
+    """
+    Checks the signature of a QR payload and that it was scanned (`at`, default
+    now) before its `valid_until`, the end of the event; returns its fields.
+    """
+    try:
+        unique_code, token = payload.rsplit('.', 1)
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        version, event_id, ticket_id, ticket_type_id, valid_until = TOKEN_FIELDS.unpack(raw[:TOKEN_FIELDS.size])
+    except (ValueError, struct.error):
+        raise ValidationError('Malformed check-in token.')
+
+    body, mac = raw[:TOKEN_FIELDS.size], raw[TOKEN_FIELDS.size:]
+    expected = hmac.new(event_key(event_id), body + unique_code.encode(), hashlib.sha256).digest()[:MAC_SIZE]
+    if version != TOKEN_VERSION or not hmac.compare_digest(mac, expected):
+        raise ValidationError('Invalid check-in token signature.')
+    if (at or now()).timestamp() > valid_until:
+        raise ValidationError('The check-in token expired when the event ended.')
+
+    return {
+        'unique_code': unique_code,
+        'event_id': event_id,
+        'ticket_id': ticket_id,
+        'ticket_type_id': ticket_type_id,
+        'valid_until': valid_until,
+    }
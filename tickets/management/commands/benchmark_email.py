@@ -0,0 +1,81 @@
+import time
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from tickets.qr_codes import render_qr_code
+from tickets.services.email_services import EmailService
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+
+class _CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 Message accepted for delivery'
+
+
+class Command(BaseCommand):
+    help = "Measures email throughput against a local aiosmtpd server, one connection per message vs. pooled batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500, help='Messages sent by each mode.')
+        parser.add_argument('--batch-size', type=int, default=50, help='Messages per batch on the pooled connection.')
+        parser.add_argument('--attachments', type=int, default=1, help='QR code PNGs attached to each message.')
+        parser.add_argument('--port', type=int, default=8025, help='Port for the local SMTP server.')
+
+    def handle(self, *args, **options):
+        if Controller is None:
+            raise CommandError("aiosmtpd is required for this benchmark: pip install aiosmtpd")
+
+        handler = _CountingHandler()
+        controller = Controller(handler, hostname='127.0.0.1', port=options['port'])
+        controller.start()
+        try:
+            with override_settings(
+                EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                EMAIL_HOST='127.0.0.1',
+                EMAIL_PORT=options['port'],
+                EMAIL_USE_TLS=False,
+                EMAIL_USE_SSL=False,
+                EMAIL_HOST_USER='benchmark@localhost',
+                EMAIL_HOST_PASSWORD='',
+                EMAIL_BATCH_SIZE=options['batch_size'],
+            ):
+                for mode in ('per-message', 'pooled'):
+                    handler.received = 0
+                    messages = self._build_messages(options['messages'], options['attachments'])
+                    started = time.perf_counter()
+                    if mode == 'pooled':
+                        EmailService.send_messages(messages)
+                        EmailService.close_connection()
+                    else:
+                        for message in messages:
+                            get_connection().send_messages([message])
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"{mode}: {handler.received}/{len(messages)} delivered in {elapsed:.2f}s "
+                        f"({len(messages) / elapsed:.0f} msg/s)"
+                    )
+        finally:
+            controller.stop()
+
+    def _build_messages(self, count, attachments):
+        image = render_qr_code('TIX-BENCHMARK')
+        messages = []
+        for index in range(count):
+            message = EmailMessage(
+                "Ticket QR Code",
+                f"Your ticket QR Code for Benchmark #{index} is attached.",
+                'benchmark@localhost',
+                [f'buyer{index}@example.com'],
+            )
+            for attachment in range(attachments):
+                message.attach(f'ticket-{index}-{attachment}.png', image, 'image/png')
+            messages.append(message)
+        return messages
@@ -0,0 +1,120 @@
+import threading
+import time
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.forms import ValidationError
+from django.utils import timezone
+from events.models import Event
+from tickets.models import TicketType
+from tickets.services.inventory_services import InventoryService, ShardedInventory
+from tickets.services.ticket_type_services import TicketTypeService
+from users.models import User, UserProfileType
+
+
+class Command(BaseCommand):
+    help = "Hammers a single TicketType with concurrent reservations and checks that nothing is oversold."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=500, help='Units available on the benchmark ticket type.')
+        parser.add_argument('--workers', type=int, default=16, help='Concurrent buyer threads.')
+        parser.add_argument('--attempts', type=int, default=100, help='Reservation attempts per worker.')
+        parser.add_argument('--backend', choices=['database', 'sharded', 'both'], default='database',
+                            help='Inventory backend to benchmark; "both" runs them back to back for comparison.')
+        parser.add_argument('--shards', type=int, default=8, help='Redis shards used by the sharded backend.')
+
+    def handle(self, *args, **options):
+        backends = ['database', 'sharded'] if options['backend'] == 'both' else [options['backend']]
+        for backend in backends:
+            self._run(backend, options)
+
+    def _run(self, backend, options):
+        stock, workers, attempts = options['stock'], options['workers'], options['attempts']
+        organizer, event, ticket_type = self._create_fixtures(stock)
+        if backend == 'sharded':
+            ticket_type.inventory_backend = TicketType.InventoryBackendChoices.SHARDED
+            ticket_type.inventory_shards = options['shards']
+            ticket_type.save(update_fields=['inventory_backend', 'inventory_shards'])
+            InventoryService.enable_sharding(ticket_type)
+
+        results = {'reserved': 0, 'sold_out': 0, 'errors': 0}
+        lock = threading.Lock()
+        barrier = threading.Barrier(workers)
+
+        def buyer():
+            counts = {'reserved': 0, 'sold_out': 0, 'errors': 0}
+            barrier.wait()
+            try:
+                for _ in range(attempts):
+                    try:
+                        TicketTypeService.reserve_ticket(ticket_type)
+                        counts['reserved'] += 1
+                    except ValidationError:
+                        counts['sold_out'] += 1
+                    except Exception:
+                        counts['errors'] += 1
+            finally:
+                connection.close()
+            with lock:
+                for key, value in counts.items():
+                    results[key] += value
+
+        threads = [threading.Thread(target=buyer) for _ in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if backend == 'sharded':
+            ShardedInventory(ticket_type).reconcile()
+            InventoryService.disable_sharding(ticket_type)
+        ticket_type.refresh_from_db(fields=['quantity_available'])
+        remaining = ticket_type.quantity_available
+        event.delete()
+        organizer.delete()
+
+        total = workers * attempts
+        self.stdout.write(
+            f"backend={backend} attempts={total} reserved={results['reserved']} sold_out={results['sold_out']} "
+            f"errors={results['errors']} remaining={remaining} "
+            f"elapsed={elapsed:.3f}s throughput={total / elapsed:.1f} ops/s"
+        )
+
+        if results['reserved'] > stock or results['reserved'] + remaining != stock or remaining < 0:
+            raise CommandError(f"Oversell detected: {results['reserved']} reserved from a stock of {stock}.")
+        self.stdout.write(self.style.SUCCESS('No oversell detected.'))
+
+    def _create_fixtures(self, stock):
+        now = timezone.now()
+        suffix = uuid.uuid4().hex[:8]
+        organizer = User.objects.create_user(
+            email=f'benchmark-{suffix}@example.com',
+            password=None,
+            name='Benchmark Organizer',
+            profile_type=UserProfileType.ORGANIZER,
+            cnpj_cpf='00000000000',
+            business_name='Benchmark',
+            commercial_address='Benchmark',
+        )
+        event = Event.objects.create(
+            title=f'Reservation benchmark {suffix}',
+            description='Reservation benchmark',
+            start_date=now + timedelta(days=30),
+            end_date=now + timedelta(days=31),
+            location='Benchmark',
+            total_capacity=stock,
+            event_status=Event.EventStatusChoices.PUBLISHED,
+            organizer=organizer,
+        )
+        ticket_type = TicketType.objects.create(
+            event=event,
+            description='Reservation benchmark',
+            price=0,
+            quantity_available=stock,
+            sale_start=now,
+            sale_end=now + timedelta(days=29),
+        )
+        return organizer, event, ticket_type
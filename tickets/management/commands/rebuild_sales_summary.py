@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from tickets.models import TicketType, TicketTypeSalesSummary
+from tickets.services.sales_summary_services import SalesSummaryService
+
+
+class Command(BaseCommand):
+    help = "Recomputes the per-ticket-type sales summaries from the tickets table, or only reports drift with --verify."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, help='Only the ticket types of this event.')
+        parser.add_argument('--verify', action='store_true', help='Report drifted summaries without fixing them; exits non-zero on drift.')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Ticket types recomputed per transaction.')
+
+    def handle(self, *args, **options):
+        ticket_types = TicketType.objects.order_by('id')
+        if options['event']:
+            ticket_types = ticket_types.filter(event_id=options['event'])
+        ticket_type_ids = list(ticket_types.values_list('id', flat=True))
+        chunks = [ticket_type_ids[start:start + options['chunk_size']] for start in range(0, len(ticket_type_ids), options['chunk_size'])]
+
+        if options['verify']:
+            drift = {}
+            for chunk in chunks:
+                drift.update(SalesSummaryService.verify(chunk))
+            for ticket_type_id, fields in drift.items():
+                details = ', '.join(f"{field}: {stored} != {expected}" for field, (stored, expected) in fields.items())
+                self.stdout.write(f"Ticket type {ticket_type_id}: {details}")
+            if drift:
+                raise CommandError(f"{len(drift)} of {len(ticket_type_ids)} sales summaries drifted.")
+            self.stdout.write(self.style.SUCCESS(f"All {len(ticket_type_ids)} sales summaries match the tickets table."))
+            return
+
+        rebuilt = 0
+        for chunk in chunks:
+            with transaction.atomic():
+                # Trava os resumos antes de recalcular: quem alterou tickets e ainda não atualizou
+                # o resumo aplica seu delta depois, sobre o valor recalculado
+                list(TicketTypeSalesSummary.objects.select_for_update().filter(ticket_type_id__in=chunk).values_list('pk', flat=True))
+                rebuilt += SalesSummaryService.rebuild(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} sales summaries."))
@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from tickets.models import TicketQRCode
+from tickets.services.qr_code_services import QRCodeService
+
+
+class Command(BaseCommand):
+    help = "Pre-renders and stores the QR codes of every ticket of an event on a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('--format', choices=TicketQRCode.ImageFormatChoices.values, default=TicketQRCode.ImageFormatChoices.PNG)
+        parser.add_argument('--box-size', type=int, default=10, help='Pixels per QR module; smaller values give smaller PNGs.')
+        parser.add_argument('--workers', type=int, default=None, help='Rendering processes (defaults to the CPU count; 0 renders in this process).')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--overwrite', action='store_true', help='Re-render codes that are already stored.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rendered = QRCodeService.render_event(
+            options['event_id'],
+            image_format=options['format'],
+            box_size=options['box_size'],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            overwrite=options['overwrite'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} QR codes in {elapsed:.2f}s."))
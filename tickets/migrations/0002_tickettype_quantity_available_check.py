@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_alter_category_table_alter_event_table'),
+        ('tickets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='tickettype',
+            constraint=models.CheckConstraint(condition=models.Q(('quantity_available__gte', 0)), name='ticket_types_quantity_available_gte_0'),
+        ),
+    ]
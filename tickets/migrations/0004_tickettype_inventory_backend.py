@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tickettype',
+            name='inventory_backend',
+            field=models.CharField(choices=[('DATABASE', 'Database'), ('SHARDED', 'Sharded')], default='DATABASE', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='tickettype',
+            name='inventory_shards',
+            field=models.PositiveSmallIntegerField(default=8),
+        ),
+        migrations.AddField(
+            model_name='tickettype',
+            name='inventory_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
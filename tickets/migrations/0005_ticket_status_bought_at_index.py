@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0004_tickettype_inventory_backend'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['ticket_status', 'bought_at'], name='tickets_status_bought_at_idx'),
+        ),
+    ]
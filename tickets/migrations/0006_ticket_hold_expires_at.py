@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:40
+
+from django.conf import settings
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def backfill_hold_expires_at(apps, schema_editor):
+    # Reservas existentes mantêm o prazo fixo de 15 minutos usado até aqui
+    Ticket = apps.get_model('tickets', 'Ticket')
+    Ticket.objects.filter(ticket_status='PENDING_PAYMENT', hold_expires_at__isnull=True).update(
+        hold_expires_at=models.F('bought_at') + timedelta(minutes=15)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_ticket_status_bought_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ticket',
+            name='tickets_status_bought_at_idx',
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_hold_expires_at, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='tickettype',
+            name='hold_minutes',
+            field=models.PositiveSmallIntegerField(default=15),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('ticket_status', 'PENDING_PAYMENT')), fields=['hold_expires_at'], name='tickets_pending_hold_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('ticket_status', 'PENDING_PAYMENT')), fields=['ticket_type', 'hold_expires_at'], name='tickets_type_pending_hold_idx'),
+        ),
+    ]
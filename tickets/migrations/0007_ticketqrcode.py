@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0006_ticket_hold_expires_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketQRCode',
+            fields=[
+                ('unique_code', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('image_format', models.CharField(choices=[('PNG', 'Png'), ('SVG', 'Svg')], default='PNG', max_length=10)),
+                ('image', models.BinaryField()),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'ticket_qr_codes',
+            },
+        ),
+    ]
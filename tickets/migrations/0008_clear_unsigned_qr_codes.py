@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def clear_unsigned_qr_codes(apps, schema_editor):
+    # Os QR codes armazenados até aqui não têm o token de check-in assinado;
+    # removê-los faz com que sejam gerados novamente no próximo acesso
+    TicketQRCode = apps.get_model('tickets', 'TicketQRCode')
+    TicketQRCode.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0007_ticketqrcode'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_unsigned_qr_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_clear_unsigned_qr_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketTypeSalesSummary',
+            fields=[
+                ('ticket_type', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_summary', serialize=False, to='tickets.tickettype')),
+                ('active_count', models.IntegerField(default=0)),
+                ('inactive_count', models.IntegerField(default=0)),
+                ('pending_payment_count', models.IntegerField(default=0)),
+                ('canceled_count', models.IntegerField(default=0)),
+                ('used_count', models.IntegerField(default=0)),
+                ('expired_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'ticket_type_sales_summaries',
+            },
+        ),
+    ]
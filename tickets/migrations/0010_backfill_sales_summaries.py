@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:52
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils.timezone import now
+
+STATUSES = ['ACTIVE', 'INACTIVE', 'PENDING_PAYMENT', 'CANCELED', 'USED', 'EXPIRED']
+UNSOLD_STATUSES = ['PENDING_PAYMENT', 'EXPIRED']
+
+
+def backfill_sales_summaries(apps, schema_editor):
+    TicketType = apps.get_model('tickets', 'TicketType')
+    TicketTypeSalesSummary = apps.get_model('tickets', 'TicketTypeSalesSummary')
+    sold = Q(tickets__isnull=False) & ~Q(tickets__ticket_status__in=UNSOLD_STATUSES)
+    rows = TicketType.objects.order_by().values('id').annotate(
+        revenue=Coalesce(Sum('tickets__price_paid', filter=sold), Value(0), output_field=DecimalField()),
+        **{f'{value.lower()}_count': Count('tickets', filter=Q(tickets__ticket_status=value)) for value in STATUSES},
+    )
+    updated_at = now()
+    TicketTypeSalesSummary.objects.bulk_create(
+        [TicketTypeSalesSummary(ticket_type_id=row.pop('id'), updated_at=updated_at, **row) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_tickettypesalessummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sales_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_tickettype_last_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tickettype',
+            name='inventory_synced_tickets',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
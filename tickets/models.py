@@ -2,12 +2,12 @@ from django.utils import timezone
 from django.db import models
 from django.forms import ValidationError
 from django.http import HttpResponse
-from django.db import transaction
 from events.models import Event
 from users.models import User
+from tickets.qr_codes import render_qr_code, PNG, SVG
+from tickets import checkin_tokens
 from io import BytesIO
 import uuid 
-import qrcode
 
 
 def generate_unique_code():
@@ -26,6 +26,10 @@ class TicketType(models.Model):
         ACTIVE = 'ACTIVE'
         INACTIVE = 'INACTIVE'
 
+    class InventoryBackendChoices(models.TextChoices):
+        DATABASE = 'DATABASE', 'Database'
+        SHARDED = 'SHARDED', 'Sharded'
+
     event = models.ForeignKey(Event, related_name='ticket_types', on_delete=models.CASCADE, null=False, blank=False)
     name = models.CharField(max_length=50, choices=TicketTypeNameChoices.choices, default=TicketTypeNameChoices.REGULAR, null=False, blank=False)
     description =models.TextField(null=False, blank=False)
@@ -34,25 +38,20 @@ class TicketType(models.Model):
     sale_start = models.DateTimeField(null=False, blank=False)
     sale_end = models.DateTimeField(null=False, blank=False)
     ticket_type_status = models.CharField(max_length=50, choices=StatusChoices.choices, default=StatusChoices.ACTIVE, null=False, blank=False)
-
+    inventory_backend = models.CharField(max_length=20, choices=InventoryBackendChoices.choices, default=InventoryBackendChoices.DATABASE, null=False, blank=False)
+    inventory_shards = models.PositiveSmallIntegerField(default=8, null=False, blank=False)
+    inventory_synced_at = models.DateTimeField(null=True, blank=True)
+    # Tickets confirmados (exceto expirados) quando o snapshot do estoque particionado foi gravado
+    inventory_synced_tickets = models.PositiveIntegerField(default=0, null=False, blank=False)
+    hold_minutes = models.PositiveSmallIntegerField(default=15, null=False, blank=False)
+    # Atualizado em todo save() e em toda escrita direta no estoque; base do ETag/Last-Modified
+    last_modified = models.DateTimeField(null=False, blank=False)
 
     class Meta:
         db_table = 'ticket_types'
-
-    def reserve_ticket(self):
-        with transaction.atomic():
-            self.refresh_from_db()  
-            if self.quantity_available == 0:
-                raise ValidationError('No tickets available for this type.')
-            self.quantity_available -= 1
-            self.save()
-
-    def release_ticket(self):
-        with transaction.atomic():
-            self.refresh_from_db()
-            self.quantity_available += 1
-            self.save()
-
+        constraints = [
+            models.CheckConstraint(condition=models.Q(quantity_available__gte=0), name='ticket_types_quantity_available_gte_0'),
+        ]
 
     def clean(self):
         if self.sale_start > self.sale_end:
@@ -66,6 +65,9 @@ class TicketType(models.Model):
         
     def save(self, *args, **kwargs):
         self.clean()
+        self.last_modified = timezone.now()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'last_modified'}
         return super(TicketType, self).save(*args, **kwargs)
 
 
@@ -84,13 +86,22 @@ class Ticket(models.Model):
     ticket_status = models.CharField(max_length=50, choices=TicketStatusChoices.choices, default=TicketStatusChoices.PENDING_PAYMENT, null=False, blank=False)
     bought_at = models.DateTimeField(null=False, blank=False)
     used_at = models.DateTimeField(null=True, blank=True)
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
     price_paid = models.DecimalField(max_digits=10, decimal_places=2, null=False, blank=False)
+    order = models.ForeignKey('Order', related_name='tickets', on_delete=models.CASCADE, null=True, blank=True)
 
     class Meta:
         db_table = 'tickets'
+        indexes = [
+            models.Index(fields=['hold_expires_at'], condition=models.Q(ticket_status='PENDING_PAYMENT'), name='tickets_pending_hold_idx'),
+            models.Index(fields=['ticket_type', 'hold_expires_at'], condition=models.Q(ticket_status='PENDING_PAYMENT'), name='tickets_type_pending_hold_idx'),
+            # Ordenações da paginação por cursor
+            models.Index(fields=['bought_at', 'id'], name='tickets_bought_at_id_idx'),
+            models.Index(fields=['buyer', 'bought_at', 'id'], name='tickets_buyer_bought_at_idx'),
+        ]
 
     def clean(self):
-        if self.bought_at > self.used_at:
+        if self.used_at and self.bought_at > self.used_at:
             raise ValidationError('The bought date must be before the used date')       
         if self.price_paid < 0:
             raise ValidationError('The price paid must be greater than zero')
@@ -99,23 +110,85 @@ class Ticket(models.Model):
         self.clean()
         return super(Ticket, self).save(*args, **kwargs)
 
-    def generate_qr_code(ticket):
-        qr_data = f"Ticket: {ticket.unique_code}\nEvent: {ticket.ticket_type.event.title}\nBuyer: {ticket.buyer.name}"
-        
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        buffer.seek(0)
-
-        return buffer  
-        
\ No newline at end of file
+    def qr_payload(self):
+        event = self.ticket_type.event
+        return checkin_tokens.sign(self.unique_code, event.id, self.id, self.ticket_type_id, event.end_date)
+
+    def generate_qr_code(self):
+        return BytesIO(render_qr_code(self.qr_payload()))
+
+
+class Order(models.Model):
+    class OrderStatusChoices(models.TextChoices):
+        PENDING_PAYMENT = 'PENDING_PAYMENT', 'Pending_Payment'
+        PAID = 'PAID', 'Paid'
+        CANCELED = 'CANCELED', 'Canceled'
+        EXPIRED = 'EXPIRED', 'Expired'
+
+    buyer = models.ForeignKey(User, related_name='orders', on_delete=models.CASCADE, null=False, blank=False)
+    event = models.ForeignKey(Event, related_name='orders', on_delete=models.CASCADE, null=False, blank=False)
+    order_status = models.CharField(max_length=50, choices=OrderStatusChoices.choices, default=OrderStatusChoices.PENDING_PAYMENT, null=False, blank=False)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, null=False, blank=False)
+    created_at = models.DateTimeField(null=False, blank=False)
+    paid_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'orders'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='orders_created_at_id_idx'),
+            models.Index(fields=['buyer', 'created_at', 'id'], name='orders_buyer_created_at_idx'),
+        ]
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE, null=False, blank=False)
+    ticket_type = models.ForeignKey(TicketType, related_name='order_items', on_delete=models.CASCADE, null=False, blank=False)
+    quantity = models.PositiveIntegerField(null=False, blank=False)
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2, null=False, blank=False)
+
+    class Meta:
+        db_table = 'order_items'
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'ticket_type'], name='order_items_unique_ticket_type'),
+        ]
+
+
+class TicketQRCode(models.Model):
+    class ImageFormatChoices(models.TextChoices):
+        PNG = PNG, 'Png'
+        SVG = SVG, 'Svg'
+
+    unique_code = models.CharField(max_length=50, primary_key=True)
+    image_format = models.CharField(max_length=10, choices=ImageFormatChoices.choices, default=ImageFormatChoices.PNG, null=False, blank=False)
+    image = models.BinaryField(null=False, blank=False)
+    created_at = models.DateTimeField(null=False, blank=False)
+
+    class Meta:
+        db_table = 'ticket_qr_codes'
+
+    @property
+    def content_type(self):
+        return 'image/svg+xml' if self.image_format == self.ImageFormatChoices.SVG else 'image/png'
+
+    @property
+    def filename(self):
+        return f"{self.unique_code}.{self.image_format.lower()}"
+
+
+class TicketTypeSalesSummary(models.Model):
+    ticket_type = models.OneToOneField(TicketType, related_name='sales_summary', on_delete=models.CASCADE, primary_key=True)
+    active_count = models.IntegerField(default=0, null=False, blank=False)
+    inactive_count = models.IntegerField(default=0, null=False, blank=False)
+    pending_payment_count = models.IntegerField(default=0, null=False, blank=False)
+    canceled_count = models.IntegerField(default=0, null=False, blank=False)
+    used_count = models.IntegerField(default=0, null=False, blank=False)
+    expired_count = models.IntegerField(default=0, null=False, blank=False)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, null=False, blank=False)
+    updated_at = models.DateTimeField(null=False, blank=False)
+
+    class Meta:
+        db_table = 'ticket_type_sales_summaries'
+
+    @staticmethod
+    def count_field(ticket_status):
+        return f'{ticket_status.lower()}_count'
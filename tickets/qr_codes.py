@@ -0,0 +1,34 @@
+from io import BytesIO
+import qrcode
+import qrcode.image.svg
+
+# Este módulo não importa o Django de propósito: ele roda nos processos filhos
+# do renderizador em lote, que são iniciados com 'spawn'.
+
+PNG = 'PNG'
+SVG = 'SVG'
+
+
+def render_qr_code(payload: str, image_format: str = PNG, box_size: int = 10) -> bytes:
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=4,
+        image_factory=qrcode.image.svg.SvgPathImage if image_format == SVG else None,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+
+    buffer = BytesIO()
+    if image_format == SVG:
+        qr.make_image().save(buffer)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def render_qr_code_row(row):
+    """Entry point for the process pool: (unique_code, payload, image_format, box_size) -> (unique_code, bytes)."""
+    unique_code, payload, image_format, box_size = row
+    return unique_code, render_qr_code(payload, image_format, box_size)
@@ -1,14 +1,15 @@
 from django.forms import ValidationError
 from rest_framework import serializers
-from .models import Ticket, TicketType
+from .models import Ticket, TicketType, Order, OrderItem
 
 
 class TicketRegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
         fields = [
-            'id', 'ticket_type', 'buyer', 'unique_code', 'ticket_status', 'bought_at', 'used_at', 'price_paid'
+            'id', 'ticket_type', 'buyer', 'unique_code', 'ticket_status', 'bought_at', 'used_at', 'price_paid', 'hold_expires_at'
         ]
+        read_only_fields = ['hold_expires_at']
 
     def validate(self, data):
         ticket_type = data.get('ticket_type')
@@ -25,17 +26,32 @@ class TicketRegisterSerializer(serializers.ModelSerializer):
     
 
 class TicketTypeRegisterSerializer(serializers.ModelSerializer):
+    available_quantity = serializers.SerializerMethodField()
+
     class Meta:
         model = TicketType
         fields = [
-            'id', 'event', 'name', 'description', 'price', 'quantity_available', 'sale_start', 'sale_end', 'ticket_type_status'
+            'id', 'event', 'name', 'description', 'price', 'quantity_available', 'available_quantity', 'sale_start', 'sale_end',
+            'ticket_type_status', 'inventory_backend', 'inventory_shards', 'hold_minutes'
         ]
 
+    def get_available_quantity(self, obj):
+        # Reservas com prazo vencido já contam como estoque livre
+        return obj.quantity_available + getattr(obj, 'lapsed_holds', 0)
+
     def validate(self, data):
         if data['sale_start'] > data['sale_end']:
             raise serializers.ValidationError("The sale start date must be before the sale end date.")
         if data['quantity_available'] < 0:
             raise serializers.ValidationError("The quantity available must be greater than zero.")
+        if data.get('inventory_shards') == 0:
+            raise serializers.ValidationError("The inventory shards must be greater than zero.")
+        if data.get('hold_minutes') == 0:
+            raise serializers.ValidationError("The hold minutes must be greater than zero.")
+        instance = getattr(self, 'instance', None)
+        if instance and instance.inventory_backend == TicketType.InventoryBackendChoices.SHARDED \
+                and data.get('inventory_shards', instance.inventory_shards) != instance.inventory_shards:
+            raise serializers.ValidationError("Switch the ticket type back to DATABASE before changing its shards.")
         return data
 
 
@@ -43,7 +59,7 @@ class TicketSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ticket
         fields = [
-            'id', 'ticket_type', 'buyer', 'unique_code', 'ticket_status', 'bought_at', 'used_at', 'price_paid'
+            'id', 'ticket_type', 'buyer', 'unique_code', 'ticket_status', 'bought_at', 'used_at', 'price_paid', 'hold_expires_at'
         ]
 
 
@@ -52,4 +68,41 @@ class TicketTypeSerializer(serializers.ModelSerializer):
         model = TicketType
         fields = [
             'id', 'event', 'name', 'description', 'price', 'quantity_available', 'sale_start', 'sale_end', 'ticket_type_status'
-        ]
\ No newline at end of file
+        ]
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    quantity = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = OrderItem
+        fields = ['ticket_type', 'quantity', 'unit_price']
+        read_only_fields = ['unit_price']
+
+
+class OrderRegisterSerializer(serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True)
+    tickets = serializers.SlugRelatedField(slug_field='unique_code', many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'buyer', 'event', 'order_status', 'total_price', 'created_at', 'paid_at', 'items', 'tickets'
+        ]
+        read_only_fields = ['buyer', 'event', 'order_status', 'total_price', 'created_at', 'paid_at']
+
+    def validate_items(self, items):
+        if not items:
+            raise serializers.ValidationError("An order must contain at least one item.")
+        if len({item['ticket_type'].event_id for item in items}) > 1:
+            raise serializers.ValidationError("All ticket types of an order must belong to the same event.")
+        return items
+
+
+class CheckInSerializer(serializers.Serializer):
+    code = serializers.CharField(max_length=512)
+    scanned_at = serializers.DateTimeField(required=False)
+
+
+class CheckInBatchSerializer(serializers.Serializer):
+    scans = CheckInSerializer(many=True, allow_empty=False, max_length=1000)
@@ -0,0 +1,179 @@
+import struct
+import sys
+from array import array
+from django.db import transaction
+from django.db.models import Case, When, Value, DateTimeField
+from django.forms import ValidationError
+from django.utils.timezone import now
+from core.report_cache import bump_versions
+from events.models import Event
+from tickets import checkin_tokens
+from tickets.models import Ticket
+from tickets.services.sales_summary_services import SalesSummaryService
+
+
+class CheckinBundleService:
+    """
+    Builds the offline check-in bundle that gate scanners download before doors open.
+
+    Layout (little-endian):
+        magic      4s   b'TXB1'
+        event_id   u32
+        generated  u32  unix time
+        valid_until u32 unix time (event end)
+        key        32s  HMAC key that verifies this event's QR tokens
+        n_valid    u32
+        n_revoked  u32
+        valid      u64[n_valid]    sorted ids of ACTIVE tickets
+        revoked    u64[n_revoked]  sorted ids of used, canceled, inactive or expired tickets
+
+    A scanner verifies the QR token signature with `key`, then binary-searches the
+    ticket id in `valid` and rejects anything found in `revoked`.
+    """
+
+    MAGIC = b'TXB1'
+    HEADER = struct.Struct('<4sIII32sII')
+    REVOKED_STATUSES = [
+        Ticket.TicketStatusChoices.USED,
+        Ticket.TicketStatusChoices.CANCELED,
+        Ticket.TicketStatusChoices.INACTIVE,
+        Ticket.TicketStatusChoices.EXPIRED,
+    ]
+
+    @staticmethod
+    def build(event: Event) -> bytes:
+        tickets = Ticket.objects.filter(ticket_type__event_id=event.id).order_by('id')
+        valid = CheckinBundleService._ids(tickets.filter(ticket_status=Ticket.TicketStatusChoices.ACTIVE))
+        revoked = CheckinBundleService._ids(tickets.filter(ticket_status__in=CheckinBundleService.REVOKED_STATUSES))
+
+        header = CheckinBundleService.HEADER.pack(
+            CheckinBundleService.MAGIC,
+            event.id,
+            int(now().timestamp()),
+            int(event.end_date.timestamp()),
+            checkin_tokens.event_key(event.id),
+            len(valid),
+            len(revoked),
+        )
+        return header + valid.tobytes() + revoked.tobytes()
+
+    @staticmethod
+    def _ids(tickets) -> array:
+        ids = array('Q', tickets.values_list('id', flat=True).iterator(chunk_size=10000))
+        if sys.byteorder == 'big':
+            ids.byteswap()
+        return ids
+
+
+class CheckInService:
+    """
+    Staff check-in keyed on `Ticket.unique_code`. Scanners may send either the bare
+    code or the whole signed QR payload, whose signature is checked first.
+    """
+
+    CHECKED_IN = 'CHECKED_IN'
+    DUPLICATE = 'DUPLICATE'
+    NOT_FOUND = 'NOT_FOUND'
+    INVALID = 'INVALID'
+    REJECTED = 'REJECTED'
+
+    @staticmethod
+    def check_in(event_id: int, code: str, scanned_at=None) -> dict:
+        """Marks one ticket USED with a single conditional UPDATE (ACTIVE -> USED)."""
+        try:
+            unique_code = CheckInService._resolve(event_id, code, scanned_at)
+        except ValidationError as e:
+            return {'code': code, 'result': CheckInService.INVALID, 'detail': e.messages[0]}
+
+        used_at = scanned_at or now()
+        with transaction.atomic():
+            updated = Ticket.objects.filter(
+                unique_code=unique_code, ticket_type__event_id=event_id, ticket_status=Ticket.TicketStatusChoices.ACTIVE
+            ).update(ticket_status=Ticket.TicketStatusChoices.USED, used_at=used_at)
+            if updated:
+                SalesSummaryService.record_check_in(unique_code)
+                bump_versions([event_id], cross_event=False)
+        if updated:
+            return {'code': unique_code, 'result': CheckInService.CHECKED_IN, 'used_at': used_at}
+
+        current = Ticket.objects.filter(unique_code=unique_code, ticket_type__event_id=event_id).values_list('ticket_status', 'used_at').first()
+        return CheckInService._failure(unique_code, current)
+
+    @staticmethod
+    def check_in_batch(event_id: int, scans) -> list:
+        """
+        Applies a gate device's scans in one transaction: one locking read of the
+        scanned tickets and one UPDATE for all that can be checked in. The first
+        scan of an ACTIVE ticket wins; later ones come back as DUPLICATE. Results
+        keep the order of `scans`.
+        """
+        resolved = []
+        for scan in scans:
+            try:
+                scanned_at = scan.get('scanned_at') or now()
+                resolved.append((CheckInService._resolve(event_id, scan['code'], scanned_at), scanned_at, None))
+            except ValidationError as e:
+                resolved.append((scan['code'], None, e.messages[0]))
+
+        with transaction.atomic():
+            codes = {unique_code for unique_code, _, error in resolved if error is None}
+            rows = list(
+                Ticket.objects.select_for_update(of=('self',))
+                .filter(unique_code__in=codes, ticket_type__event_id=event_id)
+                .values_list('unique_code', 'ticket_status', 'used_at', 'ticket_type_id', 'price_paid')
+            )
+            current = {unique_code: (ticket_status, used_at) for unique_code, ticket_status, used_at, _, _ in rows}
+            prices = {unique_code: (ticket_type_id, price_paid) for unique_code, _, _, ticket_type_id, price_paid in rows}
+
+            to_use = {}
+            for unique_code, scanned_at, error in sorted(
+                (item for item in resolved if item[2] is None), key=lambda item: item[1]
+            ):
+                if current.get(unique_code, (None,))[0] == Ticket.TicketStatusChoices.ACTIVE and unique_code not in to_use:
+                    to_use[unique_code] = scanned_at
+
+            if to_use:
+                Ticket.objects.filter(unique_code__in=to_use, ticket_status=Ticket.TicketStatusChoices.ACTIVE).update(
+                    ticket_status=Ticket.TicketStatusChoices.USED,
+                    used_at=Case(
+                        *[When(unique_code=unique_code, then=Value(used_at)) for unique_code, used_at in to_use.items()],
+                        output_field=DateTimeField(),
+                    ),
+                )
+                SalesSummaryService.record(
+                    (prices[unique_code][0], Ticket.TicketStatusChoices.ACTIVE, Ticket.TicketStatusChoices.USED, prices[unique_code][1])
+                    for unique_code in to_use
+                )
+
+        results = []
+        reported = set()
+        for unique_code, scanned_at, error in resolved:
+            if error is not None:
+                results.append({'code': unique_code, 'result': CheckInService.INVALID, 'detail': error})
+            elif unique_code in to_use and unique_code not in reported and to_use[unique_code] == scanned_at:
+                reported.add(unique_code)
+                results.append({'code': unique_code, 'result': CheckInService.CHECKED_IN, 'used_at': scanned_at})
+            elif unique_code in to_use:
+                results.append({'code': unique_code, 'result': CheckInService.DUPLICATE, 'used_at': to_use[unique_code]})
+            else:
+                results.append(CheckInService._failure(unique_code, current.get(unique_code)))
+        return results
+
+    @staticmethod
+    def _resolve(event_id: int, code: str, scanned_at=None) -> str:
+        # Leituras sincronizadas com atraso por uma catraca offline valem pelo momento da leitura
+        if '.' not in code:
+            return code
+        token = checkin_tokens.verify(code, at=scanned_at)
+        if token['event_id'] != event_id:
+            raise ValidationError('The ticket belongs to another event.')
+        return token['unique_code']
+
+    @staticmethod
+    def _failure(unique_code: str, current) -> dict:
+        if current is None:
+            return {'code': unique_code, 'result': CheckInService.NOT_FOUND}
+        ticket_status, used_at = current
+        if ticket_status == Ticket.TicketStatusChoices.USED:
+            return {'code': unique_code, 'result': CheckInService.DUPLICATE, 'used_at': used_at}
+        return {'code': unique_code, 'result': CheckInService.REJECTED, 'detail': f"Ticket status is '{ticket_status}'."}
@@ -1,12 +1,165 @@
-from tickets.tasks import send_custom_email
-
-def send_qrcode_email(user_email, event, qr_code_buffer):
-    subject = "Ticket QR Code"
-    message = f"Your ticket QR Code for {event} is attached."
-    attachments = [("ticket_qr.png", qr_code_buffer.getvalue(), "image/png")]
-    send_custom_email.delay(subject, message, [user_email], attachments=attachments)
-
-def send_reservation_confirmation_email(user_email, unique_code, price_paid):
-    subject = "Reservation Confirmed"
-    message = f"Your reservation has been confirmed!\nTicket code: {unique_code}\nPrice paid: {price_paid}"
-    send_custom_email.delay(subject, message, [user_email])
\ No newline at end of file
+from smtplib import SMTPException, SMTPServerDisconnected
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from core.rate_limit import TokenBucket
+from tickets.models import Ticket, Order
+from tickets.services.qr_code_services import QRCodeService
+
+RESERVATION_CONFIRMATION = 'reservation_confirmation'
+TICKET_QR_CODE = 'ticket_qr_code'
+ORDER_CONFIRMATION = 'order_confirmation'
+ORDER_QR_CODES = 'order_qr_codes'
+
+# Faixas de prioridade, da mais urgente para a menos urgente
+TRANSACTIONAL = 'transactional'
+CONFIRMATIONS = 'confirmations'
+BULK = 'bulk'
+
+EMAIL_LANES = {
+    TICKET_QR_CODE: TRANSACTIONAL,
+    ORDER_QR_CODES: TRANSACTIONAL,
+    RESERVATION_CONFIRMATION: CONFIRMATIONS,
+    ORDER_CONFIRMATION: CONFIRMATIONS,
+}
+
+
+class EmailSendError(SMTPException):
+    """Sending failed after `sent` of the messages had already gone out."""
+
+    def __init__(self, sent: int):
+        super().__init__(f'Email sending failed after {sent} messages.')
+        self.sent = sent
+
+
+class EmailService:
+    """
+    Builds ticket emails from database ids and sends them over an SMTP connection
+    that stays open for the lifetime of the worker process.
+
+    Tasks only carry `[kind, id]` references, so subjects, bodies and QR code
+    attachments are rendered in the worker instead of travelling through the broker.
+    """
+
+    _connection = None
+
+    @staticmethod
+    def build(kind: str, object_id: int) -> list:
+        builders = {
+            RESERVATION_CONFIRMATION: EmailService.build_reservation_confirmation,
+            TICKET_QR_CODE: EmailService.build_ticket_qr_code,
+            ORDER_CONFIRMATION: EmailService.build_order_confirmation,
+            ORDER_QR_CODES: EmailService.build_order_qr_codes,
+        }
+        if kind not in builders:
+            raise ValueError(f"Unknown email kind '{kind}'.")
+        return builders[kind](object_id)
+
+    @staticmethod
+    def build_reservation_confirmation(ticket_id: int) -> list:
+        ticket = Ticket.objects.select_related('buyer').filter(pk=ticket_id).first()
+        if ticket is None:
+            return []
+        message = f"Your reservation has been confirmed!\nTicket code: {ticket.unique_code}\nPrice paid: {ticket.price_paid}"
+        return [EmailMessage("Reservation Confirmed", message, settings.EMAIL_HOST_USER, [ticket.buyer.email])]
+
+    @staticmethod
+    def build_ticket_qr_code(ticket_id: int) -> list:
+        ticket = Ticket.objects.select_related('buyer', 'ticket_type__event').filter(pk=ticket_id).first()
+        if ticket is None:
+            return []
+        qr_code = QRCodeService.get_or_render(ticket)
+        email = EmailMessage(
+            "Ticket QR Code",
+            f"Your ticket QR Code for {ticket.ticket_type.event.title} is attached.",
+            settings.EMAIL_HOST_USER,
+            [ticket.buyer.email],
+        )
+        email.attach(qr_code.filename, bytes(qr_code.image), qr_code.content_type)
+        return [email]
+
+    @staticmethod
+    def build_order_confirmation(order_id: int) -> list:
+        order = Order.objects.select_related('buyer').filter(pk=order_id).first()
+        if order is None:
+            return []
+        codes = "\n".join(order.tickets.values_list('unique_code', flat=True))
+        message = f"Your order #{order.id} has been confirmed!\nTicket codes:\n{codes}\nTotal price: {order.total_price}"
+        return [EmailMessage("Order Confirmed", message, settings.EMAIL_HOST_USER, [order.buyer.email])]
+
+    @staticmethod
+    def build_order_qr_codes(order_id: int) -> list:
+        order = Order.objects.select_related('buyer', 'event').filter(pk=order_id).first()
+        if order is None:
+            return []
+        qr_codes = QRCodeService.get_many_or_render(order.tickets.select_related('ticket_type__event'))
+        email = EmailMessage(
+            "Ticket QR Codes",
+            f"Your ticket QR Codes for {order.event.title} are attached.",
+            settings.EMAIL_HOST_USER,
+            [order.buyer.email],
+        )
+        for qr_code in qr_codes:
+            email.attach(qr_code.filename, bytes(qr_code.image), qr_code.content_type)
+        return [email]
+
+    @staticmethod
+    def acquire(count: int, lane: str) -> tuple:
+        """
+        Takes up to `count` sends from the cluster-wide email quota for `lane`.
+        Returns how many may be sent now and how long to wait before the rest.
+        """
+        bucket = TokenBucket('email', settings.EMAIL_RATE_PER_MINUTE, settings.EMAIL_RATE_BURST)
+        return bucket.take(count, reserve=settings.EMAIL_LANE_RESERVES[lane])
+
+    @staticmethod
+    def send_messages(messages: list) -> int:
+        """
+        Sends `messages` in batches of EMAIL_BATCH_SIZE over the process-wide
+        connection. If the server drops the connection mid-batch, reconnects once
+        and resends only the messages that had not gone out. Any other failure
+        raises EmailSendError with how many messages were sent before it.
+        """
+        sent = 0
+        reconnected = False
+        while sent < len(messages):
+            batch = messages[sent:sent + settings.EMAIL_BATCH_SIZE]
+            handed = []
+            try:
+                EmailService.get_connection().send_messages(EmailService._hand_over(batch, handed))
+            except SMTPServerDisconnected as e:
+                # A mensagem que estava sendo enviada quando a conexão caiu não saiu
+                went_out = max(len(handed) - 1, 0)
+                sent += went_out
+                EmailService.close_connection()
+                # Servidores SMTP derrubam conexões ociosas: reconecta e segue de onde parou,
+                # mas desiste se a nova conexão cair sem enviar nada
+                if reconnected and not went_out:
+                    raise EmailSendError(sent) from e
+                reconnected = True
+                continue
+            except (SMTPException, ConnectionError) as e:
+                raise EmailSendError(sent + max(len(handed) - 1, 0)) from e
+            sent += len(batch)
+            reconnected = False
+        return sent
+
+    @staticmethod
+    def _hand_over(batch: list, handed: list):
+        """Yields `batch` to the email backend, recording in `handed` each message it has taken."""
+        for message in batch:
+            handed.append(message)
+            yield message
+
+    @staticmethod
+    def get_connection():
+        if EmailService._connection is None:
+            connection = get_connection()
+            connection.open()
+            EmailService._connection = connection
+        return EmailService._connection
+
+    @staticmethod
+    def close_connection() -> None:
+        connection, EmailService._connection = EmailService._connection, None
+        if connection is not None:
+            connection.close()
@@ -0,0 +1,235 @@
+import random
+import time
+from django.conf import settings
+from django.db.models import Case, F, Value, When
+from django.forms import ValidationError
+from django.utils.timezone import now
+from core.redis_client import get_redis_client
+from tickets.models import Ticket, TicketType
+
+# Tira ARGV[1] unidades percorrendo os shards na ordem de KEYS, tudo ou nada;
+# -1 indica shard inexistente (estoque não carregado)
+TAKE_SCRIPT = """
+local levels = {}
+local total = 0
+for index, key in ipairs(KEYS) do
+    local level = redis.call('GET', key)
+    if not level then
+        return -1
+    end
+    levels[index] = tonumber(level)
+    total = total + levels[index]
+end
+local needed = tonumber(ARGV[1])
+if total < needed then
+    return 0
+end
+for index, key in ipairs(KEYS) do
+    if needed == 0 then
+        break
+    end
+    local taken = math.min(levels[index], needed)
+    if taken > 0 then
+        redis.call('DECRBY', key, taken)
+        needed = needed - taken
+    end
+end
+return 1
+"""
+
+# Devolve ARGV[1] unidades a um shard existente
+PUT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+return redis.call('INCRBY', KEYS[1], ARGV[1])
+"""
+
+
+class ShardedInventory:
+    """
+    Stock of a SHARDED ticket type, split into `inventory_shards` Redis counters.
+
+    The shard keys share a hash tag, so a Redis Cluster keeps one type's shards
+    on the same node and a take can move on to neighbouring shards inside a
+    single script. While a type is sharded the `quantity_available` column is a
+    snapshot written back by `reconcile()`, together with how many tickets of
+    the type were committed when it was taken.
+    """
+
+    LOCK_TIMEOUT = 10
+
+    def __init__(self, ticket_type: TicketType, client=None):
+        self.ticket_type_id = ticket_type.pk
+        self.shards = ticket_type.inventory_shards
+        self.client = client or get_redis_client(settings.INVENTORY_REDIS_URL)
+        self._take = self.client.register_script(TAKE_SCRIPT)
+        self._put = self.client.register_script(PUT_SCRIPT)
+
+    def shard_keys(self) -> list:
+        return [f'inventory:{{{self.ticket_type_id}}}:shard:{index}' for index in range(self.shards)]
+
+    @property
+    def lock_key(self) -> str:
+        return f'inventory:{{{self.ticket_type_id}}}:lock'
+
+    def levels(self) -> list:
+        return [None if level is None else int(level) for level in self.client.mget(self.shard_keys())]
+
+    def available(self) -> int:
+        levels = self.levels()
+        if None in levels:
+            return self.restore()
+        return sum(levels)
+
+    def load(self, quantity: int) -> None:
+        """Overwrites every shard, spreading `quantity` as evenly as possible."""
+        base, remainder = divmod(max(quantity, 0), self.shards)
+        pipeline = self.client.pipeline(transaction=False)
+        for index, key in enumerate(self.shard_keys()):
+            pipeline.set(key, base + (1 if index < remainder else 0))
+        pipeline.execute()
+
+    def clear(self) -> None:
+        self.client.delete(*self.shard_keys())
+
+    def take(self, quantity: int) -> bool:
+        """
+        Takes `quantity` units starting at a random shard and moving on to its
+        neighbours when it runs dry, atomically: either the whole quantity is
+        taken or nothing is. Lost shards are restored once before giving up.
+        """
+        keys = self.shard_keys()
+        start = random.randrange(self.shards)
+        keys = keys[start:] + keys[:start]
+        taken = self._take(keys=keys, args=[quantity])
+        if taken < 0:
+            self.restore()
+            taken = self._take(keys=keys, args=[quantity])
+        if taken < 0:
+            raise ValidationError('Inventory is being restored, please try again.')
+        return bool(taken)
+
+    def put(self, quantity: int) -> None:
+        """
+        Returns `quantity` units to a random shard. If the shards were lost they
+        are restored instead; the restore already counts expired reservations
+        as free, and skipping the put keeps it from counting them twice.
+        """
+        key = self.shard_keys()[random.randrange(self.shards)]
+        if self._put(keys=[key], args=[quantity]) < 0:
+            self.restore()
+
+    @staticmethod
+    def committed_tickets(ticket_type_id: int) -> int:
+        """
+        Committed tickets of the type that still count against the snapshot.
+        Only expired reservations are left out: cancellations are kept, since
+        a canceled paid ticket never gave its unit back.
+        """
+        return Ticket.objects.filter(ticket_type_id=ticket_type_id).exclude(
+            ticket_status=Ticket.TicketStatusChoices.EXPIRED
+        ).count()
+
+    def restore(self) -> int:
+        """
+        Rebuilds the shards after Redis lost them (restart, eviction, flush).
+
+        The last snapshot is adjusted by how many committed tickets were added
+        (or expired) since it was taken. That count is read before the shard
+        levels, so a reservation in flight during the snapshot can only be
+        subtracted twice, never missed: a repair under-counts stock rather than
+        overselling it.
+        """
+        with self.lock():
+            levels = self.levels()
+            if None not in levels:
+                return sum(levels)
+
+            snapshot, synced_tickets = TicketType.objects.values_list(
+                'quantity_available', 'inventory_synced_tickets'
+            ).get(pk=self.ticket_type_id)
+            tickets = self.committed_tickets(self.ticket_type_id)
+            quantity = max(snapshot - (tickets - synced_tickets), 0)
+            self.clear()
+            self.load(quantity)
+            self._write_snapshot(quantity, tickets)
+            return quantity
+
+    def reconcile(self) -> int:
+        """
+        Writes the shard total back to `ticket_types.quantity_available`,
+        correcting whatever the snapshot drifted by since the last run.
+        """
+        # Contado antes de ler os shards; ver restore()
+        tickets = self.committed_tickets(self.ticket_type_id)
+        levels = self.levels()
+        if None in levels:
+            return self.restore()
+        quantity = sum(levels)
+        self._write_snapshot(quantity, tickets)
+        return quantity
+
+    def _write_snapshot(self, quantity: int, tickets: int) -> None:
+        # last_modified só avança quando o estoque muda, para não invalidar os ETags a cada reconciliação
+        TicketType.objects.filter(pk=self.ticket_type_id).update(
+            quantity_available=quantity,
+            inventory_synced_at=now(),
+            inventory_synced_tickets=tickets,
+            last_modified=Case(When(quantity_available=quantity, then=F('last_modified')), default=Value(now())),
+        )
+
+    def lock(self):
+        return _RedisLock(self.client, self.lock_key, self.LOCK_TIMEOUT)
+
+
+class _RedisLock:
+    def __init__(self, client, key, timeout):
+        self.client = client
+        self.key = key
+        self.timeout = timeout
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while not self.client.set(self.key, '1', nx=True, ex=self.timeout):
+            if time.monotonic() > deadline:
+                raise ValidationError('Inventory is being restored, please try again.')
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.client.delete(self.key)
+
+
+class InventoryService:
+    @staticmethod
+    def is_sharded(ticket_type: TicketType) -> bool:
+        return ticket_type.inventory_backend == TicketType.InventoryBackendChoices.SHARDED
+
+    @staticmethod
+    def enable_sharding(ticket_type: TicketType) -> None:
+        inventory = ShardedInventory(ticket_type)
+        with inventory.lock():
+            tickets = ShardedInventory.committed_tickets(ticket_type.pk)
+            quantity = TicketType.objects.values_list('quantity_available', flat=True).get(pk=ticket_type.pk)
+            inventory.clear()
+            inventory.load(quantity)
+            TicketType.objects.filter(pk=ticket_type.pk).update(inventory_synced_at=now(), inventory_synced_tickets=tickets)
+
+    @staticmethod
+    def disable_sharding(ticket_type: TicketType) -> None:
+        inventory = ShardedInventory(ticket_type)
+        inventory.reconcile()
+        with inventory.lock():
+            inventory.clear()
+
+    @staticmethod
+    def reconcile_all() -> int:
+        ticket_types = TicketType.objects.filter(
+            inventory_backend=TicketType.InventoryBackendChoices.SHARDED
+        ).only('id', 'inventory_shards')
+        reconciled = 0
+        for ticket_type in ticket_types:
+            ShardedInventory(ticket_type).reconcile()
+            reconciled += 1
+        return reconciled
@@ -0,0 +1,141 @@
+from collections import OrderedDict
+from datetime import timedelta
+from django.db.models import Count, QuerySet, Sum
+from django.forms import ValidationError
+from django.db import transaction
+from django.utils.timezone import now
+from tickets.models import Order, OrderItem, Ticket, TicketType
+from tickets.services.ticket_type_services import TicketTypeService
+from tickets.services.sales_summary_services import SalesSummaryService
+
+
+class OrderService:
+    @staticmethod
+    def get_all_orders() -> QuerySet:
+        return Order.objects.select_related('buyer', 'event').prefetch_related('items', 'tickets').order_by('-created_at')
+
+    @staticmethod
+    def get_orders_by_buyer(buyer_id: int) -> QuerySet:
+        return OrderService.get_all_orders().filter(buyer_id=buyer_id)
+
+    @staticmethod
+    def get_order_by_id(order_id: int) -> Order:
+        return OrderService.get_all_orders().get(pk=order_id)
+
+    @staticmethod
+    def create_order(buyer, items) -> Order:
+        """
+        Purchases several ticket types of one event in a single transaction: one
+        reservation per type for its whole quantity, one insert for the order items
+        and one bulk insert for the tickets. Any sold-out type rolls everything back.
+        """
+        if not items:
+            raise ValidationError('An order must contain at least one item.')
+
+        quantities = OrderedDict()
+        for item in items:
+            ticket_type = item['ticket_type']
+            quantities[ticket_type] = quantities.get(ticket_type, 0) + item['quantity']
+
+        ticket_types = list(quantities)
+        if len({ticket_type.event_id for ticket_type in ticket_types}) > 1:
+            raise ValidationError('All ticket types of an order must belong to the same event.')
+
+        current_time = now()
+        for ticket_type in ticket_types:
+            if ticket_type.ticket_type_status != TicketType.StatusChoices.ACTIVE:
+                raise ValidationError(f"Ticket type '{ticket_type.name}' is not available for sale.")
+            if not ticket_type.sale_start <= current_time <= ticket_type.sale_end:
+                raise ValidationError(f"Ticket type '{ticket_type.name}' is not on sale.")
+
+        reserved = []
+        try:
+            with transaction.atomic():
+                for ticket_type, quantity in quantities.items():
+                    reserved.append((ticket_type, TicketTypeService.reserve_ticket(ticket_type, quantity)))
+
+                order = Order.objects.create(
+                    buyer=buyer,
+                    event_id=ticket_types[0].event_id,
+                    total_price=sum(ticket_type.price * quantity for ticket_type, quantity in quantities.items()),
+                    created_at=current_time,
+                )
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, ticket_type=ticket_type, quantity=quantity, unit_price=ticket_type.price)
+                    for ticket_type, quantity in quantities.items()
+                ])
+                tickets = Ticket.objects.bulk_create([
+                    Ticket(
+                        ticket_type=ticket_type,
+                        buyer=buyer,
+                        order=order,
+                        bought_at=current_time,
+                        hold_expires_at=current_time + timedelta(minutes=ticket_type.hold_minutes),
+                        price_paid=ticket_type.price,
+                    )
+                    for ticket_type, quantity in quantities.items()
+                    for _ in range(quantity)
+                ])
+                SalesSummaryService.record(
+                    (ticket.ticket_type_id, None, ticket.ticket_status, ticket.price_paid) for ticket in tickets
+                )
+        except Exception:
+            for ticket_type, quantity in reserved:
+                TicketTypeService.undo_reservation(ticket_type, quantity)
+            raise
+        return order
+
+    @staticmethod
+    @transaction.atomic
+    def pay_order(order: Order) -> Order:
+        """
+        Pays every reservation of the order. The order row is locked so concurrent
+        payments run one at a time, and the payment is refused (and rolled back)
+        unless every ticket charged for was still reserved when its row was locked,
+        e.g. if the expiry sweep took some of them in the meantime.
+        """
+        order = Order.objects.select_for_update().get(pk=order.pk)
+        if order.order_status != Order.OrderStatusChoices.PENDING_PAYMENT:
+            raise ValidationError(f"Cannot pay an order with status '{order.order_status}'.")
+
+        pending = Ticket.objects.filter(order=order, ticket_status=Ticket.TicketStatusChoices.PENDING_PAYMENT)
+        if pending.filter(hold_expires_at__lt=now()).exists():
+            raise ValidationError('The reservation has expired.')
+        expected = order.items.aggregate(total=Sum('quantity'))['total']
+        if SalesSummaryService.change_status(pending, Ticket.TicketStatusChoices.ACTIVE) != expected:
+            raise ValidationError('Some tickets of this order are no longer reserved.')
+        order.order_status = Order.OrderStatusChoices.PAID
+        order.paid_at = now()
+        order.save(update_fields=['order_status', 'paid_at'])
+        return order
+
+    @staticmethod
+    @transaction.atomic
+    def cancel_order(order: Order) -> Order:
+        if order.order_status in {Order.OrderStatusChoices.CANCELED, Order.OrderStatusChoices.EXPIRED}:
+            raise ValidationError(f"Cannot cancel an order with status '{order.order_status}'.")
+
+        tickets = Ticket.objects.filter(order=order)
+        if tickets.filter(ticket_status=Ticket.TicketStatusChoices.USED).exists():
+            raise ValidationError('Cannot cancel an order with used tickets.')
+
+        # Assim como em change_ticket_status, apenas reservas ainda não pagas devolvem estoque:
+        # ingressos já cancelados ou pagos individualmente não entram na contagem
+        pending_ids = list(
+            tickets.select_for_update()
+            .filter(ticket_status=Ticket.TicketStatusChoices.PENDING_PAYMENT)
+            .values_list('id', flat=True)
+        )
+        quantities = dict(
+            Ticket.objects.filter(id__in=pending_ids).order_by().values_list('ticket_type_id').annotate(quantity=Count('id'))
+        )
+        ticket_types = TicketType.objects.only('id', 'inventory_backend', 'inventory_shards').in_bulk(list(quantities))
+        for ticket_type_id in sorted(quantities):
+            TicketTypeService.release_ticket(ticket_types[ticket_type_id], quantities[ticket_type_id])
+
+        SalesSummaryService.change_status(
+            tickets.exclude(ticket_status=Ticket.TicketStatusChoices.CANCELED), Ticket.TicketStatusChoices.CANCELED
+        )
+        order.order_status = Order.OrderStatusChoices.CANCELED
+        order.save(update_fields=['order_status'])
+        return order
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.db.models import QuerySet
+from django.utils.timezone import now
+from tickets.models import Ticket, TicketQRCode
+from tickets import checkin_tokens
+from tickets.qr_codes import render_qr_code, render_qr_code_row
+
+
+class QRCodeService:
+    @staticmethod
+    def get_or_render(ticket: Ticket) -> TicketQRCode:
+        """
+        Returns the stored QR code of a ticket, rendering and storing it on the first
+        call. `ticket` should come with `ticket_type__event` selected.
+        """
+        qr_code = TicketQRCode.objects.filter(pk=ticket.unique_code).first()
+        if qr_code is None:
+            qr_code = TicketQRCode(unique_code=ticket.unique_code, image=render_qr_code(ticket.qr_payload()), created_at=now())
+            TicketQRCode.objects.bulk_create([qr_code], ignore_conflicts=True)
+        return qr_code
+
+    @staticmethod
+    def get_many_or_render(tickets) -> list:
+        tickets = list(tickets)
+        stored = TicketQRCode.objects.in_bulk([ticket.unique_code for ticket in tickets])
+        missing = [
+            TicketQRCode(unique_code=ticket.unique_code, image=render_qr_code(ticket.qr_payload()), created_at=now())
+            for ticket in tickets if ticket.unique_code not in stored
+        ]
+        TicketQRCode.objects.bulk_create(missing, ignore_conflicts=True)
+        stored.update((qr_code.unique_code, qr_code) for qr_code in missing)
+        return [stored[ticket.unique_code] for ticket in tickets]
+
+    @staticmethod
+    def render_tickets(tickets: QuerySet, image_format: str = TicketQRCode.ImageFormatChoices.PNG,
+                       box_size: int = 10, workers: int = None, chunk_size: int = 500, overwrite: bool = False) -> int:
+        """
+        Pre-renders the QR codes of `tickets` on a process pool and stores them in
+        chunks. Tickets that already have a stored code are skipped unless
+        `overwrite` is set. Returns how many codes were rendered.
+
+        `workers=0` renders in the calling process instead: Celery's prefork
+        workers are daemonic and can't start a pool of their own.
+        """
+        if overwrite:
+            TicketQRCode.objects.filter(unique_code__in=tickets.values('unique_code')).delete()
+        else:
+            tickets = tickets.exclude(unique_code__in=TicketQRCode.objects.values('unique_code'))
+
+        rows = (
+            (unique_code, checkin_tokens.sign(unique_code, event_id, ticket_id, ticket_type_id, valid_until), image_format, box_size)
+            for unique_code, ticket_id, ticket_type_id, event_id, valid_until in tickets.values_list(
+                'unique_code', 'id', 'ticket_type_id', 'ticket_type__event_id', 'ticket_type__event__end_date'
+            ).iterator(chunk_size=chunk_size)
+        )
+
+        if workers == 0:
+            return QRCodeService._store_chunks(rows, image_format, chunk_size, map)
+
+        workers = workers or os.cpu_count() or 1
+        # 'spawn' evita que os filhos herdem as conexões abertas com o banco
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            return QRCodeService._store_chunks(
+                rows, image_format, chunk_size,
+                lambda render, chunk: pool.map(render, chunk, chunksize=max(len(chunk) // workers, 1)),
+            )
+
+    @staticmethod
+    def _store_chunks(rows, image_format: str, chunk_size: int, render_map) -> int:
+        rendered = 0
+        while chunk := list(islice(rows, chunk_size)):
+            created_at = now()
+            TicketQRCode.objects.bulk_create([
+                TicketQRCode(unique_code=unique_code, image_format=image_format, image=image, created_at=created_at)
+                for unique_code, image in render_map(render_qr_code_row, chunk)
+            ], ignore_conflicts=True)
+            rendered += len(chunk)
+        return rendered
+
+    @staticmethod
+    def render_event(event_id: int, **options) -> int:
+        tickets = Ticket.objects.filter(ticket_type__event_id=event_id).exclude(
+            ticket_status__in=[Ticket.TicketStatusChoices.CANCELED, Ticket.TicketStatusChoices.EXPIRED]
+        )
+        return QRCodeService.render_tickets(tickets, **options)
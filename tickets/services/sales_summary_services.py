@@ -0,0 +1,143 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import Count, F, Q, Subquery, Sum, DecimalField, Value
+from django.db.models.functions import Coalesce
+from django.utils.timezone import now
+from core.report_cache import bump_versions
+from tickets.models import Ticket, TicketType, TicketTypeSalesSummary
+
+# Reservas pendentes e expiradas não contam como vendas
+UNSOLD_STATUSES = [Ticket.TicketStatusChoices.PENDING_PAYMENT, Ticket.TicketStatusChoices.EXPIRED]
+
+COUNT_FIELDS = [TicketTypeSalesSummary.count_field(value) for value in Ticket.TicketStatusChoices.values]
+
+
+class SalesSummaryService:
+    """
+    Keeps `ticket_type_sales_summaries` in step with the tickets table.
+
+    Every service that creates, deletes or changes the status of tickets reports
+    the change here inside its own transaction, so reports read one summary row
+    per ticket type instead of scanning tickets. Each change also bumps the
+    cached report version of the affected events. `rebuild` and `verify`
+    recompute the rows from the tickets table to repair or detect drift.
+    """
+
+    @staticmethod
+    def record(transitions) -> None:
+        """
+        Applies `(ticket_type_id, old_status, new_status, price_paid)` transitions;
+        `old_status` is None for new tickets and `new_status` None for deleted ones.
+        """
+        deltas = defaultdict(lambda: defaultdict(Decimal))
+        for ticket_type_id, old_status, new_status, price_paid in transitions:
+            if old_status == new_status:
+                continue
+            if old_status is not None:
+                deltas[ticket_type_id][TicketTypeSalesSummary.count_field(old_status)] -= 1
+                if old_status not in UNSOLD_STATUSES:
+                    deltas[ticket_type_id]['revenue'] -= price_paid
+            if new_status is not None:
+                deltas[ticket_type_id][TicketTypeSalesSummary.count_field(new_status)] += 1
+                if new_status not in UNSOLD_STATUSES:
+                    deltas[ticket_type_id]['revenue'] += price_paid
+        SalesSummaryService.apply(deltas)
+
+    @staticmethod
+    def apply(deltas) -> None:
+        changed = []
+        # Ordenado por id para que transações concorrentes travem os resumos na mesma ordem
+        for ticket_type_id in sorted(deltas):
+            changes = {field: F(field) + value for field, value in deltas[ticket_type_id].items() if value}
+            if not changes:
+                continue
+            changed.append(ticket_type_id)
+            if not TicketTypeSalesSummary.objects.filter(ticket_type_id=ticket_type_id).update(updated_at=now(), **changes):
+                # Sem linha de resumo (tipo criado por fora dos serviços): recalcula a partir dos tickets
+                SalesSummaryService.rebuild([ticket_type_id])
+        if changed:
+            bump_versions(TicketType.objects.filter(id__in=changed).values_list('event_id', flat=True), cross_event=False)
+
+    @staticmethod
+    def change_status(tickets, new_status: str, **fields) -> int:
+        """
+        Locks `tickets`, moves them to `new_status` with one UPDATE (setting any
+        extra `fields`) and records the transitions. Returns how many were changed.
+        """
+        rows = list(
+            tickets.select_for_update(of=('self',)).values_list('id', 'ticket_type_id', 'ticket_status', 'price_paid')
+        )
+        if not rows:
+            return 0
+        updated = Ticket.objects.filter(id__in=[row[0] for row in rows]).update(ticket_status=new_status, **fields)
+        SalesSummaryService.record(
+            (ticket_type_id, ticket_status, new_status, price_paid) for _, ticket_type_id, ticket_status, price_paid in rows
+        )
+        return updated
+
+    @staticmethod
+    def record_check_in(unique_code: str) -> None:
+        """Moves one ticket from ACTIVE to USED in its type's summary without reading the ticket."""
+        updated = TicketTypeSalesSummary.objects.filter(
+            ticket_type_id=Subquery(Ticket.objects.filter(unique_code=unique_code).values('ticket_type_id')[:1])
+        ).update(active_count=F('active_count') - 1, used_count=F('used_count') + 1, updated_at=now())
+        if not updated:
+            SalesSummaryService.rebuild(Ticket.objects.filter(unique_code=unique_code).values_list('ticket_type_id', flat=True))
+
+    @staticmethod
+    def create_summary(ticket_type: TicketType) -> TicketTypeSalesSummary:
+        return TicketTypeSalesSummary.objects.create(ticket_type=ticket_type, updated_at=now())
+
+    @staticmethod
+    def compute(ticket_type_ids=None) -> dict:
+        """Recomputes summary values from the tickets table, keyed by ticket type id."""
+        ticket_types = TicketType.objects.all()
+        if ticket_type_ids is not None:
+            ticket_types = ticket_types.filter(id__in=ticket_type_ids)
+        sold = Q(tickets__isnull=False) & ~Q(tickets__ticket_status__in=UNSOLD_STATUSES)
+        rows = ticket_types.order_by().values('id').annotate(
+            revenue=Coalesce(Sum('tickets__price_paid', filter=sold), Value(0), output_field=DecimalField()),
+            **{
+                TicketTypeSalesSummary.count_field(value): Count('tickets', filter=Q(tickets__ticket_status=value))
+                for value in Ticket.TicketStatusChoices.values
+            },
+        )
+        return {row.pop('id'): row for row in rows}
+
+    @staticmethod
+    def rebuild(ticket_type_ids=None) -> int:
+        expected = SalesSummaryService.compute(ticket_type_ids)
+        updated_at = now()
+        TicketTypeSalesSummary.objects.bulk_create(
+            [
+                TicketTypeSalesSummary(ticket_type_id=ticket_type_id, updated_at=updated_at, **values)
+                for ticket_type_id, values in expected.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['ticket_type'],
+            update_fields=COUNT_FIELDS + ['revenue', 'updated_at'],
+        )
+        bump_versions(TicketType.objects.filter(id__in=list(expected)).values_list('event_id', flat=True), cross_event=False)
+        return len(expected)
+
+    @staticmethod
+    def verify(ticket_type_ids=None) -> dict:
+        """Returns `{ticket_type_id: {field: (stored, expected)}}` for every summary that drifted."""
+        expected = SalesSummaryService.compute(ticket_type_ids)
+        stored = {
+            row.pop('ticket_type_id'): row
+            for row in TicketTypeSalesSummary.objects.filter(ticket_type_id__in=list(expected)).values(
+                'ticket_type_id', 'revenue', *COUNT_FIELDS
+            )
+        }
+        drift = {}
+        for ticket_type_id, values in expected.items():
+            current = stored.get(ticket_type_id, {})
+            fields = {
+                field: (current.get(field), value)
+                for field, value in values.items()
+                if current.get(field) != value
+            }
+            if fields:
+                drift[ticket_type_id] = fields
+        return drift
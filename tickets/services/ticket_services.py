@@ -1,9 +1,11 @@
 from django.db.models import QuerySet
+from datetime import timedelta
 from django.forms import ValidationError
 from django.db import transaction
 from django.utils.timezone import now
 from tickets.models import Ticket, TicketType
 from tickets.services.ticket_type_services import TicketTypeService
+from tickets.services.sales_summary_services import SalesSummaryService
 
 
 
@@ -31,7 +33,10 @@ class TicketService:
         TicketTypeService.reserve_ticket(ticket_type)
 
         try:
-            ticket = Ticket.objects.create(**validated_data)
+            validated_data['hold_expires_at'] = now() + timedelta(minutes=ticket_type.hold_minutes)
+            with transaction.atomic():
+                ticket = Ticket.objects.create(**validated_data)
+                SalesSummaryService.record([(ticket.ticket_type_id, None, ticket.ticket_status, ticket.price_paid)])
         except Exception:
             TicketTypeService.release_ticket(ticket_type)
             raise
@@ -40,15 +45,27 @@ class TicketService:
         return ticket
 
     @staticmethod
+    @transaction.atomic
     def update_ticket(ticket: Ticket, validated_data) -> Ticket:
+        previous = (ticket.ticket_type_id, ticket.ticket_status, ticket.price_paid)
         for key, value in validated_data.items():
             setattr(ticket, key, value)
         ticket.save()
+        if previous != (ticket.ticket_type_id, ticket.ticket_status, ticket.price_paid):
+            SalesSummaryService.record([
+                (previous[0], previous[1], None, previous[2]),
+                (ticket.ticket_type_id, None, ticket.ticket_status, ticket.price_paid),
+            ])
         return ticket
 
     @staticmethod
+    @transaction.atomic
     def delete_ticket(ticket: Ticket) -> None:
-        TicketTypeService.release_ticket(ticket.ticket_type)
+        # Só reservas pendentes ainda seguram uma unidade: expirados e cancelados já a devolveram
+        ticket_status = Ticket.objects.select_for_update().values_list('ticket_status', flat=True).get(pk=ticket.pk)
+        if ticket_status == Ticket.TicketStatusChoices.PENDING_PAYMENT:
+            TicketTypeService.release_ticket(ticket.ticket_type)
+        SalesSummaryService.record([(ticket.ticket_type_id, ticket_status, None, ticket.price_paid)])
         ticket.delete()
 
     @staticmethod
@@ -60,10 +77,7 @@ class TicketService:
 
     @staticmethod
     def use_ticket(ticket: Ticket) -> Ticket:
-        ticket.change_ticket_status('USED')
-        ticket.used_at = now()  
-        ticket.save()
-        return ticket
+        return TicketService.change_ticket_status(ticket, 'USED')
 
     @staticmethod
     @transaction.atomic
@@ -82,12 +96,17 @@ class TicketService:
         if new_status == 'ACTIVE' and ticket.ticket_status != 'PENDING_PAYMENT':
             raise ValidationError("Only PENDING_PAYMENT tickets can transition to ACTIVE.")
 
+        if new_status == 'ACTIVE' and ticket.hold_expires_at and ticket.hold_expires_at < now():
+            raise ValidationError("The reservation has expired.")
+
         if new_status == 'CANCELED' and ticket.ticket_status == 'PENDING_PAYMENT':
             TicketTypeService.release_ticket(ticket.ticket_type)
 
+        previous_status = ticket.ticket_status
         ticket.ticket_status = new_status
         if new_status == 'USED':
             ticket.used_at = now()
 
         ticket.save()
+        SalesSummaryService.record([(ticket.ticket_type_id, previous_status, new_status, ticket.price_paid)])
         return ticket
\ No newline at end of file
@@ -1,49 +1,247 @@
-from django.db.models import QuerySet
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet, F, Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Now
 from django.forms import ValidationError
-from tickets.models import TicketType
+from django.utils.timezone import now
+from tickets.models import TicketType, Ticket, Order
+from tickets.services.inventory_services import InventoryService, ShardedInventory
+from tickets.services.sales_summary_services import SalesSummaryService
+from core.conditional import version_tag
+from core.report_cache import bump_versions
 from events.models import Event
-from django.db import transaction
 
 
 class TicketTypeService:
     @staticmethod
     def get_all_ticket_types() -> QuerySet:
-        return TicketType.objects.select_related('event').all()
+        lapsed_holds = (
+            Ticket.objects.filter(
+                ticket_type=OuterRef('pk'),
+                ticket_status=Ticket.TicketStatusChoices.PENDING_PAYMENT,
+                hold_expires_at__lt=Now(),
+            )
+            .order_by()
+            .values('ticket_type')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return TicketType.objects.select_related('event').annotate(lapsed_holds=Coalesce(Subquery(lapsed_holds), 0))
 
     @staticmethod
     def get_ticket_type_by_id(ticket_type_id: int) -> TicketType:
         return TicketType.objects.get(pk=ticket_type_id)
 
+    @staticmethod
+    def get_ticket_type_version(ticket_type_id: int):
+        """
+        `(etag, last_modified)` of one ticket type, read without loading it; None
+        if it doesn't exist. Lapsed holds are part of the tag because they change
+        `available_quantity` without writing to the ticket type.
+        """
+        version = (
+            TicketTypeService.get_all_ticket_types()
+            .filter(pk=ticket_type_id)
+            .values_list('last_modified', 'lapsed_holds')
+            .first()
+        )
+        if version is None:
+            return None
+        last_modified, lapsed_holds = version
+        return version_tag('ticket-type', ticket_type_id, last_modified, lapsed_holds), last_modified
+
+    @staticmethod
+    def get_ticket_types_version():
+        """`(etag, last_modified)` of the ticket type list: latest change, row count and lapsed holds."""
+        version = TicketType.objects.aggregate(last_modified=Max('last_modified'), total=Count('id'))
+        lapsed_holds = Ticket.objects.filter(
+            ticket_status=Ticket.TicketStatusChoices.PENDING_PAYMENT,
+            hold_expires_at__lt=now(),
+        ).count()
+        return (
+            version_tag('ticket-types', version['total'], version['last_modified'] or 0, lapsed_holds),
+            version['last_modified'],
+        )
+
     @staticmethod
     def create_ticket_type(validated_data) -> TicketType:
         event = validated_data.get('event')
         if event.event_status != 'PUBLISHED':
             raise ValidationError("Cannot create ticket type for unpublished event.")
-        return TicketType.objects.create(**validated_data)
+        with transaction.atomic():
+            ticket_type = TicketType.objects.create(**validated_data)
+            SalesSummaryService.create_summary(ticket_type)
+            bump_versions([ticket_type.event_id])
+        if InventoryService.is_sharded(ticket_type):
+            InventoryService.enable_sharding(ticket_type)
+        return ticket_type
 
     @staticmethod
     def update_ticket_type(ticket_type: TicketType, validated_data) -> TicketType:
-        for key, value in validated_data.items():
-            setattr(ticket_type, key, value)
-        ticket_type.save()
+        was_sharded = InventoryService.is_sharded(ticket_type)
+        stays_sharded = was_sharded and validated_data.get('inventory_backend', ticket_type.inventory_backend) == ticket_type.inventory_backend
+        previous_event_id = ticket_type.event_id
+        restock = validated_data.get('quantity_available', ticket_type.quantity_available) - ticket_type.quantity_available
+
+        # Removed units are taken from the shards before anything is written, so a
+        # failed take leaves both Redis and the database untouched.
+        unstocked = ShardedInventory(ticket_type) if stays_sharded and restock < 0 else None
+        if unstocked is not None and not unstocked.take(-restock):
+            raise ValidationError('Cannot remove more tickets than are available.')
+
+        try:
+            with transaction.atomic():
+                for key, value in validated_data.items():
+                    setattr(ticket_type, key, value)
+                # Only the fields sent are written, so a partial update doesn't overwrite
+                # the stock with the stale value loaded before concurrent reservations.
+                ticket_type.save(update_fields=list(validated_data))
+                bump_versions([previous_event_id, ticket_type.event_id])
+        except Exception:
+            if unstocked is not None:
+                unstocked.put(-restock)
+            raise
+
+        is_sharded = InventoryService.is_sharded(ticket_type)
+        if is_sharded and not was_sharded:
+            InventoryService.enable_sharding(ticket_type)
+        elif was_sharded and not is_sharded:
+            InventoryService.disable_sharding(ticket_type)
+        elif is_sharded and restock > 0:
+            ShardedInventory(ticket_type).put(restock)
         return ticket_type
 
     @staticmethod
     def delete_ticket_type(ticket_type: TicketType) -> None:
+        bump_versions([ticket_type.event_id])
         ticket_type.delete()
 
     @staticmethod
-    def reserve_ticket(ticket_type: TicketType):
-        with transaction.atomic():
-            ticket_type.refresh_from_db()
-            if ticket_type.quantity_available <= 0:
-                raise ValidationError('No tickets available for this type.')
-            ticket_type.quantity_available -= 1
-            ticket_type.save()
+    def reserve_ticket(ticket_type: TicketType, quantity: int = 1) -> int:
+        """
+        Atomically takes `quantity` units from the ticket type's stock with a single
+        conditional UPDATE. The row is never loaded, so concurrent buyers can't both
+        see the last unit, and the `quantity_available >= 0` check constraint backs
+        the guard at the database level. When the stock looks sold out, holds whose
+        deadline already passed are reclaimed before giving up.
+
+        Returns how many units `undo_reservation` must give back if the surrounding
+        transaction rolls back.
+        """
+        if quantity < 1:
+            raise ValidationError('The quantity must be greater than zero.')
+        if TicketTypeService._take(ticket_type, quantity):
+            return quantity
+        if not InventoryService.is_sharded(ticket_type):
+            if TicketTypeService.reclaim_lapsed_holds(ticket_type) and TicketTypeService._take(ticket_type, quantity):
+                return quantity
+            raise ValidationError('No tickets available for this type.')
+
+        # Shards only get released units back on commit, so reclaimed units go
+        # straight to this reservation and only the rest is taken from Redis.
+        kept = min(TicketTypeService.reclaim_lapsed_holds(ticket_type, keep=quantity), quantity)
+        if kept == quantity or (kept and ShardedInventory(ticket_type).take(quantity - kept)):
+            return quantity - kept
+        if kept:
+            TicketTypeService.release_ticket(ticket_type, kept)
+        raise ValidationError('No tickets available for this type.')
 
     @staticmethod
-    def release_ticket(ticket_type: TicketType):
+    def _take(ticket_type: TicketType, quantity: int) -> bool:
+        if InventoryService.is_sharded(ticket_type):
+            return ShardedInventory(ticket_type).take(quantity)
+        return bool(TicketType.objects.filter(
+            pk=ticket_type.pk, quantity_available__gte=quantity
+        ).update(quantity_available=F('quantity_available') - quantity, last_modified=now()))
+
+    @staticmethod
+    def release_ticket(ticket_type: TicketType, quantity: int = 1) -> None:
+        """
+        Atomically returns `quantity` units to the ticket type's stock. Sharded
+        stock lives outside the database, so it is only put back once the
+        surrounding transaction commits.
+        """
+        if quantity < 1:
+            raise ValidationError('The quantity must be greater than zero.')
+        if InventoryService.is_sharded(ticket_type):
+            transaction.on_commit(lambda: ShardedInventory(ticket_type).put(quantity))
+            return
+        TicketType.objects.filter(pk=ticket_type.pk).update(
+            quantity_available=F('quantity_available') + quantity, last_modified=now()
+        )
+
+    @staticmethod
+    def expire_reservations(ticket_ids, keep=None) -> int:
+        """
+        Moves the given PENDING_PAYMENT tickets to EXPIRED and gives their units
+        back with one UPDATE per ticket type. Must run inside the transaction
+        that locked the tickets; returns how many tickets were actually expired.
+
+        `keep` maps ticket type ids to units held back from the stock because
+        the caller hands them straight to a new reservation.
+        """
+        keep = keep or {}
+        pending = Ticket.objects.filter(id__in=ticket_ids, ticket_status=Ticket.TicketStatusChoices.PENDING_PAYMENT)
+        quantities = dict(pending.order_by().values_list('ticket_type_id').annotate(quantity=Count('id')))
+        if not quantities:
+            return 0
+
+        Order.objects.filter(
+            tickets__id__in=ticket_ids, order_status=Order.OrderStatusChoices.PENDING_PAYMENT
+        ).update(order_status=Order.OrderStatusChoices.EXPIRED)
+        expired = SalesSummaryService.change_status(pending, Ticket.TicketStatusChoices.EXPIRED)
+
+        # Ordenado por id para que lotes concorrentes travem os tipos na mesma ordem
+        ticket_types = TicketType.objects.only('id', 'inventory_backend', 'inventory_shards').in_bulk(list(quantities))
+        for ticket_type_id in sorted(quantities):
+            released = quantities[ticket_type_id] - min(keep.get(ticket_type_id, 0), quantities[ticket_type_id])
+            if released:
+                TicketTypeService.release_ticket(ticket_types[ticket_type_id], released)
+        return expired
+
+    @staticmethod
+    def reclaim_lapsed_holds(ticket_type: TicketType, keep: int = 0) -> int:
+        """
+        Expires this type's reservations whose hold deadline has passed, so their
+        units can be sold right away instead of waiting for the periodic sweep.
+        Up to `keep` of the freed units are not returned to the stock (see
+        `expire_reservations`).
+        """
         with transaction.atomic():
-            ticket_type.refresh_from_db()
-            ticket_type.quantity_available += 1
-            ticket_type.save()
\ No newline at end of file
+            ticket_ids = list(
+                Ticket.objects.select_for_update(skip_locked=True)
+                .filter(
+                    ticket_type_id=ticket_type.pk,
+                    ticket_status=Ticket.TicketStatusChoices.PENDING_PAYMENT,
+                    hold_expires_at__lt=now(),
+                )
+                .values_list('id', flat=True)[:settings.RESERVATION_SWEEP_CHUNK_SIZE]
+            )
+            if not ticket_ids:
+                return 0
+            return TicketTypeService.expire_reservations(ticket_ids, keep={ticket_type.pk: keep})
+
+    @staticmethod
+    def undo_reservation(ticket_type: TicketType, quantity: int = 1) -> None:
+        """
+        Gives back units reserved inside a transaction that was rolled back.
+        Database reservations are undone by the rollback itself; sharded stock
+        lives in Redis and has to be put back explicitly.
+        """
+        if quantity and InventoryService.is_sharded(ticket_type):
+            ShardedInventory(ticket_type).put(quantity)
+
+    @staticmethod
+    def get_available_quantity(ticket_type: TicketType) -> int:
+        """
+        Units that can be sold right now: the stock plus reservations whose hold
+        deadline already passed, even if the sweep hasn't expired them yet.
+        """
+        lapsed_holds = Ticket.objects.filter(
+            ticket_type_id=ticket_type.pk,
+            ticket_status=Ticket.TicketStatusChoices.PENDING_PAYMENT,
+            hold_expires_at__lt=now(),
+        ).count()
+        if InventoryService.is_sharded(ticket_type):
+            return ShardedInventory(ticket_type).available() + lapsed_holds
+        return TicketType.objects.values_list('quantity_available', flat=True).get(pk=ticket_type.pk) + lapsed_holds
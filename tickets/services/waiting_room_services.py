@@ -0,0 +1,105 @@
+import math
+import time
+from django.conf import settings
+from django.core import signing
+from django.forms import ValidationError
+from core.redis_client import get_redis_client
+from events.models import Event
+
+# Agenda o comprador no próximo horário livre da fila; quem ainda está dentro
+# da janela de compra recebe de volta o mesmo horário
+JOIN_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local existing = redis.call('HGET', KEYS[2], ARGV[4])
+if existing and tonumber(existing) + window >= now then
+    return existing
+end
+local slot = math.max(now, tonumber(redis.call('GET', KEYS[1]) or '0'))
+redis.call('SET', KEYS[1], tostring(slot + interval))
+redis.call('HSET', KEYS[2], ARGV[4], tostring(slot))
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+return tostring(slot)
+"""
+
+
+class WaitingRoomError(ValidationError):
+    pass
+
+
+class WaitingRoomService:
+    """
+    Virtual queue in front of the purchase endpoints of events with
+    `waiting_room_enabled`.
+
+    Each arriving buyer gets the next admission slot, spaced 60 / waiting_room_rate
+    seconds apart, inside a signed token. Buyers may purchase from their slot until
+    the end of the purchase window, so the database sees at most
+    `waiting_room_rate` new buyers per minute. Everything needed to answer status
+    polls travels in the token, so polling never touches the database.
+    """
+
+    SALT = 'tickets.waiting_room'
+    KEY_TTL = 60 * 60 * 24
+
+    @staticmethod
+    def join(event: Event, user) -> dict:
+        if not event.waiting_room_enabled:
+            raise WaitingRoomError('The waiting room is not enabled for this event.')
+
+        client = get_redis_client(settings.WAITING_ROOM_REDIS_URL)
+        window = event.waiting_room_window * 60
+        join_script = client.register_script(JOIN_SCRIPT)
+        slot = float(join_script(
+            keys=[f'waiting_room:{{{event.id}}}:next_slot', f'waiting_room:{{{event.id}}}:buyers'],
+            args=[repr(time.time()), repr(60 / event.waiting_room_rate), window, user.id, WaitingRoomService.KEY_TTL],
+        ))
+        token = signing.dumps(
+            {'e': event.id, 'u': user.id, 's': slot, 'w': window, 'r': event.waiting_room_rate},
+            salt=WaitingRoomService.SALT,
+            compress=True,
+        )
+        return WaitingRoomService.status(token, user)
+
+    @staticmethod
+    def status(token: str, user) -> dict:
+        payload = WaitingRoomService._load(token, user)
+        current_time = time.time()
+        eta = max(payload['s'] - current_time, 0)
+        return {
+            'event_id': payload['e'],
+            'token': token,
+            'position': math.ceil(eta * payload['r'] / 60),
+            'eta_seconds': math.ceil(eta),
+            'admitted': eta == 0 and current_time <= payload['s'] + payload['w'],
+            'expires_in_seconds': max(math.floor(payload['s'] + payload['w'] - current_time), 0),
+        }
+
+    @staticmethod
+    def check_admission(event: Event, user, token: str) -> None:
+        """Raises WaitingRoomError unless `token` admits `user` to buy for `event` right now."""
+        if not event.waiting_room_enabled:
+            return
+        if not token:
+            raise WaitingRoomError('This event has a waiting room. Join it to get a queue token.')
+
+        payload = WaitingRoomService._load(token, user)
+        if payload['e'] != event.id:
+            raise WaitingRoomError('The queue token belongs to another event.')
+        current_time = time.time()
+        if current_time < payload['s']:
+            raise WaitingRoomError('You have not been admitted yet.')
+        if current_time > payload['s'] + payload['w']:
+            raise WaitingRoomError('Your purchase window has expired. Join the waiting room again.')
+
+    @staticmethod
+    def _load(token: str, user) -> dict:
+        try:
+            payload = signing.loads(token, salt=WaitingRoomService.SALT)
+        except signing.BadSignature:
+            raise WaitingRoomError('Invalid queue token.')
+        if payload['u'] != user.id:
+            raise WaitingRoomError('The queue token belongs to another user.')
+        return payload
@@ -1,11 +1,17 @@
-from datetime import timedelta
+from smtplib import SMTPException
 from celery import shared_task
 from celery.exceptions import MaxRetriesExceededError
+from celery.signals import worker_process_shutdown
 from django.utils.timezone import now
 from tickets.models import Ticket
 from tickets.services.ticket_type_services import TicketTypeService
+from tickets.services.inventory_services import InventoryService
+from tickets.services.qr_code_services import QRCodeService
+from tickets.services import email_services
+from tickets.services.email_services import EmailService, EmailSendError
 from django.conf import settings
 from django.core.mail import EmailMessage
+from django.db import transaction
 
 @shared_task(
         autoretry_for=(Exception,),
@@ -13,29 +19,125 @@ from django.core.mail import EmailMessage
 )
 def clear_expired_reservations():
     """
-    Remove reservas que expiraram sem pagamento.
+    Expira reservas cujo prazo (hold_expires_at) passou sem pagamento e devolve o estoque.
+    A compra já trata prazos vencidos como estoque livre; esta tarefa apenas faz a limpeza.
+
+    Processa lotes de RESERVATION_SWEEP_CHUNK_SIZE tickets travados com SKIP LOCKED,
+    cada um em sua própria transação, para não segurar os tipos de ticket por muito tempo.
+    """
+    cutoff = now()
+    released = 0
+    while True:
+        with transaction.atomic():
+            ticket_ids = list(
+                Ticket.objects.select_for_update(skip_locked=True)
+                .filter(ticket_status=Ticket.TicketStatusChoices.PENDING_PAYMENT, hold_expires_at__lt=cutoff)
+                .order_by('hold_expires_at')
+                .values_list('id', flat=True)[:settings.RESERVATION_SWEEP_CHUNK_SIZE]
+            )
+            if not ticket_ids:
+                break
+            released += TicketTypeService.expire_reservations(ticket_ids)
+
+    return f"Reservas expiradas liberadas: {released}"
+
+@shared_task
+def reconcile_sharded_inventory():
+    """
+    Grava no banco o estoque dos tipos de ticket particionados em Redis e
+    reconstrói os shards perdidos após uma falha.
+    """
+    reconciled = InventoryService.reconcile_all()
+    return f"Tipos de ticket reconciliados: {reconciled}"
+
+@shared_task
+def render_ticket_qr_codes(unique_codes):
+    """
+    Gera antecipadamente os QR codes de tickets recém reservados, para que o
+    pagamento apenas leia a imagem pronta.
+    """
+    tickets = Ticket.objects.filter(unique_code__in=unique_codes).select_related('ticket_type__event')
+    return f"QR codes gerados: {len(QRCodeService.get_many_or_render(tickets))}"
+
+@shared_task
+def render_event_qr_codes(event_id, image_format='PNG', box_size=10):
+    """
+    Gera em lote os QR codes de todos os tickets de um evento.
+
+    Renderiza no próprio processo, em blocos: os workers prefork do Celery são
+    daemônicos e não podem abrir um pool de processos (use o comando
+    render_qr_codes para renderizar em paralelo).
+    """
+    rendered = QRCodeService.render_event(event_id, image_format=image_format, box_size=box_size, workers=0)
+    return f"QR codes gerados: {rendered}"
+
+def queue_emails(references):
     """
+    Enfileira e-mails de tickets e pedidos, cada um na fila da sua faixa de prioridade.
+
+    :param references: Lista de pares [tipo, id] (ex: [['order_confirmation', 42]])
+    """
+    lanes = {}
+    for kind, object_id in references:
+        lanes.setdefault(email_services.EMAIL_LANES[kind], []).append([kind, object_id])
+    for lane, lane_references in lanes.items():
+        send_emails.apply_async((lane_references, lane), queue=f'email_{lane}')
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=30)
+def send_emails(self, references, lane=email_services.TRANSACTIONAL):
+    """
+    Monta e envia em lote os e-mails de tickets e pedidos, dentro da cota
+    compartilhada de envio. O que não couber na cota é reagendado para quando
+    houver tokens livres, em vez de falhar.
+
+    As mensagens saem em lotes de EMAIL_BATCH_SIZE pela conexão reaproveitada do
+    worker; se o SMTP falhar, a nova tentativa leva apenas as referências que ainda não saíram,
+    para que ninguém receba o mesmo e-mail duas vezes.
+
+    :param references: Lista de pares [tipo, id]; o conteúdo e os anexos são gerados aqui, no worker
+    :param lane: Faixa de prioridade das referências
+    """
+    granted, wait = EmailService.acquire(len(references), lane)
+
+    # Monta todas as mensagens liberadas antes de enviar, para que saiam em lotes;
+    # `owners` guarda a posição da referência que gerou cada mensagem
+    messages, owners = [], []
+    for index, (kind, object_id) in enumerate(references[:granted]):
+        for message in EmailService.build(kind, object_id):
+            messages.append(message)
+            owners.append(index)
+
     try:
-        expired_tickets = Ticket.objects.filter(ticket_status='PENDING_PAYMENT', bought_at__lt=now() - timedelta(minutes=15))
-        
-        for ticket in expired_tickets:
-            TicketTypeService.release_ticket(ticket.ticket_type)
-            ticket.delete()
+        sent = EmailService.send_messages(messages)
+    except EmailSendError as exc:
+        # Só volta a partir da primeira mensagem que não saiu; as sobras ainda não
+        # foram reagendadas, então seguem junto na nova tentativa
+        raise self.retry(args=(references[owners[exc.sent]:], lane), exc=exc)
 
-        return f"Reservas expiradas limpas: {expired_tickets.count()}"
-    except Exception as e:
-        raise e
+    # Só reagenda as sobras depois que o lote liberado saiu
+    if granted < len(references):
+        send_emails.apply_async((references[granted:], lane), queue=f'email_{lane}', countdown=wait)
+    return f"E-mails enviados: {sent}"
 
-@shared_task(rate_limit="5/m")
+@shared_task(
+        autoretry_for=(SMTPException, ConnectionError),
+        retry_kwargs={"max_retries": 5, "countdown": 30},
+)
 def send_custom_email(subject, message, recipient_list, attachments=None):
     """
     Envia um e-mail com anexos usando as configurações do Django.
+    Usa a faixa de menor prioridade (avisos e lembretes); sem cota livre, é reagendado.
     
     :param subject: Assunto do e-mail
     :param message: Corpo do e-mail
     :param recipient_list: Lista de destinatários (ex: ['email1@email.com'])
     :param attachments: Lista de anexos [(nome_arquivo, conteudo, tipo_mime)]
     """
+    granted, wait = EmailService.acquire(1, email_services.BULK)
+    if not granted:
+        send_custom_email.apply_async((subject, message, recipient_list, attachments), countdown=wait)
+        return "E-mail reagendado"
+
     email = EmailMessage(subject, message, settings.EMAIL_HOST_USER, recipient_list)
     
     if attachments:
@@ -43,4 +145,8 @@ def send_custom_email(subject, message, recipient_list, attachments=None):
             filename, content, mime_type = attachment
             email.attach(filename, content, mime_type)
 
-    email.send()
+    EmailService.send_messages([email])
+
+@worker_process_shutdown.connect
+def close_email_connection(**kwargs):
+    EmailService.close_connection()
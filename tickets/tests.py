@@ -1,3 +1,1036 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import json
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from importlib.util import find_spec
+from smtplib import SMTPServerDisconnected
+from unittest import skipUnless
+from unittest.mock import patch
+from celery.exceptions import Retry
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.forms import ValidationError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from core.models import ExportJob, IdempotencyKey
+from core.report_cache import ALL_EVENTS, get_version
+from core.redis_client import get_redis_client
+from core.services import ExportService
+from events.models import Category, Event
+from events.services import EventSearchService
+from tickets.models import Order, Ticket, TicketQRCode, TicketType, TicketTypeSalesSummary
+from tickets.services.checkin_services import CheckInService
+from tickets.services.email_services import EmailService, EmailSendError
+from tickets.services.inventory_services import InventoryService, ShardedInventory
+from tickets.services.order_services import OrderService
+from tickets.services.ticket_services import TicketService
+from tickets.services.ticket_type_services import TicketTypeService
+from tickets.services.waiting_room_services import WaitingRoomError, WaitingRoomService
+from tickets.tasks import clear_expired_reservations, render_event_qr_codes, send_emails
+from users.models import User, UserProfileType
 
-# Create your tests here.
+
+class TicketsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        current_time = now()
+        cls.organizer = User.objects.create_user(
+            email='organizer@example.com',
+            password='password',
+            profile_type=UserProfileType.ORGANIZER,
+            cnpj_cpf='12345678901',
+            business_name='Organizer',
+            commercial_address='Rua A, 1',
+        )
+        cls.buyer = User.objects.create_user(email='buyer@example.com', password='password')
+        cls.event = Event.objects.create(
+            title='Show',
+            description='Show',
+            start_date=current_time + timedelta(days=10),
+            end_date=current_time + timedelta(days=11),
+            location='Recife',
+            total_capacity=1000,
+            event_status=Event.EventStatusChoices.PUBLISHED,
+            organizer=cls.organizer,
+        )
+
+    def create_ticket_type(self, quantity=10, **fields):
+        current_time = now()
+        fields.setdefault('name', TicketType.TicketTypeNameChoices.REGULAR)
+        return TicketTypeService.create_ticket_type({
+            'event': self.event,
+            'description': 'Ingresso',
+            'price': Decimal('50.00'),
+            'quantity_available': quantity,
+            'sale_start': current_time - timedelta(days=1),
+            'sale_end': current_time + timedelta(days=5),
+            **fields,
+        })
+
+    def stock(self, ticket_type):
+        return TicketType.objects.values_list('quantity_available', flat=True).get(pk=ticket_type.pk)
+
+
+class ReservationTests(TicketsTestCase):
+    def test_reserve_ticket_never_oversells(self):
+        ticket_type = self.create_ticket_type(quantity=2)
+        TicketTypeService.reserve_ticket(ticket_type, 2)
+        with self.assertRaises(ValidationError):
+            TicketTypeService.reserve_ticket(ticket_type)
+        self.assertEqual(self.stock(ticket_type), 0)
+
+    def test_reserve_ticket_rejects_quantity_above_stock(self):
+        ticket_type = self.create_ticket_type(quantity=3)
+        with self.assertRaises(ValidationError):
+            TicketTypeService.reserve_ticket(ticket_type, 4)
+        self.assertEqual(self.stock(ticket_type), 3)
+
+    def test_sold_out_order_rolls_back_every_item(self):
+        regular = self.create_ticket_type(quantity=5)
+        vip = self.create_ticket_type(quantity=1, name=TicketType.TicketTypeNameChoices.VIP)
+        with self.assertRaises(ValidationError):
+            OrderService.create_order(self.buyer, [
+                {'ticket_type': regular, 'quantity': 2},
+                {'ticket_type': vip, 'quantity': 2},
+            ])
+        self.assertEqual(self.stock(regular), 5)
+        self.assertEqual(self.stock(vip), 1)
+        self.assertFalse(Order.objects.exists())
+
+
+class ReservationExpiryTests(TicketsTestCase):
+    def lapse(self, order):
+        order.tickets.update(hold_expires_at=now() - timedelta(minutes=1))
+
+    def test_sweep_expires_lapsed_holds_and_releases_stock(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        lapsed = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 3}])
+        open_order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 2}])
+        self.lapse(lapsed)
+
+        clear_expired_reservations()
+
+        self.assertEqual(self.stock(ticket_type), 8)
+        self.assertEqual(Order.objects.get(pk=lapsed.pk).order_status, Order.OrderStatusChoices.EXPIRED)
+        self.assertEqual(Order.objects.get(pk=open_order.pk).order_status, Order.OrderStatusChoices.PENDING_PAYMENT)
+        self.assertFalse(lapsed.tickets.exclude(ticket_status=Ticket.TicketStatusChoices.EXPIRED).exists())
+
+    def test_sweep_does_not_release_twice(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        self.lapse(OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 3}]))
+        clear_expired_reservations()
+        clear_expired_reservations()
+        self.assertEqual(self.stock(ticket_type), 10)
+
+    def test_lapsed_order_cannot_be_paid(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 1}])
+        self.lapse(order)
+        with self.assertRaises(ValidationError):
+            OrderService.pay_order(order)
+
+    def test_deleting_an_expired_ticket_does_not_release_it_again(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 1}])
+        self.lapse(order)
+        clear_expired_reservations()
+        self.assertEqual(self.stock(ticket_type), 10)
+
+        TicketService.delete_ticket(order.tickets.select_related('ticket_type').get())
+
+        self.assertEqual(self.stock(ticket_type), 10)
+
+    def test_deleting_a_pending_ticket_releases_it(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 1}])
+        TicketService.delete_ticket(order.tickets.select_related('ticket_type').get())
+        self.assertEqual(self.stock(ticket_type), 10)
+
+    def test_sold_out_type_reclaims_lapsed_holds_before_refusing(self):
+        ticket_type = self.create_ticket_type(quantity=2)
+        lapsed = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 2}])
+        self.lapse(lapsed)
+        self.assertEqual(TicketTypeService.get_available_quantity(ticket_type), 2)
+
+        OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 2}])
+
+        self.assertEqual(self.stock(ticket_type), 0)
+        self.assertEqual(Order.objects.get(pk=lapsed.pk).order_status, Order.OrderStatusChoices.EXPIRED)
+
+
+class OrderServiceTests(TicketsTestCase):
+    def test_create_order_reserves_stock(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 3}])
+        self.assertEqual(order.tickets.count(), 3)
+        self.assertEqual(self.stock(ticket_type), 7)
+
+    def test_order_cannot_be_paid_twice(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 2}])
+        OrderService.pay_order(order)
+        with self.assertRaises(ValidationError):
+            OrderService.pay_order(order)
+        self.assertEqual(order.tickets.filter(ticket_status=Ticket.TicketStatusChoices.ACTIVE).count(), 2)
+
+    def test_order_missing_reservations_is_not_marked_paid(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 2}])
+        # Como se a varredura tivesse expirado um dos ingressos depois da checagem do prazo
+        order.tickets.filter(pk=order.tickets.order_by('id').first().pk).update(ticket_status=Ticket.TicketStatusChoices.EXPIRED)
+
+        with self.assertRaises(ValidationError):
+            OrderService.pay_order(order)
+
+        self.assertEqual(Order.objects.get(pk=order.pk).order_status, Order.OrderStatusChoices.PENDING_PAYMENT)
+        self.assertFalse(order.tickets.filter(ticket_status=Ticket.TicketStatusChoices.ACTIVE).exists())
+
+    def test_cancel_order_releases_only_pending_tickets(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 3}])
+        canceled, paid, _ = order.tickets.order_by('id')
+        TicketService.change_ticket_status(canceled, Ticket.TicketStatusChoices.CANCELED)
+        TicketService.change_ticket_status(paid, Ticket.TicketStatusChoices.ACTIVE)
+        self.assertEqual(self.stock(ticket_type), 8)
+
+        OrderService.cancel_order(Order.objects.get(pk=order.pk))
+
+        # Só o ingresso ainda pendente volta ao estoque; o cancelado já voltou e o pago não volta
+        self.assertEqual(self.stock(ticket_type), 9)
+        self.assertFalse(order.tickets.exclude(ticket_status=Ticket.TicketStatusChoices.CANCELED).exists())
+
+
+class TicketSalesReportQueryTests(TicketsTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+
+    def assert_constant_queries(self, url):
+        self.create_ticket_type()
+        with CaptureQueriesContext(connection) as single_type:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        for _ in range(11):
+            self.create_ticket_type()
+        cache.clear()
+        with self.assertNumQueries(len(single_type)):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_event_report_queries_do_not_grow_with_ticket_types(self):
+        report = self.assert_constant_queries(f'/reports/ticket_sales/{self.event.id}')
+        self.assertEqual(len(report['ticket_sales_report']), 12)
+
+    def test_organizer_report_queries_do_not_grow_with_ticket_types(self):
+        self.assert_constant_queries('/reports/ticket_sales/')
+
+    def test_purchase_invalidates_the_cached_event_report(self):
+        ticket_type = self.create_ticket_type()
+        url = f'/reports/ticket_sales/{self.event.id}'
+        self.assertEqual(self.client.get(url)['X-Report-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Report-Cache'], 'HIT')
+        cross_event_version = get_version(ALL_EVENTS)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 2}])
+            OrderService.pay_order(order)
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Report-Cache'], 'MISS')
+        self.assertEqual(response.json()['ticket_sales_report'][0]['tickets_sold'], 2)
+        # Vendas não zeram o cache dos relatórios entre eventos
+        self.assertEqual(get_version(ALL_EVENTS), cross_event_version)
+
+
+class KeysetPaginationTests(TicketsTestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def walk(self, url):
+        """Follows `next` links from `url`; returns the ids seen and how many pages were read."""
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.json()['results']]
+            url = response.json()['next']
+            pages += 1
+        return ids, pages
+
+    def test_ticket_pages_cross_ties_without_repeating_or_skipping(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 7}])
+        tickets = list(order.tickets.order_by('id').values_list('id', flat=True))
+        # Dois tickets comprados antes; os outros cinco empatam no mesmo instante
+        Ticket.objects.filter(id__in=tickets[-2:]).update(bought_at=now() - timedelta(hours=1))
+        expected = list(Ticket.objects.order_by('bought_at', 'id').values_list('id', flat=True))
+
+        self.client.force_authenticate(self.organizer)
+        ids, pages = self.walk('/tickets-management/tickets/?page_size=3')
+
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_descending_order_pages_cross_ties(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        for _ in range(5):
+            OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 1}])
+        Order.objects.update(created_at=now())
+
+        self.client.force_authenticate(self.buyer)
+        ids, _ = self.walk('/tickets-management/orders/?page_size=2')
+
+        self.assertEqual(ids, sorted(Order.objects.values_list('id', flat=True), reverse=True))
+
+    def test_last_full_page_has_no_next_link(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 4}])
+        self.client.force_authenticate(self.organizer)
+
+        response = self.client.get('/tickets-management/tickets/?page_size=4')
+        self.assertEqual(len(response.json()['results']), 4)
+        self.assertIsNone(response.json()['next'])
+
+    @override_settings(API_MAX_PAGE_SIZE=2)
+    def test_page_size_is_capped(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 3}])
+        self.client.force_authenticate(self.organizer)
+
+        response = self.client.get('/tickets-management/tickets/?page_size=100')
+        self.assertEqual(len(response.json()['results']), 2)
+        self.assertIsNotNone(response.json()['next'])
+
+    def test_invalid_cursor_is_not_found(self):
+        self.client.force_authenticate(self.organizer)
+        self.assertEqual(self.client.get('/tickets-management/tickets/?cursor=not-a-cursor').status_code, 404)
+
+
+class EventSearchTests(TicketsTestCase):
+    url = '/events-management/events/search/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+
+    def create_event(self, title, description='Programação variada', location='Olinda', **fields):
+        current_time = now()
+        fields.setdefault('event_status', Event.EventStatusChoices.PUBLISHED)
+        return Event.objects.create(
+            title=title,
+            description=description,
+            location=location,
+            start_date=current_time + timedelta(days=20),
+            end_date=current_time + timedelta(days=21),
+            total_capacity=100,
+            organizer=self.organizer,
+            **fields,
+        )
+
+    def search(self, text):
+        response = self.client.get(self.url, {'q': text})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_title_matches_rank_above_description_and_location(self):
+        in_location = self.create_event('Feira de Arte', location='Praça do Jazz')
+        in_description = self.create_event('Noite Cultural', description='Shows de jazz e blues')
+        in_title = self.create_event('Festival de Jazz')
+
+        results = self.search('jazz')['results']
+
+        self.assertEqual([event['id'] for event in results], [in_title.id, in_description.id, in_location.id])
+
+    def test_participants_only_find_published_events(self):
+        published = self.create_event('Festival de Jazz')
+        self.create_event('Jazz em Rascunho', event_status=Event.EventStatusChoices.SKETCH)
+
+        body = self.search('jazz')
+
+        self.assertEqual([event['id'] for event in body['results']], [published.id])
+        self.assertEqual(body['facets']['event_status'], {Event.EventStatusChoices.PUBLISHED: 1})
+
+    def test_equally_ranked_results_page_without_repeating_or_skipping(self):
+        events = [self.create_event('Festival de Jazz') for _ in range(5)]
+
+        ids, url = [], f'{self.url}?q=jazz&page_size=2'
+        while url:
+            body = self.client.get(url).json()
+            ids += [event['id'] for event in body['results']]
+            url = body['next']
+
+        self.assertEqual(ids, [event.id for event in events])
+
+    def test_fts_query_quotes_every_term(self):
+        self.assertEqual(EventSearchService.fts_query('rock "and" OR'), '"rock" """and""" "OR"')
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite FTS5 fallback')
+    def test_sqlite_fallback_ignores_accents_and_query_syntax(self):
+        event = self.create_event('Noite de Forró')
+        self.assertEqual([row['id'] for row in self.search('forro')['results']], [event.id])
+        self.assertEqual(self.search('forró OR NEAR(')['results'], [])
+
+
+class ConditionalGetTests(TicketsTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        self.ticket_type = self.create_ticket_type(quantity=10)
+        self.url = f'/tickets-management/ticket-types/{self.ticket_type.id}/'
+
+    def test_unchanged_ticket_type_is_revalidated_with_one_query(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_reservation_changes_the_ticket_type_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        OrderService.create_order(self.buyer, [{'ticket_type': self.ticket_type, 'quantity': 1}])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_lapsed_hold_changes_the_etag_without_a_write_to_the_ticket_type(self):
+        order = OrderService.create_order(self.buyer, [{'ticket_type': self.ticket_type, 'quantity': 1}])
+        etag = self.client.get(self.url)['ETag']
+        order.tickets.update(hold_expires_at=now() - timedelta(minutes=1))
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        list_etag = self.client.get('/tickets-management/ticket-types/')['ETag']
+        self.assertEqual(self.client.get('/tickets-management/ticket-types/', HTTP_IF_NONE_MATCH=list_etag).status_code, 304)
+
+    def test_event_detail_honours_if_modified_since_until_the_event_changes(self):
+        url = f'/events-management/events/{self.event.id}/'
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        Event.objects.filter(pk=self.event.pk).update(last_modified=now() + timedelta(minutes=1))
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_deleting_an_event_changes_the_event_list_etag(self):
+        other = Event.objects.create(
+            title='Outro', description='Outro', location='Recife', total_capacity=10, organizer=self.organizer,
+            start_date=self.event.start_date, end_date=self.event.end_date,
+        )
+        etag = self.client.get('/events-management/events/')['ETag']
+        other.delete()
+
+        self.assertEqual(self.client.get('/events-management/events/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_ticket_type_is_not_found(self):
+        self.assertEqual(self.client.get('/tickets-management/ticket-types/0/').status_code, 404)
+
+
+class WaitingRoomAdmissionTests(TicketsTestCase):
+    def setUp(self):
+        Event.objects.filter(pk=self.event.pk).update(waiting_room_enabled=True, waiting_room_rate=60, waiting_room_window=10)
+        self.event.refresh_from_db()
+
+    def token(self, user=None, starts_in=0, window=600, event_id=None):
+        payload = {'e': event_id or self.event.id, 'u': (user or self.buyer).id, 's': time.time() + starts_in, 'w': window, 'r': 60}
+        return signing.dumps(payload, salt=WaitingRoomService.SALT, compress=True)
+
+    def assert_refused(self, token, message, user=None):
+        with self.assertRaisesMessage(WaitingRoomError, message):
+            WaitingRoomService.check_admission(self.event, user or self.buyer, token)
+
+    def test_admitted_token_passes(self):
+        WaitingRoomService.check_admission(self.event, self.buyer, self.token())
+
+    def test_missing_token_is_refused(self):
+        self.assert_refused(None, 'Join it to get a queue token')
+
+    def test_token_of_another_event_is_refused(self):
+        self.assert_refused(self.token(event_id=self.event.id + 1), 'another event')
+
+    def test_token_of_another_user_is_refused(self):
+        self.assert_refused(self.token(), 'another user', user=self.organizer)
+
+    def test_tampered_token_is_refused(self):
+        self.assert_refused(self.token()[:-2] + 'xx', 'Invalid queue token')
+
+    def test_token_before_its_slot_is_refused(self):
+        self.assert_refused(self.token(starts_in=30), 'not been admitted yet')
+
+    def test_token_after_its_window_is_refused(self):
+        self.assert_refused(self.token(starts_in=-700), 'window has expired')
+
+    def test_events_without_a_waiting_room_need_no_token(self):
+        Event.objects.filter(pk=self.event.pk).update(waiting_room_enabled=False)
+        self.event.refresh_from_db()
+        WaitingRoomService.check_admission(self.event, self.buyer, None)
+
+    @patch('tickets.views.render_ticket_qr_codes')
+    @patch('tickets.views.queue_emails')
+    def test_order_endpoint_requires_an_admitted_token(self, queue_emails, render_ticket_qr_codes):
+        ticket_type = self.create_ticket_type(quantity=10)
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        data = {'items': [{'ticket_type': ticket_type.id, 'quantity': 1}]}
+
+        self.assertEqual(client.post('/tickets-management/orders/', data, format='json').status_code, 403)
+        response = client.post('/tickets-management/orders/', data, format='json', HTTP_X_QUEUE_TOKEN=self.token())
+        self.assertEqual(response.status_code, 201)
+
+
+@skipUnless(find_spec('fakeredis') and find_spec('lupa'), 'fakeredis[lua] is not installed')
+@override_settings(WAITING_ROOM_REDIS_URL='fakeredis://waiting-room-tests')
+class WaitingRoomJoinTests(TicketsTestCase):
+    def setUp(self):
+        get_redis_client(settings.WAITING_ROOM_REDIS_URL).flushall()
+        Event.objects.filter(pk=self.event.pk).update(waiting_room_enabled=True, waiting_room_rate=60, waiting_room_window=10)
+        self.event.refresh_from_db()
+        self.second_buyer = User.objects.create_user(email='second@example.com', password='password')
+
+    def test_buyers_get_slots_spaced_by_the_rate(self):
+        first = WaitingRoomService.join(self.event, self.buyer)
+        second = WaitingRoomService.join(self.event, self.second_buyer)
+
+        self.assertTrue(first['admitted'])
+        self.assertFalse(second['admitted'])
+        self.assertEqual((second['position'], second['eta_seconds']), (1, 1))
+        with self.assertRaisesMessage(WaitingRoomError, 'not been admitted yet'):
+            WaitingRoomService.check_admission(self.event, self.second_buyer, second['token'])
+
+    def test_rejoining_inside_the_window_keeps_the_slot(self):
+        WaitingRoomService.join(self.event, self.buyer)
+        queued = WaitingRoomService.join(self.event, self.second_buyer)
+        rejoined = WaitingRoomService.join(self.event, self.second_buyer)
+
+        self.assertEqual(
+            signing.loads(rejoined['token'], salt=WaitingRoomService.SALT)['s'],
+            signing.loads(queued['token'], salt=WaitingRoomService.SALT)['s'],
+        )
+
+    def test_join_is_refused_without_a_waiting_room(self):
+        Event.objects.filter(pk=self.event.pk).update(waiting_room_enabled=False)
+        self.event.refresh_from_db()
+        with self.assertRaises(WaitingRoomError):
+            WaitingRoomService.join(self.event, self.buyer)
+
+
+class StreamingReportTests(TicketsTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        self.ticket_type = self.create_ticket_type(quantity=10)
+        OrderService.pay_order(OrderService.create_order(self.buyer, [{'ticket_type': self.ticket_type, 'quantity': 3}]))
+        # Reserva pendente: fica fora do relatório de vendas
+        OrderService.create_order(self.buyer, [{'ticket_type': self.ticket_type, 'quantity': 1}])
+
+    def read(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_sales_detail_streams_only_paid_tickets_as_json(self):
+        _, content = self.read(f'/reports/ticket_sales_detail/?event_id={self.event.id}')
+        rows = json.loads(content)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(set(rows[0]), {'ticket_id', 'buyer', 'ticket_type', 'price_paid', 'event_id', 'bought_at'})
+        self.assertEqual([row['ticket_id'] for row in rows], sorted(row['ticket_id'] for row in rows))
+
+    def test_sales_detail_streams_ndjson_and_csv(self):
+        _, content = self.read('/reports/ticket_sales_detail/?output=ndjson')
+        self.assertEqual(len(content.decode().splitlines()), 3)
+
+        response, content = self.read('/reports/ticket_sales_detail/?output=csv')
+        lines = content.decode().splitlines()
+        self.assertEqual(lines[0], 'ticket_id,buyer,ticket_type,price_paid,event_id,bought_at')
+        self.assertEqual(len(lines), 4)
+        self.assertIn('ticket_sales_detail.csv', response['Content-Disposition'])
+
+    def test_gzip_is_used_when_the_client_accepts_it(self):
+        response, content = self.read('/reports/ticket_sales_detail/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(content))), 3)
+
+    def test_empty_result_is_an_empty_array(self):
+        _, content = self.read(f'/reports/ticket_sales_detail/?start={(now() + timedelta(days=1)).date().isoformat()}')
+        self.assertEqual(json.loads(content), [])
+
+    def test_invalid_parameters_are_rejected(self):
+        for query in ('output=xml', 'event_id=abc', 'start=yesterday'):
+            self.assertEqual(self.client.get(f'/reports/ticket_sales_detail/?{query}').status_code, 400, query)
+
+    def test_events_are_grouped_with_their_ticket_types(self):
+        self.create_ticket_type(name=TicketType.TicketTypeNameChoices.VIP)
+
+        _, content = self.read(f'/reports/events_with_ticket_types/?event_id={self.event.id}')
+        records = json.loads(content)
+        self.assertEqual(len(records), 1)
+        self.assertEqual(len(records[0]['ticket_types']), 2)
+
+        _, content = self.read(f'/reports/events_with_ticket_types/?event_id={self.event.id}&output=csv')
+        self.assertEqual(content.decode().splitlines()[1].count('|'), 1)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), EXPORT_CHUNK_SIZE=2)
+class ExportJobTests(TicketsTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        ticket_type = self.create_ticket_type(quantity=10)
+        OrderService.pay_order(OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 3}]))
+        OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 1}])
+
+    def request_export(self, kind, export_format='CSV'):
+        with patch('core.views.run_export_job.delay') as delay, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/reports/exports/', {'event': self.event.id, 'kind': kind, 'export_format': export_format}, format='json'
+            )
+        return response, delay
+
+    def test_request_queues_a_pending_job(self):
+        response, delay = self.request_export('ATTENDEES')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['export_status'], 'PENDING')
+        self.assertIsNone(response.json()['download_url'])
+        delay.assert_called_once_with(response.json()['id'])
+
+    def test_attendee_csv_is_written_in_chunks_and_downloaded(self):
+        response, _ = self.request_export('ATTENDEES')
+        job_id = response.json()['id']
+        self.assertEqual(self.client.get(f'/reports/exports/{job_id}/download/').status_code, 409)
+
+        job = ExportService.run(ExportJob.objects.get(pk=job_id))
+
+        self.assertEqual((job.export_status, job.row_count), (ExportJob.StatusChoices.COMPLETED, 3))
+        download = self.client.get(f'/reports/exports/{job_id}/download/')
+        self.assertEqual(download.status_code, 200)
+        lines = b''.join(download.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'ticket_id,unique_code,buyer_name,buyer_email,ticket_type,ticket_status,used_at')
+        self.assertEqual(len(lines), 4)
+
+    def test_sales_ndjson_leaves_out_unsold_tickets(self):
+        response, _ = self.request_export('SALES', 'NDJSON_GZ')
+        job = ExportService.run(ExportJob.objects.get(pk=response.json()['id']))
+
+        with job.file.open('rb') as file:
+            rows = [json.loads(line) for line in gzip.decompress(file.read()).splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row['ticket_status'] for row in rows}, {Ticket.TicketStatusChoices.ACTIVE})
+
+    @override_settings(EXPORT_MAX_CONCURRENT_JOBS=1)
+    def test_concurrent_exports_are_limited_per_organizer(self):
+        self.assertEqual(self.request_export('ATTENDEES')[0].status_code, 202)
+        response, delay = self.request_export('SALES')
+
+        self.assertEqual(response.status_code, 400)
+        delay.assert_not_called()
+
+    def test_organizers_only_export_their_own_events(self):
+        other = User.objects.create_user(
+            email='other@example.com', password='password', profile_type=UserProfileType.ORGANIZER,
+            cnpj_cpf='10987654321', business_name='Other', commercial_address='Rua B, 2',
+        )
+        with self.assertRaises(ValidationError):
+            ExportService.create_job(other, self.event, ExportJob.KindChoices.SALES, ExportJob.FormatChoices.CSV)
+
+    def test_purge_fails_stuck_jobs_and_deletes_old_ones(self):
+        stuck = ExportService.create_job(self.organizer, self.event, ExportJob.KindChoices.SALES, ExportJob.FormatChoices.CSV)
+        old = ExportService.run(
+            ExportService.create_job(self.organizer, self.event, ExportJob.KindChoices.SALES, ExportJob.FormatChoices.CSV)
+        )
+        ExportJob.objects.filter(pk=stuck.pk).update(created_at=now() - settings.EXPORT_JOB_TIMEOUT - timedelta(minutes=1))
+        ExportJob.objects.filter(pk=old.pk).update(created_at=now() - settings.EXPORT_RETENTION - timedelta(days=1))
+
+        ExportService.purge_expired()
+
+        stuck.refresh_from_db()
+        self.assertEqual((stuck.export_status, stuck.error), (ExportJob.StatusChoices.FAILED, 'Timed out.'))
+        self.assertFalse(ExportJob.objects.filter(pk=old.pk).exists())
+
+
+class CatalogImportTests(TicketsTestCase):
+    url = '/events-management/events/import/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.organizer)
+        self.category = Category.objects.create(name='Música', slug='musica', description='Shows')
+        current_time = now()
+        self.dates = {
+            'start_date': (current_time + timedelta(days=30)).isoformat(),
+            'end_date': (current_time + timedelta(days=31)).isoformat(),
+            'sale_start': (current_time - timedelta(days=1)).isoformat(),
+            'sale_end': (current_time + timedelta(days=29)).isoformat(),
+        }
+
+    def catalog_event(self, title='Festival', **fields):
+        return {
+            'title': title,
+            'description': 'Festival de verão',
+            'location': 'Recife',
+            'total_capacity': 500,
+            'event_status': 'PUBLISHED',
+            'start_date': self.dates['start_date'],
+            'end_date': self.dates['end_date'],
+            'categories': ['musica'],
+            'ticket_types': [
+                {'name': 'INTEIRA', 'description': 'Inteira', 'price': '100.00', 'quantity_available': 50,
+                 'sale_start': self.dates['sale_start'], 'sale_end': self.dates['sale_end']},
+                {'name': 'MEIA_ENTRADA', 'description': 'Meia', 'price': '50.00', 'quantity_available': 20,
+                 'sale_start': self.dates['sale_start'], 'sale_end': self.dates['sale_end']},
+            ],
+            **fields,
+        }
+
+    def upload(self, content, name='catalog.json', **data):
+        response = self.client.post(self.url, {'file': SimpleUploadedFile(name, content), **data}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def upload_json(self, events, **data):
+        return self.upload(json.dumps(events).encode(), **data)
+
+    def test_events_are_created_with_categories_ticket_types_and_summaries(self):
+        result = self.upload_json([self.catalog_event()])
+
+        self.assertEqual((result['created'], result['ticket_types'], result['failed']), (1, 2, 0))
+        event = Event.objects.get(title='Festival')
+        self.assertEqual(event.organizer_id, self.organizer.id)
+        self.assertEqual(list(event.categories.values_list('id', flat=True)), [self.category.id])
+        self.assertEqual(TicketTypeSalesSummary.objects.filter(ticket_type__event=event).count(), 2)
+
+    def test_importing_again_skips_existing_events(self):
+        self.upload_json([self.catalog_event()])
+        result = self.upload_json([self.catalog_event()])
+
+        self.assertEqual((result['created'], result['skipped']), (0, 1))
+        self.assertEqual(Event.objects.filter(title='Festival').count(), 1)
+
+    def test_dry_run_writes_nothing(self):
+        result = self.upload_json([self.catalog_event()], dry_run='true')
+
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['changes'][0]['action'], 'create')
+        self.assertFalse(Event.objects.filter(title='Festival').exists())
+
+    def test_failing_rows_are_reported_without_blocking_the_rest(self):
+        bad_dates = self.catalog_event('Datas Trocadas')
+        bad_dates['ticket_types'][0]['sale_start'] = self.dates['sale_end']
+        bad_dates['ticket_types'][0]['sale_end'] = self.dates['sale_start']
+
+        result = self.upload_json([
+            self.catalog_event(),
+            self.catalog_event('Sem Categoria', categories=['inexistente']),
+            bad_dates,
+            self.catalog_event('De Outro', organizer='someone@example.com'),
+        ])
+
+        self.assertEqual((result['created'], result['failed']), (1, 3))
+        self.assertEqual([error['row'] for error in result['errors']], [2, 3, 4])
+        self.assertIn("Unknown category 'inexistente'.", result['errors'][0]['errors'])
+        self.assertIn('Events can only be imported for yourself.', result['errors'][2]['errors'])
+
+    def test_csv_rows_with_the_same_ref_form_one_event(self):
+        header = 'ref,title,description,location,total_capacity,event_status,start_date,end_date,categories,ticket_name,ticket_description,ticket_price,ticket_quantity,ticket_sale_start,ticket_sale_end\n'
+        event = f"f1,Festival,Festival de verão,Recife,500,PUBLISHED,{self.dates['start_date']},{self.dates['end_date']},musica"
+        rows = [
+            f"{event},INTEIRA,Inteira,100.00,50,{self.dates['sale_start']},{self.dates['sale_end']}\n",
+            f"f1,,,,,,,,,MEIA_ENTRADA,Meia,50.00,20,{self.dates['sale_start']},{self.dates['sale_end']}\n",
+        ]
+
+        result = self.upload((header + ''.join(rows)).encode(), name='catalog.csv')
+
+        self.assertEqual((result['created'], result['ticket_types']), (1, 2))
+        self.assertEqual(TicketType.objects.filter(event__title='Festival').count(), 2)
+
+    @override_settings(EVENT_IMPORT_API_MAX_EVENTS=1)
+    def test_catalogs_over_the_limit_are_refused(self):
+        content = json.dumps([self.catalog_event(), self.catalog_event('Outro')]).encode()
+        response = self.client.post(self.url, {'file': SimpleUploadedFile('catalog.json', content)}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Event.objects.filter(title='Festival').exists())
+
+
+class QRCodeTaskTests(TicketsTestCase):
+    def test_event_task_renders_without_a_process_pool(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 3}])
+        with patch('tickets.services.qr_code_services.ProcessPoolExecutor') as pool:
+            render_event_qr_codes(self.event.id)
+        pool.assert_not_called()
+        self.assertEqual(TicketQRCode.objects.count(), 3)
+
+
+class SendEmailsTaskTests(SimpleTestCase):
+    references = [['ticket_qr_code', 1], ['ticket_qr_code', 2], ['ticket_qr_code', 3]]
+
+    def setUp(self):
+        self.build = patch.object(EmailService, 'build', side_effect=lambda kind, object_id: [object_id]).start()
+        self.schedule = patch.object(send_emails, 'apply_async').start()
+        self.retry = patch.object(send_emails, 'retry', side_effect=Retry()).start()
+        self.addCleanup(patch.stopall)
+
+    def test_granted_messages_are_sent_together_before_leftovers_are_scheduled(self):
+        patch.object(EmailService, 'acquire', return_value=(2, 5)).start()
+        send_messages = patch.object(EmailService, 'send_messages', return_value=2).start()
+
+        send_emails(self.references, 'transactional')
+
+        send_messages.assert_called_once_with([1, 2])
+        self.schedule.assert_called_once_with((self.references[2:], 'transactional'), queue='email_transactional', countdown=5)
+
+    def test_smtp_failure_retries_only_unsent_references(self):
+        patch.object(EmailService, 'acquire', return_value=(2, 5)).start()
+        patch.object(EmailService, 'send_messages', side_effect=EmailSendError(1)).start()
+
+        with self.assertRaises(Retry):
+            send_emails(self.references, 'transactional')
+
+        self.assertEqual(self.retry.call_args.kwargs['args'], (self.references[1:], 'transactional'))
+        self.schedule.assert_not_called()
+
+
+class FlakyConnection:
+    """Email backend stand-in that drops the connection while sending the given messages."""
+
+    def __init__(self, drops):
+        self.drops = list(drops)
+        self.sent = []
+
+    def send_messages(self, messages):
+        for message in messages:
+            if self.drops and message == self.drops[0]:
+                self.drops.pop(0)
+                raise SMTPServerDisconnected()
+            self.sent.append(message)
+        return len(self.sent)
+
+
+@override_settings(EMAIL_BATCH_SIZE=2)
+class EmailServiceSendTests(SimpleTestCase):
+    def setUp(self):
+        patch.object(EmailService, 'close_connection').start()
+        self.addCleanup(patch.stopall)
+
+    def test_messages_go_out_in_batches(self):
+        connection = FlakyConnection(drops=[])
+        get_connection = patch.object(EmailService, 'get_connection', return_value=connection).start()
+
+        self.assertEqual(EmailService.send_messages([1, 2, 3, 4, 5]), 5)
+        self.assertEqual(connection.sent, [1, 2, 3, 4, 5])
+        self.assertEqual(get_connection.call_count, 3)
+
+    def test_disconnect_resends_only_messages_that_did_not_go_out(self):
+        connection = FlakyConnection(drops=[2])
+        patch.object(EmailService, 'get_connection', return_value=connection).start()
+
+        self.assertEqual(EmailService.send_messages([1, 2, 3, 4, 5]), 5)
+        self.assertEqual(connection.sent, [1, 2, 3, 4, 5])
+
+    def test_second_disconnect_without_progress_gives_up(self):
+        connection = FlakyConnection(drops=[3, 3])
+        patch.object(EmailService, 'get_connection', return_value=connection).start()
+
+        with self.assertRaises(EmailSendError) as raised:
+            EmailService.send_messages([1, 2, 3, 4])
+        self.assertEqual(raised.exception.sent, 2)
+        self.assertEqual(connection.sent, [1, 2])
+
+
+@patch('tickets.views.queue_emails')
+class IdempotentPaymentTests(TicketsTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.buyer)
+        ticket_type = self.create_ticket_type(quantity=10)
+        self.order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 2}])
+        self.url = f'/tickets-management/orders/{self.order.id}/pay/'
+
+    def test_retry_with_same_key_replays_the_response(self, queue_emails):
+        first = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='pay-1')
+        retry = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='pay-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        queue_emails.assert_called_once()
+
+    def test_failed_request_frees_the_key(self, queue_emails):
+        self.order.tickets.update(hold_expires_at=now() - timedelta(minutes=1))
+        self.assertEqual(self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='pay-1').status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def stuck_key(self, lease_ends):
+        # Chave deixada IN_PROGRESS por uma requisição cujo processo morreu
+        return IdempotencyKey.objects.create(
+            user=self.buyer,
+            key='pay-1',
+            scope=f'POST {self.url}',
+            request_fingerprint=hashlib.sha256(b'').hexdigest(),
+            created_at=now(),
+            expires_at=lease_ends,
+        )
+
+    def test_in_progress_key_blocks_retries_while_its_lease_lasts(self, queue_emails):
+        self.stuck_key(now() + timedelta(minutes=1))
+        response = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='pay-1')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).order_status, Order.OrderStatusChoices.PENDING_PAYMENT)
+
+    def test_retry_takes_over_a_key_whose_lease_ran_out(self, queue_emails):
+        self.stuck_key(now() - timedelta(seconds=1))
+        response = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='pay-1')
+
+        self.assertEqual(response.status_code, 200)
+        record = IdempotencyKey.objects.get()
+        self.assertEqual(record.state, IdempotencyKey.StateChoices.COMPLETED)
+        self.assertGreater(record.expires_at, now() + settings.IDEMPOTENCY_KEY_LEASE)
+
+    def test_over_long_key_is_rejected(self, queue_emails):
+        response = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY='k' * 256)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).order_status, Order.OrderStatusChoices.PENDING_PAYMENT)
+
+
+class CheckInTests(TicketsTestCase):
+    def setUp(self):
+        ticket_type = self.create_ticket_type(quantity=10)
+        order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 1}])
+        OrderService.pay_order(order)
+        self.ticket = order.tickets.select_related('ticket_type__event').get()
+
+    def test_signed_payload_checks_in_once(self):
+        first = CheckInService.check_in(self.event.id, self.ticket.qr_payload())
+        second = CheckInService.check_in(self.event.id, self.ticket.unique_code)
+
+        self.assertEqual(first['result'], CheckInService.CHECKED_IN)
+        self.assertEqual(second['result'], CheckInService.DUPLICATE)
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).ticket_status, Ticket.TicketStatusChoices.USED)
+
+    def test_tampered_payload_is_rejected(self):
+        payload = self.ticket.qr_payload()
+        result = CheckInService.check_in(self.event.id, payload[:-2] + ('AA' if payload[-2:] != 'AA' else 'BB'))
+        self.assertEqual(result['result'], CheckInService.INVALID)
+
+    def test_payload_is_rejected_after_the_event_ends(self):
+        payload = self.ticket.qr_payload()
+        result = CheckInService.check_in(self.event.id, payload, scanned_at=self.event.end_date + timedelta(minutes=1))
+
+        self.assertEqual(result['result'], CheckInService.INVALID)
+        self.assertEqual(result['detail'], 'The check-in token expired when the event ended.')
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).ticket_status, Ticket.TicketStatusChoices.ACTIVE)
+
+    def test_batch_keeps_the_first_scan(self):
+        scanned_at = now()
+        results = CheckInService.check_in_batch(self.event.id, [
+            {'code': self.ticket.unique_code, 'scanned_at': scanned_at + timedelta(seconds=5)},
+            {'code': self.ticket.qr_payload(), 'scanned_at': scanned_at},
+        ])
+        self.assertEqual([result['result'] for result in results], [CheckInService.DUPLICATE, CheckInService.CHECKED_IN])
+        self.assertEqual(Ticket.objects.get(pk=self.ticket.pk).used_at, scanned_at)
+
+
+@patch('tickets.services.ticket_type_services.InventoryService.enable_sharding')
+class ShardedTicketTypeUpdateTests(TicketsTestCase):
+    def test_failed_shard_take_leaves_the_stock_untouched(self, enable_sharding):
+        ticket_type = self.create_ticket_type(quantity=10, inventory_backend=TicketType.InventoryBackendChoices.SHARDED)
+        with patch('tickets.services.ticket_type_services.ShardedInventory') as inventory:
+            inventory.return_value.take.return_value = False
+            with self.assertRaises(ValidationError):
+                TicketTypeService.update_ticket_type(ticket_type, {'quantity_available': 4})
+
+        inventory.return_value.take.assert_called_once_with(6)
+        self.assertEqual(self.stock(ticket_type), 10)
+
+    def test_failed_save_puts_taken_units_back(self, enable_sharding):
+        ticket_type = self.create_ticket_type(quantity=10, inventory_backend=TicketType.InventoryBackendChoices.SHARDED)
+        with patch('tickets.services.ticket_type_services.ShardedInventory') as inventory:
+            inventory.return_value.take.return_value = True
+            with self.assertRaises(ValidationError):
+                TicketTypeService.update_ticket_type(ticket_type, {'quantity_available': 4, 'sale_end': ticket_type.sale_start - timedelta(days=1)})
+
+        inventory.return_value.put.assert_called_once_with(6)
+        self.assertEqual(self.stock(ticket_type), 10)
+
+
+@skipUnless(find_spec('fakeredis') and find_spec('lupa'), 'fakeredis[lua] is not installed')
+@override_settings(INVENTORY_REDIS_URL='fakeredis://inventory-tests')
+class ShardedInventoryTests(TicketsTestCase):
+    def setUp(self):
+        self.redis = get_redis_client(settings.INVENTORY_REDIS_URL)
+        self.redis.flushall()
+
+    def create_sharded(self, quantity, shards=4):
+        return self.create_ticket_type(
+            quantity=quantity, inventory_backend=TicketType.InventoryBackendChoices.SHARDED, inventory_shards=shards
+        )
+
+    def test_take_drains_every_shard(self):
+        inventory = ShardedInventory(self.create_sharded(8))
+        self.assertEqual(inventory.levels(), [2, 2, 2, 2])
+
+        self.assertTrue(inventory.take(8))
+        self.assertEqual(inventory.levels(), [0, 0, 0, 0])
+        self.assertFalse(inventory.take(1))
+
+    def test_take_falls_back_to_neighbour_shards(self):
+        inventory = ShardedInventory(self.create_sharded(0))
+        self.redis.set(inventory.shard_keys()[3], 3)
+
+        self.assertFalse(inventory.take(4))
+        self.assertEqual(inventory.levels(), [0, 0, 0, 3])
+        self.assertTrue(inventory.take(3))
+        self.assertEqual(inventory.levels(), [0, 0, 0, 0])
+
+    def test_lost_shards_are_restored_from_committed_tickets(self):
+        ticket_type = self.create_sharded(8)
+        OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 3}])
+        inventory = ShardedInventory(ticket_type)
+        inventory.clear()
+
+        self.assertEqual(inventory.available(), 5)
+        self.assertTrue(inventory.take(5))
+        self.assertFalse(inventory.take(1))
+
+    def test_reconcile_corrects_snapshot_drift(self):
+        ticket_type = self.create_sharded(8)
+        OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 3}])
+        self.assertEqual(self.stock(ticket_type), 8)
+
+        self.assertEqual(InventoryService.reconcile_all(), 1)
+
+        self.assertEqual(self.stock(ticket_type), 5)
+        self.assertEqual(TicketType.objects.get(pk=ticket_type.pk).inventory_synced_tickets, 3)
+
+    def test_expired_holds_go_back_to_the_shards_on_commit(self):
+        ticket_type = self.create_sharded(8)
+        order = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 3}])
+        order.tickets.update(hold_expires_at=now() - timedelta(minutes=1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            clear_expired_reservations()
+
+        self.assertEqual(ShardedInventory(ticket_type).available(), 8)
+
+    def test_sold_out_sharded_type_reclaims_lapsed_holds(self):
+        ticket_type = self.create_sharded(2, shards=2)
+        lapsed = OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 2}])
+        lapsed.tickets.update(hold_expires_at=now() - timedelta(minutes=1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderService.create_order(self.buyer, [{'ticket_type': ticket_type, 'quantity': 2}])
+
+        self.assertEqual(ShardedInventory(ticket_type).available(), 0)
+        self.assertEqual(Order.objects.get(pk=lapsed.pk).order_status, Order.OrderStatusChoices.EXPIRED)
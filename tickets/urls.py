@@ -6,7 +6,17 @@ from tickets.views import (
     TicketTypeListCreateView,
     TicketTypeDetailView,
     PayTicketView,
-    UseTicketView
+    UseTicketView,
+    OrderListCreateView,
+    OrderDetailView,
+    PayOrderView,
+    CancelOrderView,
+    WaitingRoomJoinView,
+    WaitingRoomStatusView,
+    TicketQRCodeView,
+    EventCheckinBundleView,
+    EventCheckInView,
+    EventCheckInBatchView
 )
 
 urlpatterns = [
@@ -22,5 +32,19 @@ urlpatterns = [
     # Ticket Usage
     path('tickets/<int:ticket_id>/pay/', PayTicketView.as_view(), name='pay_ticket'),
     path('tickets/<int:ticket_id>/use/', UseTicketView.as_view(), name='use_ticket'),
+    path('qr-codes/<str:unique_code>/', TicketQRCodeView.as_view(), name='ticket-qr-code'),
+    path('events/<int:event_id>/checkin-bundle/', EventCheckinBundleView.as_view(), name='event-checkin-bundle'),
+    path('events/<int:event_id>/check-in/', EventCheckInView.as_view(), name='event-check-in'),
+    path('events/<int:event_id>/check-in/batch/', EventCheckInBatchView.as_view(), name='event-check-in-batch'),
+
+    # Orders URLs
+    path('orders/', OrderListCreateView.as_view(), name='order-list-create'),
+    path('orders/<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
+    path('orders/<int:order_id>/pay/', PayOrderView.as_view(), name='pay_order'),
+    path('orders/<int:order_id>/cancel/', CancelOrderView.as_view(), name='cancel_order'),
+
+    # Waiting Room URLs
+    path('events/<int:event_id>/waiting-room/', WaitingRoomJoinView.as_view(), name='waiting-room-join'),
+    path('waiting-room/status/', WaitingRoomStatusView.as_view(), name='waiting-room-status'),
 ]
 
@@ -1,26 +1,61 @@
 from django.forms import ValidationError
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
+from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView, RetrieveAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from core.permissions import IsAdminUser, IsOrganizerUser, IsParticipantUser
+from core.idempotency import idempotent
+from core.pagination import TicketPagination, OrderPagination
+from core.conditional import conditional_get
 from tickets.services.ticket_services import TicketService
 from tickets.services.ticket_type_services import TicketTypeService
-from tickets.services.email_services import send_qrcode_email, send_reservation_confirmation_email
-from tickets.models import Ticket, TicketType
-from .serializer import TicketSerializer, TicketRegisterSerializer, TicketTypeRegisterSerializer
-from rest_framework import status
+from tickets.services.order_services import OrderService
+from tickets.services.qr_code_services import QRCodeService
+from tickets.services.checkin_services import CheckinBundleService, CheckInService
+from tickets.services.waiting_room_services import WaitingRoomService, WaitingRoomError
+from tickets.services import email_services
+from tickets.models import Ticket, TicketType, Order, TicketQRCode
+from tickets.tasks import render_ticket_qr_codes, queue_emails
+from .serializer import (TicketSerializer, TicketRegisterSerializer, TicketTypeRegisterSerializer, OrderRegisterSerializer,
+                         CheckInSerializer, CheckInBatchSerializer)
+from rest_framework import status, serializers
+from rest_framework.exceptions import PermissionDenied
+from django.db.models import Q
+from django.http import HttpResponse, HttpResponseNotModified
+from events.models import Event
+
+
+def check_waiting_room(request, event):
+    try:
+        WaitingRoomService.check_admission(event, request.user, request.headers.get('X-Queue-Token'))
+    except WaitingRoomError as e:
+        raise PermissionDenied(e.message)
+
+
+def get_staff_event(request, event_id, *fields):
+    events = Event.objects.only('id', 'organizer_id', *fields)
+    if request.user.profile_type != 'ADMIN':
+        events = events.filter(organizer=request.user)
+    return events.filter(pk=event_id).first()
+
 
 # Ticket Views
 class TicketListCreateView(ListCreateAPIView):
     permission_classes = [IsAdminUser | IsOrganizerUser]
     serializer_class = TicketRegisterSerializer
+    pagination_class = TicketPagination
 
     def get_queryset(self):
         return TicketService.get_all_tickets()
 
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
     def perform_create(self, serializer):
+        check_waiting_room(self.request, serializer.validated_data['ticket_type'].event)
         ticket = TicketService.create_ticket(serializer.validated_data)
-        send_reservation_confirmation_email(ticket.buyer.email, ticket.unique_code, ticket.price_paid)
+        queue_emails([[email_services.RESERVATION_CONFIRMATION, ticket.id]])
+        render_ticket_qr_codes.delay([ticket.unique_code])
         TicketService.change_ticket_status(ticket, 'PENDING_PAYMENT')
 
 
@@ -42,16 +77,16 @@ class TicketDetailView(RetrieveUpdateDestroyAPIView):
     def perform_destroy(self, instance):
         TicketService.delete_ticket(instance)
 
-        TicketService.change_ticket_status(instance, 'CANCELED')
-
 
 class BuyerTicketsListView(APIView):
     permission_classes = [IsAdminUser | IsParticipantUser]
 
     def get(self, request):
         tickets = TicketService.get_tickets_by_buyer(request.user.id)
-        serializer = TicketSerializer(tickets, many=True)
-        return Response(serializer.data)
+        paginator = TicketPagination()
+        page = paginator.paginate_queryset(tickets, request, view=self)
+        serializer = TicketSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 # TicketType Views
@@ -62,8 +97,12 @@ class TicketTypeListCreateView(ListCreateAPIView):
     def get_queryset(self):
         return TicketTypeService.get_all_ticket_types()
 
+    @conditional_get(lambda view, request: TicketTypeService.get_ticket_types_version())
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        TicketTypeService.create_ticket_type(serializer.validated_data)
+        serializer.instance = TicketTypeService.create_ticket_type(serializer.validated_data)
 
 
 class TicketTypeDetailView(RetrieveUpdateDestroyAPIView):
@@ -73,6 +112,10 @@ class TicketTypeDetailView(RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return TicketTypeService.get_all_ticket_types()
 
+    @conditional_get(lambda view, request, pk: TicketTypeService.get_ticket_type_version(pk))
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def perform_update(self, serializer):
         ticket_type = self.get_object()
         TicketTypeService.update_ticket_type(ticket_type, serializer.validated_data)
@@ -84,12 +127,12 @@ class TicketTypeDetailView(RetrieveUpdateDestroyAPIView):
 class PayTicketView(APIView):
     permission_classes = [IsAdminUser | IsOrganizerUser | IsParticipantUser]
 
+    @idempotent
     def post(self, request, ticket_id):
         try:
-            ticket = Ticket.objects.get(pk=ticket_id, buyer=request.user)
+            ticket = Ticket.objects.select_related('ticket_type__event').get(pk=ticket_id, buyer=request.user)
             TicketService.pay_ticket(ticket)
-            qr_code_buffer = ticket.generate_qr_code()
-            send_qrcode_email(request.user.email, ticket.ticket_type.event.title, qr_code_buffer)
+            queue_emails([[email_services.TICKET_QR_CODE, ticket.id]])
             return Response({"detail": "Ticket payment successful."}, status=status.HTTP_200_OK)
         except Ticket.DoesNotExist:
             return Response({"detail": "Ticket not found or unauthorized."}, status=status.HTTP_404_NOT_FOUND)
@@ -100,6 +143,7 @@ class PayTicketView(APIView):
 class UseTicketView(APIView):
     permission_classes = [IsAdminUser | IsOrganizerUser | IsParticipantUser]
 
+    @idempotent
     def post(self, request, ticket_id):
         try:
             ticket = Ticket.objects.get(pk=ticket_id, buyer=request.user)
@@ -108,4 +152,178 @@ class UseTicketView(APIView):
         except Ticket.DoesNotExist:
             return Response({"detail": "Ticket not found or unauthorized."}, status=status.HTTP_404_NOT_FOUND)
         except ValidationError as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TicketQRCodeView(APIView):
+    permission_classes = [IsAdminUser | IsOrganizerUser | IsParticipantUser]
+
+    def get(self, request, unique_code):
+        tickets = Ticket.objects.filter(unique_code=unique_code)
+        if request.user.profile_type == 'ORGANIZER':
+            tickets = tickets.filter(Q(buyer=request.user) | Q(ticket_type__event__organizer=request.user))
+        elif request.user.profile_type != 'ADMIN':
+            tickets = tickets.filter(buyer=request.user)
+
+        # O QR code de um ticket nunca muda depois de gerado, então o cliente pode guardá-lo indefinidamente
+        stored = TicketQRCode.objects.filter(pk=unique_code).values_list('image_format', 'created_at').first()
+        if stored and request.headers.get('If-None-Match') == _qr_code_etag(unique_code, *stored) and tickets.exists():
+            return HttpResponseNotModified()
+
+        ticket = tickets.select_related('ticket_type__event').first()
+        if ticket is None:
+            return Response({"detail": "Ticket not found or unauthorized."}, status=status.HTTP_404_NOT_FOUND)
+
+        qr_code = QRCodeService.get_or_render(ticket)
+        response = HttpResponse(bytes(qr_code.image), content_type=qr_code.content_type)
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        response['ETag'] = _qr_code_etag(unique_code, qr_code.image_format, qr_code.created_at)
+        return response
+
+
+def _qr_code_etag(unique_code, image_format, created_at):
+    return f'"{unique_code}-{image_format}-{int(created_at.timestamp())}"'
+
+
+class EventCheckinBundleView(APIView):
+    permission_classes = [IsAdminUser | IsOrganizerUser]
+
+    def get(self, request, event_id):
+        event = get_staff_event(request, event_id, 'end_date')
+        if event is None:
+            return Response({"detail": "Event not found or unauthorized."}, status=status.HTTP_404_NOT_FOUND)
+
+        response = HttpResponse(CheckinBundleService.build(event), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="checkin-bundle-{event.id}.bin"'
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+class EventCheckInView(APIView):
+    permission_classes = [IsAdminUser | IsOrganizerUser]
+
+    # Cada resultado tem seu próprio status HTTP para o leitor distinguir leitura repetida de ingresso inválido
+    RESULT_STATUS = {
+        CheckInService.CHECKED_IN: status.HTTP_200_OK,
+        CheckInService.DUPLICATE: status.HTTP_409_CONFLICT,
+        CheckInService.NOT_FOUND: status.HTTP_404_NOT_FOUND,
+        CheckInService.INVALID: status.HTTP_400_BAD_REQUEST,
+        CheckInService.REJECTED: status.HTTP_400_BAD_REQUEST,
+    }
+
+    def post(self, request, event_id):
+        if get_staff_event(request, event_id) is None:
+            return Response({"detail": "Event not found or unauthorized."}, status=status.HTTP_404_NOT_FOUND)
+        serializer = CheckInSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = CheckInService.check_in(event_id, serializer.validated_data['code'], serializer.validated_data.get('scanned_at'))
+        return Response(result, status=self.RESULT_STATUS[result['result']])
+
+
+class EventCheckInBatchView(APIView):
+    permission_classes = [IsAdminUser | IsOrganizerUser]
+
+    def post(self, request, event_id):
+        if get_staff_event(request, event_id) is None:
+            return Response({"detail": "Event not found or unauthorized."}, status=status.HTTP_404_NOT_FOUND)
+        serializer = CheckInBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = CheckInService.check_in_batch(event_id, serializer.validated_data['scans'])
+        summary = {}
+        for result in results:
+            summary[result['result']] = summary.get(result['result'], 0) + 1
+        return Response({"summary": summary, "results": results}, status=status.HTTP_200_OK)
+
+
+# Order Views
+class OrderListCreateView(ListCreateAPIView):
+    permission_classes = [IsAdminUser | IsOrganizerUser | IsParticipantUser]
+    serializer_class = OrderRegisterSerializer
+    pagination_class = OrderPagination
+
+    def get_queryset(self):
+        if self.request.user.profile_type == 'ADMIN':
+            return OrderService.get_all_orders()
+        return OrderService.get_orders_by_buyer(self.request.user.id)
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        check_waiting_room(self.request, serializer.validated_data['items'][0]['ticket_type'].event)
+        try:
+            order = OrderService.create_order(self.request.user, serializer.validated_data['items'])
+        except ValidationError as e:
+            raise serializers.ValidationError(e.messages)
+        unique_codes = list(order.tickets.values_list('unique_code', flat=True))
+        queue_emails([[email_services.ORDER_CONFIRMATION, order.id]])
+        render_ticket_qr_codes.delay(unique_codes)
+        serializer.instance = order
+
+
+class OrderDetailView(RetrieveAPIView):
+    permission_classes = [IsAdminUser | IsOrganizerUser | IsParticipantUser]
+    serializer_class = OrderRegisterSerializer
+
+    def get_queryset(self):
+        if self.request.user.profile_type == 'ADMIN':
+            return OrderService.get_all_orders()
+        return OrderService.get_orders_by_buyer(self.request.user.id)
+
+
+class PayOrderView(APIView):
+    permission_classes = [IsAdminUser | IsOrganizerUser | IsParticipantUser]
+
+    @idempotent
+    def post(self, request, order_id):
+        try:
+            order = Order.objects.select_related('event').get(pk=order_id, buyer=request.user)
+            OrderService.pay_order(order)
+            queue_emails([[email_services.ORDER_QR_CODES, order.id]])
+            return Response({"detail": "Order payment successful."}, status=status.HTTP_200_OK)
+        except Order.DoesNotExist:
+            return Response({"detail": "Order not found or unauthorized."}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class CancelOrderView(APIView):
+    permission_classes = [IsAdminUser | IsOrganizerUser | IsParticipantUser]
+
+    def post(self, request, order_id):
+        try:
+            order = Order.objects.get(pk=order_id, buyer=request.user)
+            OrderService.cancel_order(order)
+            return Response({"detail": "Order canceled successfully."}, status=status.HTTP_200_OK)
+        except Order.DoesNotExist:
+            return Response({"detail": "Order not found or unauthorized."}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+# Waiting Room Views
+class WaitingRoomJoinView(APIView):
+    permission_classes = [IsAdminUser | IsOrganizerUser | IsParticipantUser]
+
+    def post(self, request, event_id):
+        try:
+            event = Event.objects.only('id', 'waiting_room_enabled', 'waiting_room_rate', 'waiting_room_window').get(pk=event_id)
+            return Response(WaitingRoomService.join(event, request.user), status=status.HTTP_200_OK)
+        except Event.DoesNotExist:
+            return Response({"detail": "Event not found."}, status=status.HTTP_404_NOT_FOUND)
+        except WaitingRoomError as e:
+            return Response({"detail": e.message}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class WaitingRoomStatusView(APIView):
+    permission_classes = [IsAdminUser | IsOrganizerUser | IsParticipantUser]
+
+    def get(self, request):
+        token = request.headers.get('X-Queue-Token') or request.query_params.get('token')
+        if not token:
+            return Response({"detail": "A queue token is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            return Response(WaitingRoomService.status(token, request.user), status=status.HTTP_200_OK)
+        except WaitingRoomError as e:
+            return Response({"detail": e.message}, status=status.HTTP_400_BAD_REQUEST)
@@ -1,13 +1,25 @@
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.exceptions import AuthenticationFailed
+from .models import User, token_version_key
 
 class CookiesJWTAuthentication(JWTAuthentication):
+    """
+    Authenticates the access token from the `access_token` cookie.
+
+    The user comes from a short-lived cache instead of a query per request.
+    With AUTH_TRUST_TOKEN_CLAIMS the user is built from the signed token
+    claims alone (no DB or user cache hit); only the per-user token version
+    is checked in the cache, so logout and deactivation still revoke tokens.
+    """
     def authenticate(self, request):
         access_token = request.COOKIES.get('access_token')
 
         if not access_token:
             return None
-        
+
         validated_token = self.get_validated_token(access_token)
 
         try:
@@ -15,4 +27,33 @@ class CookiesJWTAuthentication(JWTAuthentication):
         except AuthenticationFailed:
             return None
 
-        return (user, validated_token)
\ No newline at end of file
+        return (user, validated_token)
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise AuthenticationFailed('Token contained no recognizable user identification.')
+        token_version = validated_token.get('token_version', 0)
+
+        if settings.AUTH_TRUST_TOKEN_CLAIMS and all(claim in validated_token for claim in User.TOKEN_CLAIMS):
+            current_version = cache.get(token_version_key(user_id))
+            if current_version is not None and token_version < current_version:
+                raise AuthenticationFailed('Token has been revoked.')
+            user = self.user_from_claims(user_id, validated_token)
+        else:
+            user = User.objects.get_cached(user_id)
+            if user is None:
+                raise AuthenticationFailed('User not found.')
+            if token_version != user.token_version:
+                raise AuthenticationFailed('Token has been revoked.')
+
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive.')
+        return user
+
+    @staticmethod
+    def user_from_claims(user_id, validated_token) -> User:
+        # Os demais campos ficam adiados: só são lidos do banco se alguma view os acessar
+        names = ['id', 'token_version', *User.TOKEN_CLAIMS]
+        values = [user_id, validated_token.get('token_version', 0), *(validated_token[claim] for claim in User.TOKEN_CLAIMS)]
+        return User.from_db('default', names, values)
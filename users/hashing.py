@@ -0,0 +1,18 @@
+"""
+Password hashing for process pool workers.
+
+Kept free of model imports: a spawned worker unpickles these functions
+before Django is set up, so importing `users.models` here would fail.
+"""
+import os
+
+
+def init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def hash_passwords(passwords):
+    from django.contrib.auth.hashers import make_password
+    return [make_password(password) for password in passwords]
@@ -0,0 +1,45 @@
+import json
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from users.services import UserImportService, IMPORT_FORMATS, CONFLICT_MODES, SKIP
+
+
+class Command(BaseCommand):
+    help = "Imports participants and organizers in bulk from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with header) or NDJSON file with email, name, password, profile_type, ... columns.')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='File format; inferred from the extension by default.')
+        parser.add_argument('--on-conflict', choices=CONFLICT_MODES, default=SKIP, help='What to do with emails that already exist.')
+        parser.add_argument('--workers', type=int, help='Password hashing processes (default: one per core).')
+        parser.add_argument('--chunk-size', type=int, help='Rows validated and inserted per batch.')
+        parser.add_argument('--errors', help='Write the per-row errors to this NDJSON file instead of the output.')
+
+    def handle(self, *args, **options):
+        import_format = options['format'] or ('csv' if options['path'].lower().endswith('.csv') else 'ndjson')
+        if not os.path.exists(options['path']):
+            raise CommandError(f"File not found: {options['path']}")
+
+        started = time.perf_counter()
+        with open(options['path'], 'rb') as file:
+            result = UserImportService.import_rows(
+                UserImportService.read_rows(file, import_format),
+                on_conflict=options['on_conflict'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+            )
+        elapsed = time.perf_counter() - started
+
+        if options['errors']:
+            with open(options['errors'], 'w') as output:
+                output.writelines(json.dumps(error) + '\n' for error in result['errors'])
+        else:
+            for error in result['errors']:
+                self.stdout.write(f"Row {error['row']} ({error['email']}): {' '.join(error['errors'])}")
+
+        summary = (
+            f"Created {result['created']}, updated {result['updated']}, skipped {result['skipped']} existing "
+            f"and rejected {result['failed']} users in {elapsed:.1f}s."
+        )
+        self.stdout.write(self.style.WARNING(summary) if result['failed'] else self.style.SUCCESS(summary))
@@ -1,6 +1,8 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.forms import ValidationError
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, UserManager
 
 
@@ -10,6 +12,14 @@ class UserProfileType(models.TextChoices):
     PARTICIPANT = 'PARTICIPANT', 'Participant'
 
 
+def user_cache_key(user_id) -> str:
+    return f'auth:user:{user_id}'
+
+
+def token_version_key(user_id) -> str:
+    return f'auth:token_version:{user_id}'
+
+
 class CustomUserManager(UserManager):
     def _create_user(self, email, password, **extra_fields):
         if not email:
@@ -34,6 +44,23 @@ class CustomUserManager(UserManager):
         extra_fields.setdefault('is_superuser', True)
         return self._create_user(email, password, **extra_fields)
 
+    def get_cached(self, user_id):
+        """
+        The user with `user_id`, built from the cached CACHED_FIELDS when possible
+        (for up to AUTH_USER_CACHE_TIMEOUT seconds); other fields are deferred.
+        A cached copy older than the user's current token version (see
+        `User.invalidate_cache`) is reloaded, so a revocation is seen even if a
+        stale copy was cached concurrently.
+        """
+        cached = cache.get_many([user_cache_key(user_id), token_version_key(user_id)])
+        values = cached.get(user_cache_key(user_id))
+        current_version = cached.get(token_version_key(user_id))
+        if values is None or (current_version is not None and values['token_version'] < current_version):
+            values = self.filter(pk=user_id).values(*self.model.CACHED_FIELDS).first()
+            if values is None:
+                return None
+            cache.set(user_cache_key(user_id), values, settings.AUTH_USER_CACHE_TIMEOUT)
+        return self.model.from_db(self.db, list(values), list(values.values()))
 
 
 class User(AbstractBaseUser, PermissionsMixin):
@@ -46,6 +73,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     profile_type = models.CharField(max_length=20, choices=UserProfileType.choices, default=UserProfileType.PARTICIPANT)
     date_joined = models.DateTimeField(default=timezone.now)
     is_active = models.BooleanField(default=True)
+    # Tokens emitidos com uma versão anterior deixam de valer (logout, desativação, mudança de perfil ou senha)
+    token_version = models.PositiveIntegerField(default=0)
 
 
     #possible fields for ORGANIZERS
@@ -63,6 +92,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email' 
     REQUIRED_FIELDS = []
 
+    # Campos copiados para o token de acesso; mudar qualquer um deles (ou a senha) revoga os tokens
+    TOKEN_CLAIMS = ('profile_type', 'is_active', 'is_staff', 'is_superuser')
+    REVOKING_FIELDS = (*TOKEN_CLAIMS, 'password')
+    # Só o que a autenticação e as permissões leem; o hash da senha nunca vai para o cache
+    CACHED_FIELDS = ('id', 'email', 'name', 'token_version', *TOKEN_CLAIMS)
+
     # related_name para evitar conflitos
     groups = models.ManyToManyField(
         'auth.Group',
@@ -107,6 +142,78 @@ class User(AbstractBaseUser, PermissionsMixin):
             if not self.commercial_address:
                 raise ValidationError("Commercial address is mandatory for organizers.")
             
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # Valores lidos do banco, para o save() saber se precisa revogar os tokens sem consultá-lo de novo
+        user._loaded_values = {name: value for name, value in zip(field_names, values) if name in cls.REVOKING_FIELDS}
+        return user
+
     def save(self, *args, **kwargs):
         self.clean() 
-        super().save(*args, **kwargs)
\ No newline at end of file
+        update_fields = kwargs.get('update_fields')
+        saved = self.REVOKING_FIELDS if update_fields is None else [field for field in self.REVOKING_FIELDS if field in update_fields]
+        if saved and not self._state.adding:
+            loaded = getattr(self, '_loaded_values', {})
+            # Só consulta o banco pelos campos alterados que não vieram na carga (instâncias do cache ou montadas à mão)
+            missing = [field for field in saved if field not in loaded and field in self.__dict__]
+            if missing:
+                loaded = {**loaded, **(User.objects.filter(pk=self.pk).values(*missing).first() or {})}
+            if any(field in loaded and loaded[field] != getattr(self, field) for field in saved):
+                self.token_version += 1
+                if update_fields is not None:
+                    kwargs['update_fields'] = {*update_fields, 'token_version'}
+        super().save(*args, **kwargs)
+        self._loaded_values = {field: self.__dict__[field] for field in self.REVOKING_FIELDS if field in self.__dict__}
+        self.invalidate_cache()
+
+    def delete(self, *args, **kwargs):
+        self.invalidate_cache()
+        return super().delete(*args, **kwargs)
+
+    def deactivate(self):
+        self.is_active = False
+        self.save(update_fields=['is_active'])
+
+    def revoke_tokens(self):
+        """Invalidates every token issued to this user so far (logout from all sessions)."""
+        User.objects.filter(pk=self.pk).update(token_version=models.F('token_version') + 1)
+        self.refresh_from_db(fields=['token_version'])
+        self.invalidate_cache()
+
+    def invalidate_cache(self):
+        """
+        Drops the cached copy of the user and publishes the current token version,
+        which authentication compares against token claims without a query. Runs
+        after the surrounding transaction commits.
+        """
+        user_id, token_version = self.pk, self.token_version
+
+        def invalidate():
+            cache.delete(user_cache_key(user_id))
+            # Basta durar o mesmo que um token de acesso: depois disso os tokens antigos já expiraram
+            cache.set(token_version_key(user_id), token_version, int(settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()))
+
+        transaction.on_commit(invalidate)
+
+class UserImportJob(models.Model):
+    class StatusChoices(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        RUNNING = 'RUNNING', 'Running'
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+
+    requested_by = models.ForeignKey(User, related_name='user_import_jobs', on_delete=models.CASCADE, null=False, blank=False)
+    # Apagado assim que a importação termina: o arquivo pode trazer senhas em texto puro
+    file = models.FileField(upload_to='imports/users/%Y/%m/', null=True, blank=True)
+    import_format = models.CharField(max_length=10, null=False, blank=False)
+    on_conflict = models.CharField(max_length=10, null=False, blank=False)
+    import_status = models.CharField(max_length=20, choices=StatusChoices.choices, default=StatusChoices.PENDING, null=False, blank=False)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(null=False, blank=False)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'user_import_jobs'
@@ -1,5 +1,8 @@
 from rest_framework import serializers
-from .models import User
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .models import User, UserImportJob
 from .models import UserProfileType
 
 
@@ -31,3 +34,35 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'email', 'name', 'profile_type']  
+
+
+def add_user_claims(token, user):
+    """Copies the token version and the fields permissions depend on into `token`."""
+    token['token_version'] = user.token_version
+    for claim in User.TOKEN_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class UserTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(pk=refresh.get(api_settings.USER_ID_CLAIM)).first()
+        if user is None or not user.is_active or refresh.get('token_version', 0) != user.token_version:
+            raise AuthenticationFailed('Token has been revoked.')
+        # As claims vêm do usuário atual, não do refresh token, para refletir mudanças de perfil
+        return {'access': str(add_user_claims(refresh.access_token, user))}
+
+
+
+class UserImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserImportJob
+        fields = ['id', 'import_format', 'on_conflict', 'import_status', 'result', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
@@ -0,0 +1,229 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+from contextlib import contextmanager
+from itertools import islice
+from math import ceil
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_email
+from django.utils.timezone import now
+from users.hashing import init_worker, hash_passwords
+from users.models import User, UserImportJob, UserProfileType, user_cache_key
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+SKIP = 'skip'
+UPDATE = 'update'
+CONFLICT_MODES = (SKIP, UPDATE)
+
+IMPORT_FIELDS = ['email', 'name', 'password', 'profile_type', 'phone_number', 'cnpj_cpf', 'business_name', 'commercial_address']
+ORGANIZER_FIELDS = ['cnpj_cpf', 'business_name', 'commercial_address']
+
+# Campos atualizados quando o e-mail já existe e on_conflict='update', apenas quando a linha traz
+# um valor; perfil e senha nunca mudam por importação
+UPDATE_FIELDS = ['name', 'phone_number', 'cnpj_cpf', 'business_name', 'commercial_address']
+
+# Perfis aceitos na importação: administradores só são criados individualmente
+IMPORT_PROFILE_TYPES = [UserProfileType.PARTICIPANT, UserProfileType.ORGANIZER]
+
+MAX_LENGTHS = {
+    field: User._meta.get_field(field).max_length
+    for field in IMPORT_FIELDS
+    if field != 'password' and User._meta.get_field(field).max_length
+}
+
+
+class UserImportService:
+    """
+    Bulk import of participants and organizers from CSV or NDJSON.
+
+    Rows are read and handled in chunks. Each chunk is validated in one pass
+    (duplicates inside the file are found with a set, existing emails with one
+    query), its passwords are hashed on a process pool using every core, and
+    its users are inserted with one `bulk_create`. Rows without a password get
+    an unusable one (no hashing cost) and must set it through a password reset.
+    Failing rows are skipped and reported; they never abort the import.
+    """
+
+    @staticmethod
+    def create_job(user, file, import_format: str, on_conflict: str) -> UserImportJob:
+        """Stores the uploaded file and a PENDING job for `run_user_import_job` to pick up."""
+        job = UserImportJob(requested_by=user, import_format=import_format, on_conflict=on_conflict, created_at=now())
+        job.file.save(f'users-{user.id}.{import_format}', ContentFile(file.read()), save=False)
+        job.save()
+        return job
+
+    @staticmethod
+    def run_job(job: UserImportJob) -> UserImportJob:
+        """
+        Imports the job's file with a single hashing process: Celery's prefork
+        workers are daemonic and can't start a pool. Files over
+        USER_IMPORT_API_MAX_ROWS rows fail and must use the import_users command.
+        """
+        job.import_status = UserImportJob.StatusChoices.RUNNING
+        job.started_at = now()
+        job.save(update_fields=['import_status', 'started_at'])
+
+        try:
+            with job.file.open('rb') as file:
+                rows = list(islice(UserImportService.read_rows(file, job.import_format), settings.USER_IMPORT_API_MAX_ROWS + 1))
+            if len(rows) > settings.USER_IMPORT_API_MAX_ROWS:
+                raise ValueError(f'Files over {settings.USER_IMPORT_API_MAX_ROWS} rows must be imported with the import_users command.')
+            job.result = UserImportService.import_rows(rows, on_conflict=job.on_conflict, workers=1)
+            job.import_status = UserImportJob.StatusChoices.COMPLETED
+        except Exception as e:
+            job.import_status = UserImportJob.StatusChoices.FAILED
+            job.error = str(e)
+        finally:
+            job.file.delete(save=False)
+
+        job.finished_at = now()
+        job.save(update_fields=['import_status', 'file', 'result', 'error', 'finished_at'])
+        return job
+
+    @staticmethod
+    def read_rows(file, import_format):
+        """Yields `(row number, row dict or None)` from a binary file; None marks an unreadable NDJSON line."""
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        if import_format == 'csv':
+            yield from enumerate(csv.DictReader(text), start=1)
+            return
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row if isinstance(row, dict) else None
+
+    @staticmethod
+    def import_rows(rows, on_conflict=SKIP, workers=None, chunk_size=None) -> dict:
+        chunk_size = chunk_size or settings.USER_IMPORT_CHUNK_SIZE
+        result = {'created': 0, 'updated': 0, 'skipped': 0, 'failed': 0, 'errors': []}
+        seen = set()
+        rows = iter(rows)
+        with UserImportService.hasher(workers) as hash_many:
+            while chunk := list(islice(rows, chunk_size)):
+                valid, errors = UserImportService.validate(chunk, seen)
+                result['failed'] += len(errors)
+                result['errors'] += errors
+                UserImportService._insert(valid, on_conflict, hash_many, result)
+        return result
+
+    @staticmethod
+    def validate(chunk, seen):
+        """Returns `(valid, errors)`: `[(row number, cleaned fields)]` and per-row error entries."""
+        valid, errors = [], []
+        for number, row in chunk:
+            if row is None:
+                errors.append({'row': number, 'email': None, 'errors': ['Invalid JSON object.']})
+                continue
+
+            fields = {field: str(row.get(field) or '').strip() for field in IMPORT_FIELDS}
+            fields['email'] = User.objects.normalize_email(fields['email'])
+            fields['profile_type'] = fields['profile_type'].upper() or UserProfileType.PARTICIPANT
+            problems = []
+            try:
+                validate_email(fields['email'])
+            except DjangoValidationError:
+                problems.append('Invalid email.')
+            if fields['email'] in seen:
+                problems.append('Duplicate email in file.')
+            if fields['profile_type'] not in IMPORT_PROFILE_TYPES:
+                problems.append(f"Invalid profile_type '{fields['profile_type']}'.")
+            if fields['profile_type'] == UserProfileType.ORGANIZER:
+                problems += [f'{field} is mandatory for organizers.' for field in ORGANIZER_FIELDS if not fields[field]]
+            problems += [
+                f'{field} must have at most {length} characters.'
+                for field, length in MAX_LENGTHS.items()
+                if len(fields[field]) > length
+            ]
+
+            if problems:
+                errors.append({'row': number, 'email': fields['email'] or None, 'errors': problems})
+                continue
+            seen.add(fields['email'])
+            valid.append((number, fields))
+        return valid, errors
+
+    @staticmethod
+    def _insert(valid, on_conflict, hash_many, result) -> None:
+        existing = {
+            user['email']: user
+            for user in User.objects.filter(email__in=[fields['email'] for _, fields in valid]).values('id', 'email', *UPDATE_FIELDS)
+        }
+        if on_conflict == SKIP:
+            result['skipped'] += sum(fields['email'] in existing for _, fields in valid)
+            valid = [(number, fields) for number, fields in valid if fields['email'] not in existing]
+        if not valid:
+            return
+
+        # Só os novos usuários com senha passam pelo hash; a senha de quem já existe não é atualizada
+        to_hash = [fields['password'] for _, fields in valid if fields['password'] and fields['email'] not in existing]
+        hashes = iter(hash_many(to_hash)) if to_hash else iter(())
+        joined = now()
+        users = []
+        for _, fields in valid:
+            hashed = fields['password'] and fields['email'] not in existing
+            # Células vazias mantêm o valor atual, para que uma linha em branco não apague
+            # os campos obrigatórios de um organizador (o bulk_create não passa pelo clean())
+            current = existing.get(fields['email'], {})
+            values = {field: fields[field] or current.get(field) or None for field in UPDATE_FIELDS}
+            users.append(User(
+                email=fields['email'],
+                name=values['name'] or '',
+                profile_type=fields['profile_type'],
+                phone_number=values['phone_number'] or '',
+                **{field: values[field] for field in ORGANIZER_FIELDS},
+                password=next(hashes) if hashed else make_password(None),
+                date_joined=joined,
+            ))
+
+        if on_conflict == UPDATE:
+            User.objects.bulk_create(users, update_conflicts=True, unique_fields=['email'], update_fields=UPDATE_FIELDS)
+        else:
+            # Conflitos com importações simultâneas são ignorados pelo banco
+            User.objects.bulk_create(users, ignore_conflicts=True)
+
+        updated = [existing[fields['email']]['id'] for _, fields in valid if fields['email'] in existing]
+        result['updated'] += len(updated)
+        result['created'] += len(valid) - len(updated)
+        if updated:
+            cache.delete_many([user_cache_key(user_id) for user_id in updated])
+
+    @staticmethod
+    @contextmanager
+    def hasher(workers=None):
+        """
+        Yields a function hashing a list of passwords. With more than one worker
+        the list is split across a pool of spawned processes (PBKDF2 is CPU-bound
+        and holds the GIL); spawned instead of forked so workers don't inherit
+        open database connections.
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers == 1:
+            yield hash_passwords
+            return
+
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'base.settings'),),
+        )
+
+        def hash_many(passwords):
+            size = ceil(len(passwords) / (workers * 4))
+            batches = [passwords[start:start + size] for start in range(0, len(passwords), size)]
+            return [hashed for batch in pool.map(hash_passwords, batches) for hashed in batch]
+
+        with pool:
+            yield hash_many
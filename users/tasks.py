@@ -0,0 +1,16 @@
+from celery import shared_task
+from users.models import UserImportJob
+from users.services import UserImportService
+
+
+@shared_task
+def run_user_import_job(job_id):
+    """
+    Importa o arquivo de uma importação de usuários pendente. Roda na fila
+    'exports', junto das demais tarefas longas, longe dos workers web.
+    """
+    job = UserImportJob.objects.filter(pk=job_id, import_status=UserImportJob.StatusChoices.PENDING).first()
+    if job is None:
+        return f"Importação {job_id} não está pendente."
+    job = UserImportService.run_job(job)
+    return f"Importação {job.id}: {job.import_status}"
@@ -1,3 +1,186 @@
-from django.test import TestCase
+import tempfile
+from unittest.mock import patch
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from users.authentication import CookiesJWTAuthentication
+from users.models import User, UserImportJob, UserProfileType, user_cache_key
+from users.services import UserImportService, UPDATE
+from users.tasks import run_user_import_job
 
-# Create your tests here.
+
+class UserImportServiceTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(
+            email='organizer@example.com',
+            password='password',
+            name='Organizer',
+            profile_type=UserProfileType.ORGANIZER,
+            cnpj_cpf='12345678901',
+            business_name='Organizer Ltda',
+            commercial_address='Rua A, 1',
+        )
+
+    def import_rows(self, *rows, on_conflict=UPDATE):
+        return UserImportService.import_rows(enumerate(rows, start=1), on_conflict=on_conflict, workers=1)
+
+    def test_blank_row_does_not_wipe_organizer_fields(self):
+        result = self.import_rows({'email': 'organizer@example.com', 'phone_number': '81999990000'})
+
+        self.assertEqual(result['updated'], 1)
+        organizer = User.objects.get(pk=self.organizer.pk)
+        organizer.clean()
+        self.assertEqual(organizer.phone_number, '81999990000')
+        self.assertEqual(organizer.name, 'Organizer')
+        self.assertEqual(organizer.cnpj_cpf, '12345678901')
+        self.assertEqual(organizer.business_name, 'Organizer Ltda')
+        self.assertEqual(organizer.commercial_address, 'Rua A, 1')
+
+    def test_row_values_update_existing_users(self):
+        self.import_rows({'email': 'organizer@example.com', 'business_name': 'Nova Razão'})
+        self.assertEqual(User.objects.get(pk=self.organizer.pk).business_name, 'Nova Razão')
+
+    def test_new_users_are_created(self):
+        result = self.import_rows({'email': 'participant@example.com', 'name': 'Participant'})
+        self.assertEqual(result['created'], 1)
+        self.assertFalse(User.objects.get(email='participant@example.com').has_usable_password())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class UserImportJobTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def upload(self, content, name='users.csv'):
+        with patch('users.views.run_user_import_job.delay') as delay, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/users/import/', {'file': SimpleUploadedFile(name, content)}, format='multipart')
+        return response, delay
+
+    def test_upload_queues_a_job_instead_of_importing(self):
+        response, delay = self.upload(b'email,name\nnew@example.com,New\n')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['import_status'], UserImportJob.StatusChoices.PENDING)
+        delay.assert_called_once_with(response.json()['id'])
+        self.assertFalse(User.objects.filter(email='new@example.com').exists())
+
+    def test_job_imports_the_file_and_deletes_it(self):
+        response, _ = self.upload(b'email,name\nnew@example.com,New\nnot-an-email,Bad\n')
+
+        run_user_import_job(response.json()['id'])
+
+        job = UserImportJob.objects.get(pk=response.json()['id'])
+        self.assertEqual(job.import_status, UserImportJob.StatusChoices.COMPLETED)
+        self.assertEqual((job.result['created'], job.result['failed']), (1, 1))
+        self.assertFalse(job.file)
+        self.assertTrue(User.objects.filter(email='new@example.com').exists())
+        self.assertEqual(self.client.get(f'/users/import/{job.id}/').json()['result']['created'], 1)
+
+    @override_settings(USER_IMPORT_API_MAX_ROWS=1)
+    def test_job_rejects_files_over_the_row_limit(self):
+        response, _ = self.upload(b'email\na@example.com\nb@example.com\n')
+
+        run_user_import_job(response.json()['id'])
+
+        job = UserImportJob.objects.get(pk=response.json()['id'])
+        self.assertEqual(job.import_status, UserImportJob.StatusChoices.FAILED)
+        self.assertFalse(User.objects.filter(email='a@example.com').exists())
+
+
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='participant@example.com', password='password', name='Participant')
+        self.client = APIClient()
+        response = self.client.post('/users/token/', {'email': 'participant@example.com', 'password': 'password'})
+        self.assertTrue(response.json()['success'])
+        self.access_token = self.client.cookies['access_token'].value
+
+    def authenticated(self):
+        self.client.cookies['access_token'] = self.access_token
+        return self.client.post('/users/authenticated/').status_code == 200
+
+    def reload_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_logout_revokes_the_access_token(self):
+        self.assertTrue(self.authenticated())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/users/logout/')
+        self.assertFalse(self.authenticated())
+
+    def test_deactivation_revokes_the_access_token(self):
+        self.assertTrue(self.authenticated())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reload_user().deactivate()
+        self.assertFalse(self.authenticated())
+
+    def test_profile_change_revokes_the_access_token(self):
+        self.assertTrue(self.authenticated())
+        user = self.reload_user()
+        user.profile_type, user.is_staff, user.is_superuser = UserProfileType.ADMIN, True, True
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertFalse(self.authenticated())
+
+    def test_saving_other_fields_keeps_the_token_without_an_extra_select(self):
+        user = self.reload_user()
+        user.name = 'Renamed'
+        with self.assertNumQueries(1):
+            user.save()
+        with self.assertNumQueries(1):
+            update_last_login(None, user)
+        self.assertTrue(self.authenticated())
+
+    def test_cached_user_leaves_out_the_password_hash(self):
+        self.assertTrue(self.authenticated())
+        cached = cache.get(user_cache_key(self.user.pk))
+        self.assertNotIn('password', cached)
+        self.assertEqual(cached['profile_type'], UserProfileType.PARTICIPANT)
+
+    def test_password_change_on_a_cached_user_revokes_the_token(self):
+        user = User.objects.get_cached(self.user.pk)
+        user.set_password('new-password')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(update_fields=['password'])
+        self.assertFalse(self.authenticated())
+
+    @override_settings(AUTH_TRUST_TOKEN_CLAIMS=True)
+    def test_trusted_claims_skip_the_database_but_honour_logout(self):
+        token = AccessToken(self.access_token)
+        with self.assertNumQueries(0):
+            user = CookiesJWTAuthentication().get_user(token)
+        self.assertEqual((user.pk, user.profile_type), (self.user.pk, UserProfileType.PARTICIPANT))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reload_user().revoke_tokens()
+        self.assertFalse(self.authenticated())
+
+
+class UserListPaginationTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='password')
+        for number in range(4):
+            User.objects.create_user(email=f'user{number}@example.com', password='password')
+        User.objects.create_user(email='inactive@example.com', password='password', is_active=False)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_pages_follow_ids_to_the_last_active_user(self):
+        ids, url = [], '/users/?page_size=2'
+        while url:
+            body = self.client.get(url).json()
+            ids += [user['id'] for user in body['results']]
+            url = body['next']
+
+        self.assertEqual(ids, list(User.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)))
+
+    def test_exact_last_page_has_no_next_link(self):
+        body = self.client.get('/users/?page_size=5').json()
+        self.assertEqual(len(body['results']), 5)
+        self.assertIsNone(body['next'])
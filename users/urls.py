@@ -1,6 +1,6 @@
 
 from django.urls import path
-from .views import register_user, register_user_organizer, get_users, CustomRefreshTokenView, CustomTokenObtainPairView, logout, is_authenticated
+from .views import register_user, register_user_organizer, get_users, import_users, import_job_detail, CustomRefreshTokenView, CustomTokenObtainPairView, logout, is_authenticated
 
 urlpatterns = [
     path('register/', register_user),
@@ -8,6 +8,8 @@ urlpatterns = [
     path('logout/', logout),
     path('authenticated/', is_authenticated),
     path('', get_users),
+    path('import/', import_users),
+    path('import/<int:job_id>/', import_job_detail),
     path('token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', CustomRefreshTokenView.as_view(), name='token_refresh'),
 ]
\ No newline at end of file
@@ -1,7 +1,11 @@
-from django.shortcuts import render
-from .models import User
-from .serializer import UserRegisterSerializer, UserSerializer, UserOrganizerRegisterSerializer
+from django.db import transaction
+from django.shortcuts import render, get_object_or_404
+from .models import User, UserImportJob
+from .services import UserImportService, IMPORT_FORMATS, CONFLICT_MODES, SKIP
+from .serializer import UserRegisterSerializer, UserSerializer, UserOrganizerRegisterSerializer, UserImportJobSerializer
+from .tasks import run_user_import_job
 from core.permissions import IsAdminUser, IsOrganizerUser, IsParticipantUser
+from core.pagination import KeysetPagination
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -114,9 +118,11 @@ def register_user_organizer(request):
 @api_view(['POST'])
 def logout(request):
     """
-    Log out the user by clearing the authentication cookies.
+    Log out the user by clearing the authentication cookies and revoking
+    every token issued to them so far.
     """
     try:
+        request.user.revoke_tokens()
         res = Response()
         res.data = {'success': True}
         res.delete_cookie('access_token')
@@ -139,8 +145,44 @@ def is_authenticated(request):
 @permission_classes([IsAdminUser])
 def get_users(request):
     """
-    Retrieve a list of all active users. Admin-only access.
+    Retrieve a page of active users, ordered by id. Admin-only access.
     """
     users = User.objects.filter(is_active=True)
-    serializer = UserSerializer(users, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(users, request)
+    serializer = UserSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def import_users(request):
+    """
+    Import participants and organizers in bulk from an uploaded CSV or NDJSON
+    file (`file`, optional `format` and `on_conflict`). Admin-only access.
+    The import runs in the background; poll import/<id>/ for its result.
+    Files over USER_IMPORT_API_MAX_ROWS rows must use the import_users command.
+    """
+    file = request.FILES.get('file')
+    if file is None:
+        return Response({'detail': "Upload the users in a 'file' field."}, status=status.HTTP_400_BAD_REQUEST)
+    import_format = request.data.get('format') or ('csv' if file.name.lower().endswith('.csv') else 'ndjson')
+    on_conflict = request.data.get('on_conflict') or SKIP
+    if import_format not in IMPORT_FORMATS or on_conflict not in CONFLICT_MODES:
+        return Response({'detail': 'Invalid format or on_conflict.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    job = UserImportService.create_job(request.user, file, import_format, on_conflict)
+    # Só enfileira depois do commit, para o worker encontrar a importação
+    transaction.on_commit(lambda: run_user_import_job.delay(job.id))
+    return Response(UserImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def import_job_detail(request, job_id):
+    """
+    Retrieve the status of a bulk user import and, once finished, its counts
+    and per-row errors. Admin-only access.
+    """
+    job = get_object_or_404(UserImportJob, pk=job_id)
+    return Response(UserImportJobSerializer(job).data)